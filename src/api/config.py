@@ -1,6 +1,9 @@
 # mypy: disable-error-code="call-arg"
 """Module to define the main settings class for the API."""
 
+from functools import lru_cache
+from typing import Literal
+
 from pydantic import SecretStr
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -10,8 +13,45 @@ class Settings(BaseSettings):
 
     db_url: str = "http://virgodb.dur.ac.uk:8080/Eagle/"
     jwt_secret_key: SecretStr
+    stream_block_size_bytes: int = 16 * 1024**2
+    max_open_files: int = 64
+    file_idle_timeout_seconds: float = 300.0
+    metadata_cache_max_bytes: int = 256 * 1024**2
+    units_cache_max_bytes: int = 16 * 1024**2
+    data_executor_workers: int = 8
+    metadata_executor_workers: int = 4
+    processing_backend: Literal["thread", "process"] = "thread"
+    process_pool_workers: int | None = None
+    gzip_level: int = 6
+    zstd_level: int = 3
+    lz4_level: int = 0
+    compression_min_bytes: int = 1024
+    byte_shuffle_block_bytes: int = 1024**2
+    read_merge_gap_bytes: int = 64 * 1024
+    result_cache_max_bytes: int = 256 * 1024**2
+    histogram_max_bins: int = 1024
+    extract_directory: str | None = None
+    job_workers: int = 2
+    job_spool_directory: str | None = None
+    job_spool_max_bytes: int = 16 * 1024**3
+    job_result_ttl_seconds: float = 3600.0
+    profile_directory: str | None = None
+    profile_users: list[str] = []
 
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
     )
+
+
+@lru_cache
+def get_settings() -> Settings:
+    """Retrieve an instance of the Settings object.
+
+    Required by FastAPI when used with Depends.
+
+    Returns
+    -------
+        Settings: Settings object
+    """
+    return Settings()
@@ -0,0 +1,15 @@
+"""Gunicorn settings hooks, for deployments reporting metrics from several workers.
+
+Load with `gunicorn --config python:api.gunicorn_config ...`.
+"""
+from prometheus_client import multiprocess
+
+
+def child_exit(server, worker) -> None:  # noqa: ARG001
+    """Remove the gauge values of a worker that has exited.
+
+    Args:
+        server (gunicorn.arbiter.Arbiter): Gunicorn master process
+        worker (gunicorn.workers.base.Worker): Worker that exited
+    """
+    multiprocess.mark_process_dead(worker.pid)
@@ -6,7 +6,12 @@ import uvicorn
 from fastapi import FastAPI
 from loguru import logger
 
-from api.routers import auth, file_processing
+from api.processing.executors import get_data_executor, get_metadata_executor
+from api.processing.file_pool import get_file_pool
+from api.processing.jobs import get_job_manager
+from api.processing.process_pool import get_process_pool
+from api.routers import auth, file_processing, jobs, metrics, profiling
+from api.timing import ServerTimingMiddleware
 
 logger.info("API starting")
 
@@ -30,7 +35,22 @@ app = FastAPI(
 )
 
 app.include_router(file_processing.router)
+app.include_router(jobs.router)
 app.include_router(auth.router)
+app.include_router(metrics.router)
+app.add_middleware(metrics.MetricsMiddleware)
+app.add_middleware(ServerTimingMiddleware)
+app.add_middleware(profiling.ProfilingMiddleware)
+
+
+@app.on_event("shutdown")
+def close_pooled_files() -> None:
+    """Stop the job manager, I/O executors and worker processes, and close pooled HDF5 files."""
+    get_job_manager().shutdown()
+    get_data_executor().shutdown()
+    get_metadata_executor().shutdown()
+    get_process_pool().shutdown()
+    get_file_pool().close_all()
 
 
 @app.get("/ping")
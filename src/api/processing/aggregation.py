@@ -0,0 +1,208 @@
+"""Reduce masked or unmasked fields on the server, one block of rows at a time."""
+from typing import Any, Literal
+
+import h5py
+import numpy as np
+import numpy.typing as npt
+
+from api.processing.data_processing import (
+    DEFAULT_BLOCK_SIZE_BYTES,
+    SWIFTProcessor,
+    SWIFTProcessorError,
+)
+from api.processing.file_pool import get_file_pool
+from api.processing.units import get_field_units
+
+AggregateOperation = Literal["sum", "min", "max", "mean", "count"]
+AGGREGATE_OPERATIONS: tuple[AggregateOperation, ...] = ("sum", "min", "max", "mean", "count")
+
+
+class FieldAggregator:
+    """Accumulate reductions over successive blocks of a field.
+
+    Multidimensional fields are reduced along rows, giving one value per column.
+    """
+
+    def __init__(self):
+        """Class constructor."""
+        self.count = 0
+        self.total: npt.NDArray | None = None
+        self.minimum: npt.NDArray | None = None
+        self.maximum: npt.NDArray | None = None
+
+    def update(self, block: npt.NDArray) -> None:
+        """Add a block of rows to the reductions.
+
+        Args:
+            block (npt.NDArray): Rows of the field
+        """
+        if not len(block):
+            return
+
+        block_total = np.sum(block, axis=0, dtype=self.get_sum_type(block.dtype))
+        block_minimum = np.min(block, axis=0)
+        block_maximum = np.max(block, axis=0)
+
+        if self.total is None:
+            self.total, self.minimum, self.maximum = block_total, block_minimum, block_maximum
+        else:
+            self.total = self.total + block_total
+            self.minimum = np.minimum(self.minimum, block_minimum)
+            self.maximum = np.maximum(self.maximum, block_maximum)
+        self.count += len(block)
+
+    @staticmethod
+    def get_sum_type(data_type: np.dtype) -> np.dtype:
+        """Choose a wide data type in which to accumulate sums.
+
+        Args:
+            data_type (np.dtype): Data type of the field
+
+        Returns
+        -------
+            np.dtype: 64-bit type of the same kind as the field
+        """
+        if data_type.kind == "u":
+            return np.dtype(np.uint64)
+        if data_type.kind in "bi":
+            return np.dtype(np.int64)
+        if data_type.kind == "c":
+            return np.dtype(np.complex128)
+        return np.dtype(np.float64)
+
+    def results(self, operations: list[AggregateOperation]) -> dict[str, Any]:
+        """Report the requested reductions.
+
+        Args:
+            operations (list[AggregateOperation]): Reductions to report
+
+        Returns
+        -------
+            dict[str, Any]:
+                Value of each reduction, a list for multidimensional fields.
+                Reductions other than sum and count are None for empty selections.
+        """
+        if self.total is None:
+            values = {"sum": 0, "min": None, "max": None, "mean": None}
+        else:
+            values = {
+                "sum": self.total.tolist(),
+                "min": self.minimum.tolist(),
+                "max": self.maximum.tolist(),
+                "mean": (self.total / self.count).tolist(),
+            }
+        values["count"] = self.count
+        return {operation: values[operation] for operation in operations}
+
+
+def split_ranges(mask: npt.NDArray, block_rows: int) -> list[npt.NDArray]:
+    """Group [start, stop) row ranges into blocks of about `block_rows` rows.
+
+    Ranges longer than a block are split, and consecutive short ranges are
+    read together. A new block starts once the rows before a range pass a
+    multiple of `block_rows`, so each block holds fewer than twice that many rows.
+
+    Args:
+        mask (npt.NDArray): Array of [start, stop) row ranges
+        block_rows (int): Target number of rows in each block
+
+    Returns
+    -------
+        list[npt.NDArray]: Row ranges for each block
+    """
+    mask = np.asarray(mask, dtype=np.int64).reshape(-1, 2)
+    mask = mask[mask[:, 1] > mask[:, 0]]
+    if not mask.size:
+        return []
+
+    lengths = mask[:, 1] - mask[:, 0]
+    pieces = -(-lengths // block_rows)
+    piece_index = np.arange(pieces.sum()) - np.repeat(np.cumsum(pieces) - pieces, pieces)
+    starts = np.repeat(mask[:, 0], pieces) + piece_index * block_rows
+    stops = np.minimum(starts + block_rows, np.repeat(mask[:, 1], pieces))
+
+    rows_before = np.cumsum(stops - starts) - (stops - starts)
+    block_index = rows_before // block_rows
+    boundaries = np.flatnonzero(np.diff(block_index)) + 1
+    return np.split(np.column_stack((starts, stops)), boundaries)
+
+
+def aggregate_field(
+    filename: str,
+    field: str,
+    operations: list[AggregateOperation],
+    mask: npt.NDArray | None = None,
+    columns: int | None = None,
+    block_size_bytes: int = DEFAULT_BLOCK_SIZE_BYTES,
+) -> dict[str, Any]:
+    """Reduce the selected rows of a field without holding the whole field in memory.
+
+    Args:
+        filename (str): Path to HDF5 file
+        field (str): Field path to reduce
+        operations (list[AggregateOperation]): Reductions to calculate
+        mask (npt.NDArray | None, optional):
+            Array of [start, stop) row ranges, or None for every row. Defaults to None.
+        columns (int | None, optional):
+            Selector for columns in the case of multidim arrays. Defaults to None.
+        block_size_bytes (int, optional):
+            Approximate size of each block read from the file.
+            Defaults to DEFAULT_BLOCK_SIZE_BYTES.
+
+    Raises
+    ------
+        SWIFTProcessorError: Raised if the field is not found in the file.
+
+    Returns
+    -------
+        dict[str, Any]: Value of each reduction, with the units of the field
+    """
+    aggregator = FieldAggregator()
+
+    with get_file_pool().open(filename) as handle:
+        dataset = get_dataset(handle, field)
+        if mask is None:
+            mask = np.array([[0, dataset.shape[0]]])
+        block_rows = SWIFTProcessor.get_block_rows(dataset, block_size_bytes)
+
+        for block_ranges in split_ranges(mask, block_rows):
+            block = SWIFTProcessor.read_masked_dataset(
+                handle,
+                field,
+                block_ranges,
+                int(np.sum(block_ranges[:, 1] - block_ranges[:, 0])),
+                columns,
+            )
+            aggregator.update(block)
+
+        units = get_field_units(filename, field)
+        a_scale_exponent = float(dataset.attrs.get("a-scale exponent", [0.0])[0])
+
+    return {
+        "field": field,
+        "units": units.to_string(),
+        "a_scale_exponent": a_scale_exponent,
+        "results": aggregator.results(operations),
+    }
+
+
+def get_dataset(handle: h5py.File, field: str) -> h5py.Dataset:
+    """Retrieve a dataset from an open file.
+
+    Args:
+        handle (h5py.File): Open HDF5 file
+        field (str): Field path
+
+    Raises
+    ------
+        SWIFTProcessorError: Raised if the field is not a dataset in the file.
+
+    Returns
+    -------
+        h5py.Dataset: Requested dataset
+    """
+    dataset = handle.get(field)
+    if not isinstance(dataset, h5py.Dataset):
+        message = f"Field {field} not found in {handle.filename}."
+        raise SWIFTProcessorError(message)
+    return dataset
@@ -0,0 +1,118 @@
+"""Serialise arrays as Apache Arrow IPC streams.
+
+Each field becomes one column of a single record batch. Multi-column fields,
+such as Coordinates, become fixed-size lists with one element per column, so
+the values stay in one contiguous buffer. The units of each field are stored
+in the column metadata. Clients can memory-map the stream and read columns
+without parsing. Arrow output requires the optional `pyarrow` package.
+"""
+import numpy as np
+import numpy.typing as npt
+
+from api.processing.data_processing import SWIFTProcessorError
+from api.processing.file_pool import get_file_pool
+from api.processing.units import get_field_units
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover
+    pa = None
+
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+
+def create_arrow_array(array: npt.NDArray) -> "pa.Array":
+    """Convert an array to an Arrow array with one element per row.
+
+    Trailing dimensions are flattened into a fixed-size list for each row.
+    Big-endian arrays are converted to little-endian, as required by Arrow.
+
+    Args:
+        array (npt.NDArray): Array to convert
+
+    Returns
+    -------
+        pa.Array: Arrow array of the values, or of fixed-size lists of values
+    """
+    if array.dtype.byteorder == ">":
+        array = array.astype(array.dtype.newbyteorder("<"))
+    if array.ndim == 1:
+        return pa.array(array)
+
+    list_size = int(np.prod(array.shape[1:]))
+    values = pa.array(np.ascontiguousarray(array).reshape(-1))
+    return pa.FixedSizeListArray.from_arrays(values, list_size)
+
+
+def create_field_metadata(filename: str, field: str) -> dict[str, str]:
+    """Describe a field for the metadata of its Arrow column.
+
+    Args:
+        filename (str): Path to HDF5 file
+        field (str): Field path, e.g. "PartType0/Coordinates"
+
+    Raises
+    ------
+        SWIFTProcessorError: Raised if the field is not found in the file.
+
+    Returns
+    -------
+        dict[str, str]: Field path, internal units and scale factor exponent of the field
+    """
+    with get_file_pool().open(filename) as handle:
+        if field not in handle:
+            message = f"Field {field} not found in {filename}."
+            raise SWIFTProcessorError(message)
+        attributes = handle[field].attrs
+        a_scale_exponent = float(attributes.get("a-scale exponent", [0.0])[0])
+
+    return {
+        "field": field,
+        "units": get_field_units(filename, field).to_string(),
+        "a_scale_exponent": str(a_scale_exponent),
+    }
+
+
+def generate_arrow_from_ndarrays(
+    arrays: dict[str, npt.NDArray],
+    metadata: dict[str, dict[str, str]] | None = None,
+) -> bytes:
+    """Write arrays of equal length as the columns of an Arrow IPC stream.
+
+    Args:
+        arrays (dict[str, npt.NDArray]): Arrays keyed by column name
+        metadata (dict[str, dict[str, str]] | None, optional):
+            Metadata of each column, keyed by column name. Defaults to None.
+
+    Raises
+    ------
+        SWIFTProcessorError:
+            Raised if pyarrow is not installed, or the arrays cannot be written.
+
+    Returns
+    -------
+        bytes: Arrow IPC stream holding one record batch
+    """
+    if pa is None:
+        message = "Arrow output requires the optional pyarrow package."
+        raise SWIFTProcessorError(message)
+    if metadata is None:
+        metadata = {}
+
+    try:
+        columns = [create_arrow_array(array) for array in arrays.values()]
+        schema = pa.schema(
+            [
+                pa.field(name, column.type, metadata=metadata.get(name))
+                for name, column in zip(arrays, columns)
+            ],
+        )
+        batch = pa.record_batch(columns, schema=schema)
+    except (pa.ArrowException, ValueError) as error:
+        message = f"Unable to convert arrays to Arrow: {error}"
+        raise SWIFTProcessorError(message) from error
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
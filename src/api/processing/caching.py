@@ -0,0 +1,233 @@
+"""Cache serialised objects in memory, bounded by their total size in bytes.
+
+Concurrent misses for the same key are coalesced: the first caller creates
+the value while later callers wait for it, so identical requests arriving
+together read the file only once.
+"""
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from concurrent.futures import Future
+from typing import Literal, TypeVar
+
+from api.processing.metrics import CACHE_BYTES, CACHE_HITS, CACHE_MISSES
+
+T = TypeVar("T")
+CacheStatus = Literal["hit", "miss", "coalesced"]
+
+
+class SingleFlight:
+    """Share one in-flight call between concurrent callers using the same key.
+
+    Only calls running at the same time are shared. Results are not kept
+    once the call finishes.
+    """
+
+    def __init__(self):
+        """Class constructor."""
+        self._calls: dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+        self.shared = 0
+
+    def run(self, key: Hashable, function: Callable[[], T]) -> tuple[T, bool]:
+        """Call a function, or wait for the call already running for the same key.
+
+        Exceptions raised by the running call are raised in every waiting caller.
+
+        Args:
+            key (Hashable): Key identifying the call
+            function (Callable[[], T]): Function to call if no call is running for the key
+
+        Returns
+        -------
+            tuple[T, bool]: Value returned by the call, and whether it was shared
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            shared = future is not None
+            if shared:
+                self.shared += 1
+            else:
+                future = self._calls[key] = Future()
+
+        if shared:
+            return future.result(), True
+
+        try:
+            value = function()
+        except BaseException as error:
+            future.set_exception(error)
+            raise
+        else:
+            future.set_result(value)
+        finally:
+            with self._lock:
+                del self._calls[key]
+        return value, False
+
+
+class ByteLRUCache:
+    """Least recently used cache of bytes objects, limited by total size.
+
+    Tracks hit, miss and eviction counts so cache effectiveness can be reported.
+    Misses that waited for a concurrent call to create the same value are
+    also counted as coalesced. Named caches also record their lookups and
+    size in the Prometheus metrics as they happen, so every worker process
+    reports its own values.
+    """
+
+    def __init__(self, max_bytes: int, name: str | None = None):
+        """Class constructor.
+
+        Args:
+            max_bytes (int): Maximum total size of cached values in bytes
+            name (str | None, optional):
+                Name labelling the cache's metrics, or None to record no metrics.
+                Defaults to None.
+        """
+        self.max_bytes = max_bytes
+        self.name = name
+
+        self._entries: OrderedDict[Hashable, bytes] = OrderedDict()
+        self._lock = threading.Lock()
+        self._flights = SingleFlight()
+
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if name is not None:
+            CACHE_HITS.labels(cache=name)
+            CACHE_MISSES.labels(cache=name)
+            self._record_bytes()
+
+    def get(self, key: Hashable) -> bytes | None:
+        """Retrieve a cached value.
+
+        Args:
+            key (Hashable): Cache key
+
+        Returns
+        -------
+            bytes | None: Cached value, or None if the key is not cached
+        """
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+
+        if self.name is not None:
+            counter = CACHE_MISSES if value is None else CACHE_HITS
+            counter.labels(cache=self.name).inc()
+        return value
+
+    def put(self, key: Hashable, value: bytes) -> None:
+        """Add a value to the cache, evicting least recently used values as needed.
+
+        Values larger than the cache are not stored.
+
+        Args:
+            key (Hashable): Cache key
+            value (bytes): Value to cache
+        """
+        if len(value) > self.max_bytes:
+            return
+
+        with self._lock:
+            previous_value = self._entries.pop(key, None)
+            if previous_value is not None:
+                self.current_bytes -= len(previous_value)
+
+            self._entries[key] = value
+            self.current_bytes += len(value)
+
+            while self.current_bytes > self.max_bytes:
+                _, evicted_value = self._entries.popitem(last=False)
+                self.current_bytes -= len(evicted_value)
+                self.evictions += 1
+            self._record_bytes()
+
+    def get_or_create(self, key: Hashable, create_value: Callable[[], bytes]) -> bytes:
+        """Retrieve a cached value, creating and caching it on a miss.
+
+        Args:
+            key (Hashable): Cache key
+            create_value (Callable[[], bytes]): Function creating the value if not cached
+
+        Returns
+        -------
+            bytes: Cached or newly created value
+        """
+        value, _ = self.get_or_create_with_status(key, create_value)
+        return value
+
+    def get_or_create_with_status(
+        self,
+        key: Hashable,
+        create_value: Callable[[], bytes],
+    ) -> tuple[bytes, CacheStatus]:
+        """Retrieve a cached value, creating and caching it on a miss.
+
+        Concurrent misses for the same key share a single call to create_value.
+
+        Args:
+            key (Hashable): Cache key
+            create_value (Callable[[], bytes]): Function creating the value if not cached
+
+        Returns
+        -------
+            tuple[bytes, CacheStatus]:
+                Value, and "hit", "miss" if it was created by this call,
+                or "coalesced" if it was created by a concurrent call
+        """
+        value = self.get(key)
+        if value is not None:
+            return value, "hit"
+
+        def create_and_put() -> bytes:
+            with self._lock:
+                cached_value = self._entries.get(key)
+            if cached_value is not None:
+                return cached_value
+
+            created_value = create_value()
+            self.put(key, created_value)
+            return created_value
+
+        value, shared = self._flights.run(key, create_and_put)
+        return value, "coalesced" if shared else "miss"
+
+    def clear(self) -> None:
+        """Remove all cached values."""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+            self._record_bytes()
+
+    def _record_bytes(self) -> None:
+        """Report the current size of a named cache. Must be called while holding the lock."""
+        if self.name is not None:
+            CACHE_BYTES.labels(cache=self.name).set(self.current_bytes)
+
+    def stats(self) -> dict[str, int]:
+        """Report cache usage.
+
+        Returns
+        -------
+            dict[str, int]:
+                Number and total size of entries, and hit, miss, eviction and coalesced counts
+        """
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "coalesced": self._flights.shared,
+            }
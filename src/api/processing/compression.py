@@ -0,0 +1,300 @@
+"""Compress response bodies incrementally using negotiated content encodings.
+
+Bodies are compressed one slice at a time, so compressed output is sent as it
+is produced. No second, full-size buffer is built. gzip is always available.
+zstd and lz4 are used when the optional `zstandard` and `lz4` packages are
+installed.
+
+Numeric arrays can optionally be byte-shuffled before compression. The bytes of
+each element are regrouped so that all first bytes come first, then all second
+bytes, and so on. This often compresses much better for integer and
+floating-point data.
+"""
+import itertools
+import zlib
+from collections.abc import Iterable, Iterator
+from typing import Protocol
+
+import numpy as np
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+try:
+    import lz4.frame
+except ImportError:  # pragma: no cover
+    lz4 = None
+
+DEFAULT_SLICE_BYTES = 1024**2
+
+
+class Compressor(Protocol):
+    """Incremental compressor producing one encoded stream."""
+
+    def compress(self, data: bytes) -> bytes:
+        """Compress the next part of the stream."""
+
+    def flush(self) -> bytes:
+        """Finish the stream, returning any remaining output."""
+
+
+class LZ4Compressor:
+    """Incremental lz4 frame compressor."""
+
+    def __init__(self, level: int):
+        """Class constructor.
+
+        Args:
+            level (int): lz4 compression level
+        """
+        self._compressor = lz4.frame.LZ4FrameCompressor(compression_level=level)
+        self._started = False
+
+    def compress(self, data: bytes) -> bytes:
+        """Compress the next part of the stream, starting the frame on first use.
+
+        Args:
+            data (bytes): Uncompressed data
+
+        Returns
+        -------
+            bytes: Compressed output, which may be empty
+        """
+        output = b""
+        if not self._started:
+            output = self._compressor.begin()
+            self._started = True
+        return output + self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        """Finish the frame.
+
+        Returns
+        -------
+            bytes: Remaining compressed output
+        """
+        output = b"" if self._started else self._compressor.begin()
+        self._started = True
+        return output + self._compressor.flush()
+
+
+def get_available_encodings() -> tuple[str, ...]:
+    """List the content encodings that can be produced, in order of preference.
+
+    Returns
+    -------
+        tuple[str, ...]: Supported encodings, fastest to decode first
+    """
+    encodings = []
+    if zstandard is not None:
+        encodings.append("zstd")
+    if lz4 is not None:
+        encodings.append("lz4")
+    encodings.append("gzip")
+    return tuple(encodings)
+
+
+def negotiate_encoding(accept_encoding: str | None, available: Iterable[str]) -> str | None:
+    """Choose a content encoding from an Accept-Encoding header.
+
+    The encoding with the highest quality value is chosen, with ties broken
+    by the order of the available encodings.
+
+    Args:
+        accept_encoding (str | None): Accept-Encoding header sent with the request
+        available (Iterable[str]): Encodings the server can produce, in order of preference
+
+    Returns
+    -------
+        str | None: Chosen encoding, or None if the body should not be compressed
+    """
+    if not accept_encoding:
+        return None
+
+    qualities = {}
+    for item in accept_encoding.split(","):
+        coding, *parameters = (part.strip() for part in item.split(";"))
+        quality = 1.0
+        for parameter in parameters:
+            name, _, value = parameter.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.lower()] = quality
+
+    wildcard_quality = qualities.get("*", 0.0)
+    best_encoding, best_quality = None, 0.0
+    for encoding in available:
+        quality = qualities.get(encoding, wildcard_quality)
+        if quality > best_quality:
+            best_encoding, best_quality = encoding, quality
+    return best_encoding
+
+
+def create_compressor(encoding: str, level: int) -> Compressor:
+    """Create an incremental compressor.
+
+    Args:
+        encoding (str): Content encoding, one of "zstd", "lz4" or "gzip"
+        level (int): Compression level for the encoding
+
+    Raises
+    ------
+        ValueError: Raised for unsupported encodings.
+
+    Returns
+    -------
+        Compressor: Compressor producing the encoded stream
+    """
+    if encoding == "gzip":
+        return zlib.compressobj(level, zlib.DEFLATED, wbits=31)
+    if encoding == "zstd" and zstandard is not None:
+        return zstandard.ZstdCompressor(level=level).compressobj()
+    if encoding == "lz4" and lz4 is not None:
+        return LZ4Compressor(level)
+
+    message = f"Unsupported content encoding {encoding}."
+    raise ValueError(message)
+
+
+def compress_chunks(
+    chunks: Iterable[bytes],
+    encoding: str,
+    level: int,
+    slice_bytes: int = DEFAULT_SLICE_BYTES,
+) -> Iterator[bytes]:
+    """Compress a sequence of byte chunks into a single encoded stream.
+
+    Large chunks are compressed in slices so output is produced steadily.
+
+    Args:
+        chunks (Iterable[bytes]): Uncompressed body chunks
+        encoding (str): Content encoding
+        level (int): Compression level for the encoding
+        slice_bytes (int, optional):
+            Largest amount of input compressed at once. Defaults to DEFAULT_SLICE_BYTES.
+
+    Yields
+    ------
+        bytes: Non-empty parts of the compressed stream
+    """
+    compressor = create_compressor(encoding, level)
+    for chunk in chunks:
+        view = memoryview(chunk).cast("B")
+        for offset in range(0, len(view), slice_bytes):
+            output = compressor.compress(view[offset : offset + slice_bytes])
+            if output:
+                yield output
+
+    output = compressor.flush()
+    if output:
+        yield output
+
+
+def shuffle_bytes(data: bytes, itemsize: int) -> bytes:
+    """Group the bytes of fixed-size elements by their position within each element.
+
+    Args:
+        data (bytes): Buffer of whole elements
+        itemsize (int): Size of each element in bytes
+
+    Returns
+    -------
+        bytes: Shuffled buffer of the same length
+    """
+    return np.frombuffer(data, dtype=np.uint8).reshape(-1, itemsize).T.tobytes()
+
+
+def unshuffle_bytes(data: bytes, itemsize: int) -> bytes:
+    """Reverse `shuffle_bytes`.
+
+    Args:
+        data (bytes): Shuffled buffer of whole elements
+        itemsize (int): Size of each element in bytes
+
+    Returns
+    -------
+        bytes: Buffer in the original element order
+    """
+    return np.frombuffer(data, dtype=np.uint8).reshape(itemsize, -1).T.tobytes()
+
+
+def shuffle_chunks(chunks: Iterable[bytes], itemsize: int, block_bytes: int) -> Iterator[bytes]:
+    """Byte-shuffle a stream of array data in fixed-size blocks.
+
+    Each block of `block_bytes` bytes is shuffled independently, as is the
+    final, shorter block, so clients can reverse the shuffle block by block.
+
+    Args:
+        chunks (Iterable[bytes]): Raw array data, a whole number of elements in total
+        itemsize (int): Size of each element in bytes
+        block_bytes (int): Size of each shuffled block, a multiple of the item size
+
+    Yields
+    ------
+        bytes: Shuffled blocks
+    """
+    pending = b""
+    for chunk in chunks:
+        view = memoryview(chunk).cast("B")
+        if pending:
+            needed = block_bytes - len(pending)
+            pending += bytes(view[:needed])
+            view = view[needed:]
+            if len(pending) < block_bytes:
+                continue
+            yield shuffle_bytes(pending, itemsize)
+            pending = b""
+
+        whole_blocks_bytes = len(view) - len(view) % block_bytes
+        for offset in range(0, whole_blocks_bytes, block_bytes):
+            yield shuffle_bytes(view[offset : offset + block_bytes], itemsize)
+        pending = bytes(view[whole_blocks_bytes:])
+
+    if pending:
+        yield shuffle_bytes(pending, itemsize)
+
+
+def get_shuffle_itemsize(data_type: np.dtype) -> int | None:
+    """Decide whether arrays of a data type benefit from byte shuffling.
+
+    Args:
+        data_type (np.dtype): Data type of array elements
+
+    Returns
+    -------
+        int | None: Size of each element in bytes, or None if the data should not be shuffled
+    """
+    if data_type.fields is not None or data_type.kind not in "biufc" or data_type.itemsize < 2:
+        return None
+    return data_type.itemsize
+
+
+def shuffle_npy_chunks(
+    chunks: Iterable[bytes],
+    header_bytes: int,
+    itemsize: int,
+    block_bytes: int,
+) -> Iterator[bytes]:
+    """Byte-shuffle the array data of an NPY stream, leaving its header intact.
+
+    Args:
+        chunks (Iterable[bytes]): NPY stream, with the complete header in the first chunk
+        header_bytes (int): Length of the NPY header
+        itemsize (int): Size of each element in bytes
+        block_bytes (int): Size of each shuffled block, a multiple of the item size
+
+    Yields
+    ------
+        bytes: NPY header followed by shuffled blocks of array data
+    """
+    chunks = iter(chunks)
+    first_chunk = memoryview(next(chunks)).cast("B")
+    yield first_chunk[:header_bytes]
+
+    data_chunks = itertools.chain([first_chunk[header_bytes:]], chunks)
+    yield from shuffle_chunks(data_chunks, itemsize, block_bytes)
@@ -5,13 +5,31 @@ read on the server. It uses code available under the GNU General Public License
 version 3 from the SWIFTsimIO library https://github.com/SWIFTSIM/swiftsimio/.
 
 """
+import io
 import json
+from collections.abc import Iterator
+from typing import Any
 
 import h5py
 import numpy as np
 import numpy.typing as npt
 from loguru import logger
-from swiftsimio.accelerated import read_ranges_from_file
+
+from api.config import get_settings
+from api.processing.file_pool import get_file_pool
+from api.processing.metrics import record_hdf5_read
+from api.processing.read_planner import (
+    ReadPlan,
+    execute_read_plan,
+    explain_read_plan,
+    plan_reads,
+)
+from api.timing import timed
+
+DEFAULT_BLOCK_SIZE_BYTES = 16 * 1024**2
+# Narrowest types floats may be narrowed to without allow_unsafe_cast. Narrower
+# types, such as float16, overflow to inf for values found in snapshots.
+MIN_IMPLICIT_NARROWING_DTYPES = {"f": np.dtype("float32"), "c": np.dtype("complex64")}
 
 
 def get_dataset_alias_map():
@@ -91,6 +109,49 @@ class SWIFTProcessor:
             message = f"Invalid array data for numpy.asarray(). {array_value_error}"
             raise (SWIFTProcessorError(message)) from array_value_error
 
+    @staticmethod
+    def load_ndarray_from_bytes(
+        mask_bytes: bytes,
+        data_type: str | None,
+    ) -> npt.NDArray:
+        """Convert a binary buffer of [start, stop) range pairs to a Numpy NDArray.
+
+        The buffer is wrapped with `numpy.frombuffer`, so no intermediate
+        Python objects are created.
+
+        Args:
+            mask_bytes (bytes): Raw buffer of integer start/stop pairs
+            data_type (str | None): Integer data type of the buffer. Defaults to int64 if None.
+
+        Raises
+        ------
+            SWIFTProcessorError: Raised for non-integer data types or incomplete pairs.
+
+        Returns
+        -------
+            npt.NDArray: Array of ranges with shape (n_ranges, 2)
+        """
+        try:
+            mask_data_type = np.dtype(data_type or "int64")
+        except TypeError as dtype_error:
+            message = f"Invalid data type provided for conversion to numpy array. {dtype_error}"
+            raise SWIFTProcessorError(message) from dtype_error
+
+        if mask_data_type.kind not in "iu":
+            message = f"Mask ranges must be integers, not {mask_data_type}."
+            raise SWIFTProcessorError(message)
+
+        pair_size_bytes = 2 * mask_data_type.itemsize
+        if len(mask_bytes) % pair_size_bytes:
+            message = (
+                f"Mask buffer of {len(mask_bytes)} bytes does not hold "
+                f"whole start/stop pairs of {mask_data_type}."
+            )
+            raise SWIFTProcessorError(message)
+
+        mask = np.frombuffer(mask_bytes, dtype=mask_data_type).reshape(-1, 2)
+        return mask.astype(mask_data_type.newbyteorder("="), copy=False)
+
     @staticmethod
     def generate_dict_from_ndarray(array: npt.NDArray) -> dict[str, str]:
         """Convert numpy-based arrays to JSON-serialisable objects.
@@ -109,6 +170,96 @@ class SWIFTProcessor:
             "dtype": data_type,
         }
 
+    @staticmethod
+    def generate_npy_header(data_type: np.dtype, shape: tuple[int, ...]) -> bytes:
+        """Create an NPY format header describing an array.
+
+        Args:
+            data_type (np.dtype): Data type of array elements, including byte order
+            shape (tuple[int, ...]): Shape of the array
+
+        Returns
+        -------
+            bytes: NPY version 1.0 header readable by `numpy.load`
+        """
+        header = io.BytesIO()
+        np.lib.format.write_array_header_1_0(
+            header,
+            {
+                "descr": np.lib.format.dtype_to_descr(np.dtype(data_type)),
+                "fortran_order": False,
+                "shape": tuple(shape),
+            },
+        )
+        return header.getvalue()
+
+    @staticmethod
+    def read_npy_header(content: bytes) -> tuple[np.dtype, int]:
+        """Read the data type and header length from the start of an NPY buffer.
+
+        Args:
+            content (bytes): NPY buffer, or at least its complete header
+
+        Returns
+        -------
+            tuple[np.dtype, int]: Data type of array elements and length of the header in bytes
+        """
+        buffer = io.BytesIO(content)
+        if np.lib.format.read_magic(buffer) == (1, 0):
+            _, _, data_type = np.lib.format.read_array_header_1_0(buffer)
+        else:
+            _, _, data_type = np.lib.format.read_array_header_2_0(buffer)
+        return data_type, buffer.tell()
+
+    @staticmethod
+    def generate_npy_from_ndarray(array: npt.NDArray) -> bytes:
+        """Convert numpy-based arrays to the binary NPY format.
+
+        The raw array buffer is written after the header, so no per-element
+        Python objects are created.
+
+        Args:
+            array (npt.NDArray): Numpy NDArray representing a dataset
+
+        Raises
+        ------
+            SWIFTProcessorError: Raised for object arrays, which have no raw buffer.
+
+        Returns
+        -------
+            bytes: NPY encoded array, preserving data type, shape and byte order
+        """
+        if array.dtype.hasobject:
+            message = "Arrays of Python objects cannot be sent in binary format."
+            raise SWIFTProcessorError(message)
+
+        array = np.ascontiguousarray(array)
+        payload = io.BytesIO()
+        payload.write(SWIFTProcessor.generate_npy_header(array.dtype, array.shape))
+        payload.write(array.reshape(-1).view(np.uint8))
+        return payload.getvalue()
+
+    @staticmethod
+    def generate_npy_stream(
+        data_type: np.dtype,
+        shape: tuple[int, ...],
+        blocks: Iterator[npt.NDArray],
+    ) -> Iterator[bytes]:
+        """Encode blocks of an array as a stream of NPY-formatted bytes.
+
+        Args:
+            data_type (np.dtype): Data type of the full array
+            shape (tuple[int, ...]): Shape of the full array
+            blocks (Iterator[npt.NDArray]): Consecutive blocks of rows of the array
+
+        Yields
+        ------
+            bytes: The NPY header, followed by the raw buffer of each block
+        """
+        yield SWIFTProcessor.generate_npy_header(data_type, shape)
+        for block in blocks:
+            yield np.ascontiguousarray(block, dtype=data_type).tobytes()
+
     @staticmethod
     def get_array_masked(
         filename: str,
@@ -141,45 +292,295 @@ class SWIFTProcessor:
             data_type=mask_data_type,
         )
 
+        return SWIFTProcessor.get_array_masked_from_ranges(
+            filename,
+            field,
+            mask,
+            mask_size,
+            columns,
+        )
+
+    @staticmethod
+    @timed("read")
+    def get_array_masked_from_ranges(
+        filename: str,
+        field: str,
+        mask: npt.NDArray,
+        mask_size: int,
+        columns: None | np.lib.index_tricks.IndexExpression = None,
+        output_dtype: np.dtype | None = None,
+    ) -> npt.NDArray | None:
+        """Retrieve a masked array using an already decoded mask.
+
+        Args:
+            filename (str): Path to HDF5 file
+            field (str): Field path to retrieve
+            mask (npt.NDArray): Array of [start, stop) row ranges
+            mask_size (int): Size of array mask
+            columns (None | np.lib.index_tricks.IndexExpression, optional):
+                Selector for columns in the case of multidim arrays. Defaults to None.
+            output_dtype (np.dtype | None, optional):
+                Data type to convert the array to while reading. Defaults to None.
+
+        Returns
+        -------
+            npt.NDArray | None: Array with requested elements.
+        """
+        with get_file_pool().open(filename) as handle:
+            return SWIFTProcessor.read_masked_dataset(
+                handle,
+                field,
+                mask,
+                mask_size,
+                columns,
+                output_dtype,
+            )
+
+    @staticmethod
+    @timed("read")
+    def get_arrays_masked_from_ranges(
+        filename: str,
+        fields: list[str],
+        mask: npt.NDArray,
+        mask_size: int,
+        columns: list[int | None] | None = None,
+    ) -> dict[str, npt.NDArray]:
+        """Retrieve several masked arrays from one file using the same mask.
+
+        The file is opened once and the decoded mask is shared by every field.
+
+        Args:
+            filename (str): Path to HDF5 file
+            fields (list[str]): Field paths to retrieve
+            mask (npt.NDArray): Array of [start, stop) row ranges
+            mask_size (int): Size of array mask
+            columns (list[int | None] | None, optional):
+                Column selector for each field, or None for all columns. Defaults to None.
+
+        Raises
+        ------
+            SWIFTProcessorError: Raised if a field is not found in the file.
+
+        Returns
+        -------
+            dict[str, npt.NDArray]: Masked arrays keyed by field
+        """
+        if columns is None:
+            columns = [None] * len(fields)
+
+        with get_file_pool().open(filename) as handle:
+            return {
+                field: SWIFTProcessor.read_masked_dataset(
+                    handle,
+                    field,
+                    mask,
+                    mask_size,
+                    field_columns,
+                )
+                for field, field_columns in zip(fields, columns, strict=True)
+            }
+
+    @staticmethod
+    def read_masked_dataset(
+        handle: h5py.File,
+        field: str,
+        mask: npt.NDArray,
+        mask_size: int,
+        columns: None | np.lib.index_tricks.IndexExpression = None,
+        output_dtype: np.dtype | None = None,
+    ) -> npt.NDArray:
+        """Read the masked rows of a field from an open file.
+
+        The ranges are read according to a chunk-aware read plan, from a
+        memory map where the dataset allows it. Rows are converted to the
+        output data type one read at a time as they are copied to the output.
+
+        Args:
+            handle (h5py.File): Open HDF5 file
+            field (str): Field path to retrieve
+            mask (npt.NDArray): Array of [start, stop) row ranges
+            mask_size (int): Size of array mask
+            columns (None | np.lib.index_tricks.IndexExpression, optional):
+                Selector for columns in the case of multidim arrays. Defaults to None.
+            output_dtype (np.dtype | None, optional):
+                Data type to convert the array to while reading. Defaults to None.
+
+        Raises
+        ------
+            SWIFTProcessorError: Raised if the field is not found in the file.
+
+        Returns
+        -------
+            npt.NDArray: Array with requested elements.
+        """
         use_columns = columns is not None
 
         if not use_columns:
             columns = np.s_[:]
 
-        with h5py.File(filename, "r") as handle:
+        try:
+            dataset = handle[field]
+        except KeyError as error:
+            message = f"Field {field} not found in {handle.filename}."
+            raise SWIFTProcessorError(message) from error
+        first_value = dataset[0]
+
+        output_type = first_value.dtype if output_dtype is None else output_dtype
+        output_size = first_value.size
+
+        if output_size != 1 and not use_columns:
+            output_shape = (mask_size, output_size)
+        else:
+            output_shape = mask_size  # type: ignore
+
+        plan = SWIFTProcessor.plan_masked_read(dataset, mask)
+        if plan.size != mask_size:
+            message = f"Mask selects {plan.size} rows but the mask size is {mask_size}."
+            raise SWIFTProcessorError(message)
+
+        source = SWIFTProcessor.map_dataset(dataset)
+        if source is None:
+            source = dataset
+        return execute_read_plan(
+            plan,
+            source,
+            np.empty(output_shape, dtype=output_type),
+            columns,
+        )
+
+    @staticmethod
+    def plan_masked_read(dataset: h5py.Dataset, mask: npt.NDArray) -> ReadPlan:
+        """Plan the reads needed for the masked rows of a dataset.
+
+        Ranges separated by fewer than READ_MERGE_GAP_BYTES are read together,
+        in reads of up to DEFAULT_BLOCK_SIZE_BYTES unless they share a chunk.
+
+        Args:
+            dataset (h5py.Dataset): Dataset to read
+            mask (npt.NDArray): Array of [start, stop) row ranges
+
+        Raises
+        ------
+            SWIFTProcessorError: Raised if a range is reversed or lies outside the dataset.
+
+        Returns
+        -------
+            ReadPlan: Reads covering the masked rows
+        """
+        ranges = np.asarray(mask).reshape(-1, 2)
+        total_rows = dataset.shape[0]
+        invalid = (ranges[:, 0] < 0) | (ranges[:, 1] > total_rows) | (ranges[:, 1] < ranges[:, 0])
+        if np.any(invalid):
+            start, stop = ranges[np.argmax(invalid)].tolist()
+            message = (
+                f"Mask range [{start}, {stop}) is not within the {total_rows} rows "
+                f"of {dataset.name}."
+            )
+            raise SWIFTProcessorError(message)
+
+        row_size_bytes = max(dataset.dtype.itemsize * int(np.prod(dataset.shape[1:])), 1)
+        return plan_reads(
+            ranges,
+            total_rows,
+            None if dataset.chunks is None else dataset.chunks[0],
+            get_settings().read_merge_gap_bytes // row_size_bytes,
+            SWIFTProcessor.get_block_rows(dataset, DEFAULT_BLOCK_SIZE_BYTES),
+        )
+
+    @staticmethod
+    def explain_masked_read(filename: str, field: str, mask: npt.NDArray) -> dict[str, Any]:
+        """Describe the reads a masked request would make, without reading any data.
+
+        Args:
+            filename (str): Path to HDF5 file
+            field (str): Field path to retrieve
+            mask (npt.NDArray): Array of [start, stop) row ranges
+
+        Raises
+        ------
+            SWIFTProcessorError: Raised if the field is not found in the file.
+
+        Returns
+        -------
+            dict[str, Any]: Summary of the planned reads and the chunks and bytes they touch
+        """
+        with get_file_pool().open(filename) as handle:
             try:
-                first_value = handle[field][0]
-                output_type = first_value.dtype
-                output_size = first_value.size
-
-                if output_size != 1 and not use_columns:
-                    output_shape = (mask_size, output_size)
-                else:
-                    output_shape = mask_size  # type: ignore
-                return read_ranges_from_file(
-                    handle[field],
-                    mask,
-                    output_shape=output_shape,
-                    output_type=output_type,
-                    columns=columns,
-                )
-            except KeyError:
+                dataset = handle[field]
+            except KeyError as error:
                 message = f"Field {field} not found in {filename}."
-                raise SWIFTProcessorError(message) from KeyError
+                raise SWIFTProcessorError(message) from error
+
+            plan = SWIFTProcessor.plan_masked_read(dataset, mask)
+            mapped = SWIFTProcessor.map_dataset(dataset) is not None
+            return explain_read_plan(plan, dataset, mapped=mapped)
 
     @staticmethod
+    def map_dataset(dataset: h5py.Dataset) -> npt.NDArray | None:
+        """Memory-map the raw bytes of a contiguous, unfiltered dataset.
+
+        Rows are then copied straight from the page cache, bypassing the HDF5
+        library. Chunked, filtered, external, virtual and non-numeric datasets,
+        and files not opened with the default driver, cannot be mapped.
+
+        Args:
+            dataset (h5py.Dataset): Dataset to map
+
+        Returns
+        -------
+            npt.NDArray | None: Read-only array backed by the file, or None if the dataset
+                must be read through HDF5
+        """
+        create_plist = dataset.id.get_create_plist()
+        if (
+            dataset.file.driver != "sec2"
+            or create_plist.get_layout() != h5py.h5d.CONTIGUOUS
+            or create_plist.get_nfilters()
+            or create_plist.get_external_count()
+            or dataset.dtype.kind not in "biufc"
+            or dataset.size == 0
+        ):
+            return None
+
+        offset = dataset.id.get_offset()
+        if offset is None:
+            return None
+
+        return np.asarray(
+            np.memmap(
+                dataset.file.filename,
+                dtype=dataset.dtype,
+                mode="r",
+                offset=offset,
+                shape=dataset.shape,
+            ),
+        )
+
+    @staticmethod
+    @timed("read")
     def get_array_unmasked(
         filename: str,
         field: str,
         columns: None | np.lib.index_tricks.IndexExpression = None,
+        start: int | None = None,
+        stop: int | None = None,
+        output_dtype: np.dtype | None = None,
     ) -> np.array:
         """Retrieve an unmasked array.
 
+        Conversion to the output data type happens while reading, through the
+        HDF5 type conversion or directly from the memory map, so no full-size
+        copy in the stored data type is made.
+
         Args:
             filename (str): Path to HDF5 file
             field (str): Field to retrieve
             columns (None | np.lib.index_tricks.IndexExpression, optional):
                 Selector for columns in the case of multidim arrays. Defaults to None.
+            start (int | None, optional): First row to read. Defaults to None.
+            stop (int | None, optional): Row after the last row to read. Defaults to None.
+            output_dtype (np.dtype | None, optional):
+                Data type to convert the array to while reading. Defaults to None.
 
         Returns
         -------
@@ -189,15 +590,286 @@ class SWIFTProcessor:
 
         if not use_columns:
             columns = np.s_[:]
-        with h5py.File(filename, "r") as handle:
+        rows = np.s_[start:stop]
+        with get_file_pool().open(filename) as handle:
             try:
-                result_array = (
-                    handle[field][:, columns]
-                    if handle[field].ndim > 1
-                    else handle[field][:]
-                )
-
+                dataset = handle[field]
+                source = SWIFTProcessor.map_dataset(dataset)
+                if source is None:
+                    source = dataset if output_dtype is None else dataset.astype(output_dtype)
+                result_array = source[rows, columns] if dataset.ndim > 1 else source[rows]
+                record_hdf5_read(result_array.nbytes)
+
+                if output_dtype is not None:
+                    return result_array.astype(output_dtype, copy=False)
                 return result_array
             except KeyError:
                 logger.error(f"Could not read {field}")
                 return None
+
+    @staticmethod
+    def resolve_output_dtype(
+        source_dtype: np.dtype,
+        output_dtype: str,
+        *,
+        allow_unsafe_cast: bool = False,
+    ) -> np.dtype:
+        """Check that an array can be converted to a requested data type.
+
+        Conversions that cannot lose information are always allowed, as is
+        narrowing a floating-point or complex type to at least single
+        precision, such as float64 to float32. Other conversions, including
+        narrowing to float16 and narrowing integers, must be explicitly allowed.
+
+        Args:
+            source_dtype (np.dtype): Data type of the stored array
+            output_dtype (str): Requested data type
+            allow_unsafe_cast (bool, optional):
+                Allow conversions that may change values. Defaults to False.
+
+        Raises
+        ------
+            SWIFTProcessorError: Raised for invalid or non-numeric types and disallowed casts.
+
+        Returns
+        -------
+            np.dtype: Data type to convert the array to
+        """
+        try:
+            target_dtype = np.dtype(output_dtype)
+        except TypeError as error:
+            message = f"Invalid output data type {output_dtype}."
+            raise SWIFTProcessorError(message) from error
+
+        if target_dtype.fields is not None or target_dtype.kind not in "biufc":
+            message = f"Arrays can only be converted to numeric types, not {target_dtype}."
+            raise SWIFTProcessorError(message)
+
+        narrows_float = (
+            source_dtype.kind in MIN_IMPLICIT_NARROWING_DTYPES
+            and target_dtype.kind == source_dtype.kind
+            and target_dtype.itemsize >= MIN_IMPLICIT_NARROWING_DTYPES[source_dtype.kind].itemsize
+        )
+        if not (
+            allow_unsafe_cast
+            or narrows_float
+            or np.can_cast(source_dtype, target_dtype, casting="safe")
+        ):
+            message = (
+                f"Converting {source_dtype} to {target_dtype} may change values. "
+                "Set allow_unsafe_cast to convert anyway."
+            )
+            raise SWIFTProcessorError(message)
+
+        return target_dtype
+
+    @staticmethod
+    def get_field_dtype(filename: str, field: str) -> np.dtype:
+        """Retrieve the stored data type of a field.
+
+        Args:
+            filename (str): Path to HDF5 file
+            field (str): Field path
+
+        Raises
+        ------
+            SWIFTProcessorError: Raised if the field is not found in the file.
+
+        Returns
+        -------
+            np.dtype: Data type of the field
+        """
+        with get_file_pool().open(filename) as handle:
+            try:
+                return handle[field].dtype
+            except KeyError as error:
+                message = f"Field {field} not found in {filename}."
+                raise SWIFTProcessorError(message) from error
+
+    @staticmethod
+    def get_row_count(filename: str, field: str) -> int:
+        """Retrieve the number of rows in a dataset.
+
+        Args:
+            filename (str): Path to HDF5 file
+            field (str): Field to inspect
+
+        Raises
+        ------
+            SWIFTProcessorError: Raised if the field is not found in the file.
+
+        Returns
+        -------
+            int: Length of the first dimension of the dataset
+        """
+        with get_file_pool().open(filename) as handle:
+            try:
+                return handle[field].shape[0]
+            except KeyError as error:
+                message = f"Field {field} not found in {filename}."
+                raise SWIFTProcessorError(message) from error
+
+    @staticmethod
+    def generate_npz_from_ndarrays(arrays: dict[str, npt.NDArray]) -> bytes:
+        """Pack several named arrays into a single NPZ archive.
+
+        Each array is stored uncompressed in NPY format, so clients can read all
+        of them from one response with `numpy.load`.
+
+        Args:
+            arrays (dict[str, npt.NDArray]): Arrays keyed by name
+
+        Raises
+        ------
+            SWIFTProcessorError: Raised for object arrays, which have no raw buffer.
+
+        Returns
+        -------
+            bytes: NPZ archive of the arrays
+        """
+        if any(array.dtype.hasobject for array in arrays.values()):
+            message = "Arrays of Python objects cannot be sent in binary format."
+            raise SWIFTProcessorError(message)
+
+        payload = io.BytesIO()
+        np.savez(payload, **arrays)
+        return payload.getvalue()
+
+    @staticmethod
+    def get_block_rows(dataset: h5py.Dataset, block_size_bytes: int) -> int:
+        """Calculate the number of rows to read from a dataset at a time.
+
+        Blocks are rounded down to a whole number of HDF5 chunks so that each
+        chunk is only read and decompressed once.
+
+        Args:
+            dataset (h5py.Dataset): Dataset to be read in blocks
+            block_size_bytes (int): Approximate size of each block in bytes
+
+        Returns
+        -------
+            int: Number of rows per block, at least one row or chunk
+        """
+        row_size_bytes = dataset.dtype.itemsize * int(np.prod(dataset.shape[1:]))
+        block_rows = max(block_size_bytes // max(row_size_bytes, 1), 1)
+
+        if dataset.chunks is not None:
+            chunk_rows = dataset.chunks[0]
+            block_rows = max(block_rows // chunk_rows, 1) * chunk_rows
+
+        return block_rows
+
+    @staticmethod
+    def get_array_unmasked_stream(
+        filename: str,
+        field: str,
+        columns: None | np.lib.index_tricks.IndexExpression = None,
+        block_size_bytes: int = DEFAULT_BLOCK_SIZE_BYTES,
+        start: int | None = None,
+        stop: int | None = None,
+        output_dtype: np.dtype | None = None,
+    ) -> tuple[np.dtype, tuple[int, ...], Iterator[npt.NDArray]]:
+        """Retrieve an unmasked array as an iterator over blocks of rows.
+
+        The dataset is validated up front so that errors can be reported before
+        any data is sent, then read lazily in chunk-aligned blocks.
+
+        Args:
+            filename (str): Path to HDF5 file
+            field (str): Field to retrieve
+            columns (None | np.lib.index_tricks.IndexExpression, optional):
+                Selector for columns in the case of multidim arrays. Defaults to None.
+            block_size_bytes (int, optional):
+                Approximate size of each block read from the file.
+                Defaults to DEFAULT_BLOCK_SIZE_BYTES.
+            start (int | None, optional): First row to read. Defaults to None.
+            stop (int | None, optional): Row after the last row to read. Defaults to None.
+            output_dtype (np.dtype | None, optional):
+                Data type each block is converted to. Defaults to None.
+
+        Raises
+        ------
+            SWIFTProcessorError: Raised if the field is not found in the file.
+
+        Returns
+        -------
+            tuple[np.dtype, tuple[int, ...], Iterator[npt.NDArray]]:
+                Data type and shape of the requested rows, and an iterator over their blocks
+        """
+        with get_file_pool().open(filename) as handle:
+            try:
+                dataset = handle[field]
+            except KeyError as error:
+                message = f"Field {field} not found in {filename}."
+                raise SWIFTProcessorError(message) from error
+
+            start, stop, _ = slice(start, stop).indices(dataset.shape[0])
+            stop = max(start, stop)
+
+            data_type = dataset.dtype if output_dtype is None else output_dtype
+            shape = (stop - start, *dataset.shape[1:])
+            if dataset.ndim > 1 and columns is not None:
+                shape = (stop - start, *dataset[0:0, columns].shape[1:])
+            block_rows = SWIFTProcessor.get_block_rows(dataset, block_size_bytes)
+
+        return (
+            data_type,
+            shape,
+            SWIFTProcessor._iterate_blocks(
+                filename,
+                field,
+                columns,
+                block_rows,
+                start,
+                stop,
+                output_dtype,
+            ),
+        )
+
+    @staticmethod
+    def _iterate_blocks(
+        filename: str,
+        field: str,
+        columns: None | np.lib.index_tricks.IndexExpression,
+        block_rows: int,
+        start: int,
+        stop: int,
+        output_dtype: np.dtype | None = None,
+    ) -> Iterator[npt.NDArray]:
+        """Yield consecutive blocks of rows from a dataset.
+
+        Block boundaries fall on multiples of the block size, so blocks stay
+        chunk-aligned when reading starts part way through a chunk.
+
+        Args:
+            filename (str): Path to HDF5 file
+            field (str): Field to retrieve
+            columns (None | np.lib.index_tricks.IndexExpression):
+                Selector for columns in the case of multidim arrays.
+            block_rows (int): Number of rows in each block
+            start (int): First row to read
+            stop (int): Row after the last row to read
+            output_dtype (np.dtype | None, optional):
+                Data type each block is converted to. Defaults to None.
+
+        Yields
+        ------
+            npt.NDArray: Blocks of the requested array
+        """
+        if columns is None:
+            columns = np.s_[:]
+
+        with get_file_pool().open(filename) as handle:
+            dataset = handle[field]
+            source = SWIFTProcessor.map_dataset(dataset)
+            if source is None:
+                source = dataset
+            block_start = start
+            while block_start < stop:
+                block_stop = min((block_start // block_rows + 1) * block_rows, stop)
+                rows = np.s_[block_start:block_stop]
+                with timed("read"):
+                    block = source[rows, columns] if dataset.ndim > 1 else source[rows]
+                record_hdf5_read(block.nbytes)
+                yield block if output_dtype is None else block.astype(output_dtype, copy=False)
+                block_start = block_stop
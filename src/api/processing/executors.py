@@ -0,0 +1,176 @@
+"""Run blocking HDF5 work on dedicated, bounded thread pools.
+
+Reading from HDF5 files through h5py and SWIFTsimIO blocks the calling thread.
+Running that work in Starlette's default threadpool lets a few large reads
+starve unrelated handlers such as authentication, so data reads and metadata
+requests each get their own pool sized from settings.
+"""
+import asyncio
+import contextvars
+import functools
+import threading
+from collections.abc import AsyncIterator, Callable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, TypeVar
+
+from loguru import logger
+
+from api.config import get_settings
+from api.processing.metrics import EXECUTOR_TASKS
+from api.profiling import get_request_profile
+
+T = TypeVar("T")
+
+_END_OF_ITERATOR = object()
+
+
+class BoundedExecutor:
+    """Thread pool with a fixed number of workers that reports its load.
+
+    Tracks the number of tasks waiting for a worker and the number currently running,
+    and records both in the Prometheus metrics as they change.
+    """
+
+    def __init__(self, name: str, max_workers: int):
+        """Class constructor.
+
+        Args:
+            name (str): Name of the pool, used to label worker threads
+            max_workers (int): Maximum number of tasks run concurrently
+        """
+        self.name = name
+        self.max_workers = max_workers
+
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix=f"swift-{name}")
+        self._lock = threading.Lock()
+
+        self.queued = 0
+        self.active = 0
+        self._record_tasks()
+
+    async def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run a blocking function on the pool and wait for its result.
+
+        The caller's context variables are copied to the worker thread. Tasks
+        run for a profiled request are run under a profiler.
+
+        Args:
+            func (Callable[..., T]): Function to run
+            *args (Any): Positional arguments passed to the function
+            **kwargs (Any): Keyword arguments passed to the function
+
+        Returns
+        -------
+            T: Value returned by the function
+        """
+        context = contextvars.copy_context()
+        call = functools.partial(context.run, func, *args, **kwargs)
+        profile = get_request_profile()
+        if profile is not None:
+            call = functools.partial(profile.run, call)
+
+        with self._lock:
+            self.queued += 1
+            self._record_tasks()
+        future = self._executor.submit(self._run_tracked, call)
+        future.add_done_callback(self._discard_cancelled)
+
+        return await asyncio.wrap_future(future)
+
+    async def iterate(self, iterator: Iterator[T]) -> AsyncIterator[T]:
+        """Consume a blocking iterator on the pool, one item at a time.
+
+        Args:
+            iterator (Iterator[T]): Iterator whose items are produced by blocking reads
+
+        Yields
+        ------
+            T: Items produced by the iterator
+        """
+        while True:
+            item = await self.run(next, iterator, _END_OF_ITERATOR)
+            if item is _END_OF_ITERATOR:
+                return
+            yield item
+
+    def _run_tracked(self, call: Callable[[], T]) -> T:
+        """Run a task on a worker thread, updating the load counts.
+
+        Args:
+            call (Callable[[], T]): Task to run
+
+        Returns
+        -------
+            T: Value returned by the task
+        """
+        with self._lock:
+            self.queued -= 1
+            self.active += 1
+            self._record_tasks()
+        try:
+            return call()
+        finally:
+            with self._lock:
+                self.active -= 1
+                self._record_tasks()
+
+    def _discard_cancelled(self, future: Future) -> None:
+        """Stop counting a queued task that was cancelled before starting.
+
+        Args:
+            future (Future): Completed future for the task
+        """
+        if future.cancelled():
+            with self._lock:
+                self.queued -= 1
+                self._record_tasks()
+
+    def _record_tasks(self) -> None:
+        """Report the queued and active task counts. Must be called while holding the lock."""
+        EXECUTOR_TASKS.labels(executor=self.name, state="queued").set(self.queued)
+        EXECUTOR_TASKS.labels(executor=self.name, state="active").set(self.active)
+
+    def shutdown(self) -> None:
+        """Stop accepting tasks and wait for running tasks to finish."""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def stats(self) -> dict[str, int]:
+        """Report pool load.
+
+        Returns
+        -------
+            dict[str, int]: Number of workers, queued tasks and active tasks
+        """
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "queued": self.queued,
+                "active": self.active,
+            }
+
+
+@lru_cache
+def get_data_executor() -> BoundedExecutor:
+    """Retrieve the executor used for reading datasets, configured from settings.
+
+    Returns
+    -------
+        BoundedExecutor: Shared executor for heavy data reads
+    """
+    settings = get_settings()
+    logger.info(f"Creating data executor with {settings.data_executor_workers} workers")
+    return BoundedExecutor("data", settings.data_executor_workers)
+
+
+@lru_cache
+def get_metadata_executor() -> BoundedExecutor:
+    """Retrieve the executor used for metadata, units and masks, configured from settings.
+
+    Returns
+    -------
+        BoundedExecutor: Shared executor for light metadata requests
+    """
+    settings = get_settings()
+    logger.info(f"Creating metadata executor with {settings.metadata_executor_workers} workers")
+    return BoundedExecutor("metadata", settings.metadata_executor_workers)
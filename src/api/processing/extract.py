@@ -0,0 +1,320 @@
+"""Write a masked subset of a snapshot to a new, self-contained HDF5 file.
+
+The subset keeps the header, units, parameters and cell metadata of the
+snapshot, so it can be opened with `swiftsimio.load`. Particle counts in the
+header, and the counts and offsets of each cell, are updated to describe
+the selected rows. Fields are copied in blocks of rows, so the full fields
+are never held in memory.
+"""
+from collections.abc import Callable
+from pathlib import Path
+
+import h5py
+import numpy as np
+import numpy.typing as npt
+
+from api.processing.aggregation import get_dataset, split_ranges
+from api.processing.data_processing import (
+    DEFAULT_BLOCK_SIZE_BYTES,
+    SWIFTProcessor,
+    SWIFTProcessorError,
+)
+from api.processing.file_pool import get_file_pool
+
+PARTICLE_GROUP_PREFIX = "PartType"
+CELL_OFFSET_GROUPS = ("Cells/OffsetsInFile", "Cells/Offsets")
+HEADER_COUNT_BITS = 32
+
+
+def count_rows_before(ranges: npt.NDArray, rows: npt.NDArray) -> npt.NDArray:
+    """Count the selected rows lying before each of a set of row indices.
+
+    Args:
+        ranges (npt.NDArray): Sorted, non-overlapping [start, stop) row ranges
+        rows (npt.NDArray): Row indices
+
+    Returns
+    -------
+        npt.NDArray: Number of selected rows before each row index
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    lengths = ranges[:, 1] - ranges[:, 0]
+    selected_before = np.cumsum(lengths) - lengths
+
+    indices = np.searchsorted(ranges[:, 0], rows, side="right") - 1
+    counts = np.zeros(len(rows), dtype=np.int64)
+    inside = indices >= 0
+    indices = indices[inside]
+    counts[inside] = selected_before[indices] + np.clip(
+        rows[inside] - ranges[indices, 0],
+        0,
+        lengths[indices],
+    )
+    return counts
+
+
+def subset_cells(
+    counts: npt.NDArray,
+    offsets: npt.NDArray,
+    ranges: npt.NDArray,
+) -> tuple[npt.NDArray, npt.NDArray]:
+    """Recalculate the particle counts and offsets of each cell for a subset of rows.
+
+    Args:
+        counts (npt.NDArray): Number of rows in each cell
+        offsets (npt.NDArray): First row of each cell
+        ranges (npt.NDArray): Sorted, non-overlapping [start, stop) row ranges kept
+
+    Returns
+    -------
+        tuple[npt.NDArray, npt.NDArray]: Counts and offsets of each cell in the subset
+    """
+    first = count_rows_before(ranges, offsets)
+    last = count_rows_before(ranges, np.asarray(offsets) + np.asarray(counts))
+    return (last - first).astype(counts.dtype), first.astype(offsets.dtype)
+
+
+def copy_attributes(source: h5py.HLObject, destination: h5py.HLObject) -> None:
+    """Copy every attribute of an HDF5 object, keeping their stored types.
+
+    Args:
+        source (h5py.HLObject): Object to copy attributes from
+        destination (h5py.HLObject): Object to copy attributes to
+    """
+    for name, value in source.attrs.items():
+        destination.attrs.create(name, value)
+
+
+def write_field_subset(
+    handle: h5py.File,
+    output: h5py.File,
+    field: str,
+    ranges: npt.NDArray,
+    size: int,
+    block_size_bytes: int,
+) -> None:
+    """Copy the selected rows of one field to the output file, one block at a time.
+
+    Args:
+        handle (h5py.File): Open snapshot
+        output (h5py.File): Open output file
+        field (str): Field path to copy
+        ranges (npt.NDArray): Sorted, non-overlapping [start, stop) row ranges to keep
+        size (int): Number of rows selected by the ranges
+        block_size_bytes (int): Approximate size of each block copied
+    """
+    source = get_dataset(handle, field)
+    filters = {}
+    if source.compression is not None and size > 0:
+        filters = {
+            "compression": source.compression,
+            "compression_opts": source.compression_opts,
+            "shuffle": source.shuffle,
+        }
+    destination = output.create_dataset(
+        field,
+        shape=(size, *source.shape[1:]),
+        dtype=source.dtype,
+        **filters,
+    )
+    copy_attributes(source, destination)
+
+    first_row = 0
+    block_rows = SWIFTProcessor.get_block_rows(source, block_size_bytes)
+    for block_ranges in split_ranges(ranges, block_rows):
+        block_size = int(np.sum(block_ranges[:, 1] - block_ranges[:, 0]))
+        destination[first_row : first_row + block_size] = SWIFTProcessor.read_masked_dataset(
+            handle,
+            field,
+            block_ranges,
+            block_size,
+        )
+        first_row += block_size
+
+
+def update_cells(
+    output: h5py.File,
+    ranges: dict[str, npt.NDArray],
+) -> None:
+    """Rewrite the cell counts and offsets of the output file for the selected rows.
+
+    Particle types that were not extracted are left with empty cells.
+
+    Args:
+        output (h5py.File): Open output file, holding a copy of the snapshot cells
+        ranges (dict[str, npt.NDArray]): Row ranges kept, keyed by particle group
+    """
+    if "Cells/Counts" not in output:
+        return
+    offsets_group = next((name for name in CELL_OFFSET_GROUPS if name in output), None)
+
+    for group, counts_dataset in output["Cells/Counts"].items():
+        counts = counts_dataset[:]
+        offsets_path = f"{offsets_group}/{group}"
+        offsets = output[offsets_path][:] if offsets_group else np.cumsum(counts) - counts
+
+        if group in ranges:
+            counts, offsets = subset_cells(counts, offsets, ranges[group])
+        else:
+            counts, offsets = np.zeros_like(counts), np.zeros_like(offsets)
+
+        counts_dataset[...] = counts
+        if offsets_group:
+            output[offsets_path][...] = offsets
+
+
+def update_header(output: h5py.File, sizes: dict[str, int]) -> None:
+    """Rewrite the particle counts in the header of the output file.
+
+    Args:
+        output (h5py.File): Open output file, holding a copy of the snapshot header
+        sizes (dict[str, int]): Number of rows kept, keyed by particle group
+    """
+    if "Header" not in output:
+        return
+    header = output["Header"].attrs
+
+    counts = np.zeros(len(header["NumPart_ThisFile"]), dtype=np.int64)
+    for group, size in sizes.items():
+        counts[int(group.removeprefix(PARTICLE_GROUP_PREFIX))] = size
+
+    header["NumPart_ThisFile"] = counts.astype(header["NumPart_ThisFile"].dtype)
+    if "NumPart_Total" in header:
+        low_words = counts & (2**HEADER_COUNT_BITS - 1)
+        header["NumPart_Total"] = low_words.astype(header["NumPart_Total"].dtype)
+    if "NumPart_Total_HighWord" in header:
+        high_words = counts >> HEADER_COUNT_BITS
+        header["NumPart_Total_HighWord"] = high_words.astype(
+            header["NumPart_Total_HighWord"].dtype,
+        )
+
+
+def select_group_fields(
+    handle: h5py.File,
+    groups: list[str],
+    fields: list[str] | None,
+) -> dict[str, list[str]]:
+    """Find the fields to copy for each particle type.
+
+    Requested fields missing from some particle types, such as Masses for
+    black holes, are skipped for those types.
+
+    Args:
+        handle (h5py.File): Open snapshot
+        groups (list[str]): Particle groups to copy
+        fields (list[str] | None): Names of the fields to copy, or None for every field
+
+    Raises
+    ------
+        SWIFTProcessorError:
+            Raised for missing particle types, and fields missing from every particle type.
+
+    Returns
+    -------
+        dict[str, list[str]]: Names of the fields to copy, keyed by particle group
+    """
+    group_fields = {}
+    for group in groups:
+        if not isinstance(handle.get(group), h5py.Group):
+            message = f"Particle type {group} not found in {handle.filename}."
+            raise SWIFTProcessorError(message)
+        datasets = [
+            name for name, value in handle[group].items() if isinstance(value, h5py.Dataset)
+        ]
+        if fields is not None:
+            datasets = [field for field in fields if field in datasets]
+        group_fields[group] = datasets
+
+    found = {field for names in group_fields.values() for field in names}
+    missing = [field for field in fields or [] if field not in found]
+    if missing:
+        message = f"Fields {', '.join(missing)} not found in any requested particle type."
+        raise SWIFTProcessorError(message)
+    return group_fields
+
+
+def extract_snapshot(
+    filename: str,
+    output_file: Path,
+    selections: dict[str, npt.NDArray | None],
+    fields: list[str] | None = None,
+    block_size_bytes: int = DEFAULT_BLOCK_SIZE_BYTES,
+    progress: Callable[[float], None] | None = None,
+) -> dict[str, int]:
+    """Write the selected rows of some particle types to a new snapshot file.
+
+    Args:
+        filename (str): Path to the snapshot
+        output_file (Path): Path of the file to write
+        selections (dict[str, npt.NDArray | None]):
+            Sorted, non-overlapping row ranges to keep, or None to keep every row,
+            keyed by particle group
+        fields (list[str] | None, optional):
+            Names of the fields to copy for each particle type, e.g. "Masses",
+            skipped for types without them. Defaults to None, copying every field.
+        block_size_bytes (int, optional):
+            Approximate size of each block copied. Defaults to DEFAULT_BLOCK_SIZE_BYTES.
+        progress (Callable[[float], None] | None, optional):
+            Called with the fraction of fields copied after each field. Defaults to None.
+
+    Raises
+    ------
+        SWIFTProcessorError: Raised for missing particle types or fields, and out of range masks.
+
+    Returns
+    -------
+        dict[str, int]: Number of rows written, keyed by particle group
+    """
+    with get_file_pool().open(filename) as handle, h5py.File(output_file, "w") as output:
+        group_fields = select_group_fields(handle, list(selections), fields)
+        total_fields = sum(len(names) for names in group_fields.values())
+        copied_fields = 0
+
+        links = {}
+        for name in handle:
+            link = handle.get(name, getlink=True)
+            if isinstance(link, h5py.SoftLink):
+                links[name] = link.path
+            elif not name.startswith(PARTICLE_GROUP_PREFIX):
+                handle.copy(handle[name], output, name=name)
+
+        ranges, sizes = {}, {}
+        for group, group_ranges in selections.items():
+            rows = next(
+                (
+                    dataset.shape[0]
+                    for dataset in handle[group].values()
+                    if isinstance(dataset, h5py.Dataset)
+                ),
+                0,
+            )
+
+            if group_ranges is None:
+                group_ranges = np.array([[0, rows]], dtype=np.int64)
+            if group_ranges.size and (group_ranges[0, 0] < 0 or group_ranges[-1, 1] > rows):
+                message = f"Mask selects rows outside the {rows} rows of {group}."
+                raise SWIFTProcessorError(message)
+            ranges[group] = group_ranges
+            sizes[group] = int(np.sum(group_ranges[:, 1] - group_ranges[:, 0]))
+
+            copy_attributes(handle[group], output.create_group(group))
+            for field in group_fields[group]:
+                write_field_subset(
+                    handle,
+                    output,
+                    f"{group}/{field}",
+                    group_ranges,
+                    sizes[group],
+                    block_size_bytes,
+                )
+                copied_fields += 1
+                if progress is not None:
+                    progress(copied_fields / total_fields)
+
+        update_cells(output, ranges)
+        update_header(output, sizes)
+        for name, path in links.items():
+            if path.lstrip("/") in output:
+                output[name] = h5py.SoftLink(path)
+
+    return sizes
@@ -0,0 +1,288 @@
+"""Maintain a process-wide pool of open, read-only HDF5 file handles.
+
+Opening a snapshot requires a metadata round-trip to the filesystem, which is
+slow on parallel filesystems such as Lustre. Handles are kept open between
+requests, keyed by resolved path, and closed when they are least recently
+used, idle for too long or when the file on disk changes.
+
+While a pooled handle is open, any other `h5py.File` opened on the same path
+in this process (for example by SWIFTsimIO) shares the already open file and
+its metadata cache.
+"""
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import NamedTuple
+
+import h5py
+from loguru import logger
+from prometheus_client import Counter
+
+from api.config import get_settings
+from api.processing.metrics import CACHE_HITS, CACHE_MISSES, OPEN_FILES
+from api.timing import timed
+
+
+class FileFingerprint(NamedTuple):
+    """Identify a specific version of a file on disk."""
+
+    path: str
+    size: int
+    mtime_ns: int
+    inode: int
+
+
+def get_file_fingerprint(filename: str | Path) -> FileFingerprint:
+    """Create a fingerprint of a file from its resolved path and status.
+
+    Args:
+        filename (str | Path): Path to the file
+
+    Returns
+    -------
+        FileFingerprint: Resolved path, size, modification time and inode of the file
+    """
+    path = Path(filename).resolve()
+    file_status = path.stat()
+    return FileFingerprint(
+        str(path),
+        file_status.st_size,
+        file_status.st_mtime_ns,
+        file_status.st_ino,
+    )
+
+
+@dataclass
+class PooledFile:
+    """An open HDF5 file handle held by the pool."""
+
+    handle: h5py.File
+    fingerprint: FileFingerprint
+    last_used: float = field(default_factory=time.monotonic)
+    users: int = 0
+    removed: bool = False
+
+
+class HDF5FilePool:
+    """Pool of open read-only HDF5 file handles with LRU eviction.
+
+    Handles that are evicted while in use are closed once the last user releases them.
+    A named pool records its lookups and open files in the Prometheus metrics
+    as they change.
+    """
+
+    def __init__(
+        self,
+        max_open_files: int = 64,
+        idle_timeout_seconds: float = 300.0,
+        name: str | None = None,
+    ):
+        """Class constructor.
+
+        Args:
+            max_open_files (int, optional): Maximum number of files held open. Defaults to 64.
+            idle_timeout_seconds (float, optional):
+                Time after which unused handles are closed. Defaults to 300.0.
+            name (str | None, optional):
+                Name labelling the pool's metrics, or None to record no metrics.
+                Defaults to None.
+        """
+        self.max_open_files = max_open_files
+        self.idle_timeout_seconds = idle_timeout_seconds
+        self.name = name
+
+        self._files: OrderedDict[str, PooledFile] = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if name is not None:
+            CACHE_HITS.labels(cache=name)
+            CACHE_MISSES.labels(cache=name)
+            self._record_open_files()
+
+    @contextmanager
+    def open(self, filename: str | Path) -> Iterator[h5py.File]:  # noqa: A003
+        """Borrow an open, read-only handle for a file.
+
+        Args:
+            filename (str | Path): Path to the HDF5 file
+
+        Yields
+        ------
+            h5py.File: Open file handle, which must not be closed by the caller
+        """
+        pooled_file = self._acquire(filename)
+        try:
+            yield pooled_file.handle
+        finally:
+            self._release(pooled_file)
+
+    @timed("open")
+    def _acquire(self, filename: str | Path) -> PooledFile:
+        """Retrieve a pooled handle, opening the file if required.
+
+        Args:
+            filename (str | Path): Path to the HDF5 file
+
+        Returns
+        -------
+            PooledFile: Pooled file with its user count incremented
+        """
+        fingerprint = get_file_fingerprint(filename)
+
+        with self._lock:
+            self._close_idle()
+            pooled_file = self._files.get(fingerprint.path)
+
+            if pooled_file is not None and pooled_file.fingerprint != fingerprint:
+                logger.info(f"{fingerprint.path} changed on disk, reopening")
+                self._remove(fingerprint.path)
+                pooled_file = None
+
+            if pooled_file is not None:
+                self.hits += 1
+                self._record_lookup(CACHE_HITS)
+                return self._checkout(pooled_file)
+            self.misses += 1
+            self._record_lookup(CACHE_MISSES)
+
+        # Open outside the lock so slow opens do not block access to other files
+        opened_file = PooledFile(h5py.File(fingerprint.path, "r"), fingerprint)
+
+        with self._lock:
+            pooled_file = self._files.get(fingerprint.path)
+            if pooled_file is not None and pooled_file.fingerprint == fingerprint:
+                # Another thread opened the same file in the meantime
+                opened_file.handle.close()
+                return self._checkout(pooled_file)
+
+            if pooled_file is not None:
+                self._remove(fingerprint.path)
+
+            self._files[fingerprint.path] = opened_file
+            self._evict_least_recently_used()
+            self._record_open_files()
+            return self._checkout(opened_file)
+
+    def _record_lookup(self, counter: Counter) -> None:
+        """Count a lookup of a named pool.
+
+        Args:
+            counter (Counter): Hit or miss counter to increase
+        """
+        if self.name is not None:
+            counter.labels(cache=self.name).inc()
+
+    def _record_open_files(self) -> None:
+        """Report the number of files a named pool holds. Must be called while holding the lock."""
+        if self.name is not None:
+            OPEN_FILES.set(len(self._files))
+
+    def _checkout(self, pooled_file: PooledFile) -> PooledFile:
+        """Mark a pooled file as in use. Must be called while holding the lock.
+
+        Args:
+            pooled_file (PooledFile): Pooled file to use
+
+        Returns
+        -------
+            PooledFile: The same pooled file
+        """
+        self._files.move_to_end(pooled_file.fingerprint.path)
+        pooled_file.users += 1
+        pooled_file.last_used = time.monotonic()
+        return pooled_file
+
+    def _release(self, pooled_file: PooledFile) -> None:
+        """Return a borrowed handle to the pool.
+
+        Args:
+            pooled_file (PooledFile): Pooled file to release
+        """
+        with self._lock:
+            pooled_file.users -= 1
+            pooled_file.last_used = time.monotonic()
+            if pooled_file.removed and pooled_file.users == 0:
+                pooled_file.handle.close()
+
+    def _remove(self, path: str) -> None:
+        """Remove a file from the pool. Must be called while holding the lock.
+
+        Args:
+            path (str): Resolved path of the file
+        """
+        pooled_file = self._files.pop(path)
+        pooled_file.removed = True
+        if pooled_file.users == 0:
+            pooled_file.handle.close()
+        self._record_open_files()
+
+    def _evict_least_recently_used(self) -> None:
+        """Close the least recently used files beyond the maximum number of open files."""
+        while len(self._files) > self.max_open_files:
+            path = next(iter(self._files))
+            self._remove(path)
+            self.evictions += 1
+
+    def _close_idle(self) -> None:
+        """Close files that have not been used within the idle timeout."""
+        idle_before = time.monotonic() - self.idle_timeout_seconds
+        idle_paths = [
+            path
+            for path, pooled_file in self._files.items()
+            if pooled_file.users == 0 and pooled_file.last_used < idle_before
+        ]
+        for path in idle_paths:
+            self._remove(path)
+            self.evictions += 1
+
+    def close_idle(self) -> None:
+        """Close files that have not been used within the idle timeout."""
+        with self._lock:
+            self._close_idle()
+
+    def close_all(self) -> None:
+        """Remove every file from the pool, closing handles that are not in use."""
+        with self._lock:
+            for path in list(self._files):
+                self._remove(path)
+
+    def stats(self) -> dict[str, int]:
+        """Report pool usage.
+
+        Returns
+        -------
+            dict[str, int]: Number of open files, and hit, miss and eviction counts
+        """
+        with self._lock:
+            return {
+                "open_files": len(self._files),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+@lru_cache
+def get_file_pool() -> HDF5FilePool:
+    """Retrieve the process-wide HDF5 file pool, configured from settings.
+
+    Returns
+    -------
+        HDF5FilePool: Shared file pool
+    """
+    settings = get_settings()
+    logger.info(f"Creating HDF5 file pool for up to {settings.max_open_files} files")
+    return HDF5FilePool(
+        settings.max_open_files,
+        settings.file_idle_timeout_seconds,
+        "file_pool",
+    )
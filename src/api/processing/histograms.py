@@ -0,0 +1,319 @@
+"""Calculate histograms and binned statistics of fields on the server.
+
+Fields are read in blocks of rows. For each block the bin of every row is
+found and counts and sums are accumulated with `np.bincount`, so only the
+bins are held in memory. Medians are the exception: the binned values must
+be kept until every block has been read.
+"""
+from typing import Any, Literal
+
+import numpy as np
+import numpy.typing as npt
+from pydantic import BaseModel, Field, field_validator
+
+from api.config import get_settings
+from api.processing.aggregation import get_dataset, split_ranges
+from api.processing.data_processing import (
+    DEFAULT_BLOCK_SIZE_BYTES,
+    SWIFTProcessor,
+    SWIFTProcessorError,
+)
+from api.processing.file_pool import get_file_pool
+from api.processing.units import get_field_units
+
+HistogramStatistic = Literal["count", "sum", "mean", "median"]
+MIN_BIN_EDGES = 2
+
+
+class HistogramAxis(BaseModel):
+    """Bins along one axis of a histogram.
+
+    Either explicit bin edges, or lower and upper limits with a number of
+    linearly or logarithmically spaced bins, in the internal units of the field.
+    Axes with more than HISTOGRAM_MAX_BINS bins are rejected, since the
+    counts and sums of every bin are held in memory.
+
+    Args:
+        BaseModel (_type_): Pydantic BaseModel
+    """
+
+    edges: list[float] | None = None
+    lower: float | None = None
+    upper: float | None = None
+    bins: int = Field(50, gt=0)
+    scale: Literal["linear", "log"] = "linear"
+
+    @field_validator("bins")
+    @classmethod
+    def check_bins(cls, bins: int) -> int:
+        """Limit the number of bins to the configured maximum.
+
+        Args:
+            bins (int): Number of bins
+
+        Raises
+        ------
+            ValueError: Raised if there are more bins than the maximum.
+
+        Returns
+        -------
+            int: Number of bins
+        """
+        check_bin_count(bins)
+        return bins
+
+    @field_validator("edges")
+    @classmethod
+    def check_edges(cls, edges: list[float] | None) -> list[float] | None:
+        """Limit the number of bins given by explicit edges to the configured maximum.
+
+        Args:
+            edges (list[float] | None): Bin edges
+
+        Raises
+        ------
+            ValueError: Raised if the edges give more bins than the maximum.
+
+        Returns
+        -------
+            list[float] | None: Bin edges
+        """
+        if edges is not None:
+            check_bin_count(len(edges) - 1)
+        return edges
+
+
+def check_bin_count(bins: int) -> None:
+    """Check a number of bins against the configured maximum.
+
+    Args:
+        bins (int): Number of bins along an axis
+
+    Raises
+    ------
+        ValueError: Raised if there are more bins than the maximum.
+    """
+    max_bins = get_settings().histogram_max_bins
+    if bins > max_bins:
+        message = f"Histogram axes can have at most {max_bins} bins."
+        raise ValueError(message)
+
+
+def create_bin_edges(axis: HistogramAxis) -> npt.NDArray:
+    """Calculate the bin edges along one axis.
+
+    Args:
+        axis (HistogramAxis): Bin specification
+
+    Raises
+    ------
+        SWIFTProcessorError: Raised for missing, unordered or non-positive logarithmic limits.
+
+    Returns
+    -------
+        npt.NDArray: Monotonically increasing bin edges
+    """
+    if axis.edges is not None:
+        edges = np.asarray(axis.edges, dtype=np.float64)
+    elif axis.lower is None or axis.upper is None:
+        message = "Histogram bins need either edges or lower and upper limits."
+        raise SWIFTProcessorError(message)
+    elif axis.scale == "log":
+        if axis.lower <= 0:
+            message = "Logarithmic bins need a positive lower limit."
+            raise SWIFTProcessorError(message)
+        edges = np.geomspace(axis.lower, axis.upper, axis.bins + 1)
+    else:
+        edges = np.linspace(axis.lower, axis.upper, axis.bins + 1)
+
+    if len(edges) < MIN_BIN_EDGES or not np.all(np.diff(edges) > 0):
+        message = "Histogram bin edges must contain at least two increasing values."
+        raise SWIFTProcessorError(message)
+    return edges
+
+
+def get_bin_indices(values: npt.NDArray, edges: npt.NDArray) -> npt.NDArray:
+    """Find the bin of each value, matching `np.histogram`.
+
+    Bins include their lower edge, and the last bin also includes its upper edge.
+
+    Args:
+        values (npt.NDArray): Values to bin
+        edges (npt.NDArray): Bin edges
+
+    Returns
+    -------
+        npt.NDArray: Bin index of each value, -1 for values outside the bins or not finite
+    """
+    indices = np.searchsorted(edges, values, side="right") - 1
+    indices[values == edges[-1]] = len(edges) - 2
+    indices[(indices < 0) | (indices >= len(edges) - 1) | ~np.isfinite(values)] = -1
+    return indices
+
+
+def calculate_binned_medians(
+    bin_indices: npt.NDArray,
+    values: npt.NDArray,
+    counts: npt.NDArray,
+) -> npt.NDArray:
+    """Calculate the median of the values in each bin.
+
+    Args:
+        bin_indices (npt.NDArray): Flat bin index of each value
+        values (npt.NDArray): Binned values
+        counts (npt.NDArray): Number of values in each flat bin
+
+    Returns
+    -------
+        npt.NDArray: Median of each flat bin, NaN for empty bins
+    """
+    order = np.lexsort((values, bin_indices))
+    sorted_values = values[order]
+    starts = np.cumsum(counts) - counts
+
+    medians = np.full(len(counts), np.nan)
+    filled = counts > 0
+    lower = sorted_values[starts[filled] + (counts[filled] - 1) // 2]
+    upper = sorted_values[starts[filled] + counts[filled] // 2]
+    medians[filled] = (lower + upper) / 2
+    return medians
+
+
+def histogram_fields(
+    filename: str,
+    fields: list[str],
+    axes: list[HistogramAxis],
+    statistic: HistogramStatistic = "count",
+    weights: str | None = None,
+    mask: npt.NDArray | None = None,
+    columns: list[int | None] | None = None,
+    block_size_bytes: int = DEFAULT_BLOCK_SIZE_BYTES,
+) -> dict[str, Any]:
+    """Bin one or two fields and calculate a statistic in each bin.
+
+    Args:
+        filename (str): Path to HDF5 file
+        fields (list[str]): One or two field paths to bin
+        axes (list[HistogramAxis]): Bins for each field
+        statistic (HistogramStatistic, optional):
+            Number of rows in each bin, or the sum, mean or median of
+            the weights field in each bin. Defaults to "count".
+        weights (str | None, optional):
+            Field summarised by the sum, mean and median statistics. Defaults to None.
+        mask (npt.NDArray | None, optional):
+            Array of [start, stop) row ranges, or None for every row. Defaults to None.
+        columns (list[int | None] | None, optional):
+            Column selector for each field, required for multidim fields. Defaults to None.
+        block_size_bytes (int, optional):
+            Approximate size of each block read from each field.
+            Defaults to DEFAULT_BLOCK_SIZE_BYTES.
+
+    Raises
+    ------
+        SWIFTProcessorError: Raised for missing or mismatched fields and invalid bins.
+
+    Returns
+    -------
+        dict[str, Any]:
+            Bin edges, number of rows and requested statistic in each bin, and field units
+    """
+    if statistic != "count" and weights is None:
+        message = f"The {statistic} statistic requires a weights field."
+        raise SWIFTProcessorError(message)
+    if columns is None:
+        columns = [None] * len(fields)
+
+    edges = [create_bin_edges(axis) for axis in axes]
+    shape = tuple(len(axis_edges) - 1 for axis_edges in edges)
+    counts = np.zeros(int(np.prod(shape)), dtype=np.int64)
+    sums = np.zeros(len(counts), dtype=np.float64)
+    median_bins, median_values = [], []
+
+    value_fields = [*fields, weights] if weights is not None else list(fields)
+    value_columns = [*columns, None]
+
+    with get_file_pool().open(filename) as handle:
+        datasets = [get_dataset(handle, field) for field in value_fields]
+        rows = {dataset.shape[0] for dataset in datasets}
+        if len(rows) != 1:
+            message = "All histogram fields must have the same number of rows."
+            raise SWIFTProcessorError(message)
+        if mask is None:
+            mask = np.array([[0, rows.pop()]])
+        block_rows = min(
+            SWIFTProcessor.get_block_rows(dataset, block_size_bytes) for dataset in datasets
+        )
+
+        for block_ranges in split_ranges(mask, block_rows):
+            block_size = int(np.sum(block_ranges[:, 1] - block_ranges[:, 0]))
+            blocks = [
+                SWIFTProcessor.read_masked_dataset(
+                    handle,
+                    field,
+                    block_ranges,
+                    block_size,
+                    field_columns,
+                )
+                for field, field_columns in zip(value_fields, value_columns)
+            ]
+            if any(block.ndim != 1 for block in blocks):
+                message = "Histogram fields must be one-dimensional; select a column."
+                raise SWIFTProcessorError(message)
+
+            flat_indices = np.zeros(block_size, dtype=np.int64)
+            in_bins = np.ones(block_size, dtype=bool)
+            for block, axis_edges, axis_bins in zip(blocks, edges, shape):
+                axis_indices = get_bin_indices(block, axis_edges)
+                in_bins &= axis_indices >= 0
+                flat_indices = flat_indices * axis_bins + axis_indices
+            flat_indices = flat_indices[in_bins]
+
+            counts += np.bincount(flat_indices, minlength=len(counts))
+            if weights is not None:
+                weight_values = blocks[-1][in_bins].astype(np.float64)
+                sums += np.bincount(flat_indices, weights=weight_values, minlength=len(sums))
+                if statistic == "median":
+                    median_bins.append(flat_indices)
+                    median_values.append(weight_values)
+
+        units = {field: get_field_units(filename, field).to_string() for field in value_fields}
+
+    if statistic == "count":
+        values = counts
+    elif statistic == "sum":
+        values = sums
+    elif statistic == "mean":
+        values = np.divide(sums, counts, out=np.full(len(sums), np.nan), where=counts > 0)
+    else:
+        values = calculate_binned_medians(
+            np.concatenate([np.zeros(0, dtype=np.int64), *median_bins]),
+            np.concatenate([np.zeros(0), *median_values]),
+            counts,
+        )
+
+    return {
+        "fields": fields,
+        "weights": weights,
+        "statistic": statistic,
+        "edges": [axis_edges.tolist() for axis_edges in edges],
+        "counts": counts.reshape(shape).tolist(),
+        "values": empty_bins_to_none(values, counts).reshape(shape).tolist(),
+        "units": units,
+    }
+
+
+def empty_bins_to_none(values: npt.NDArray, counts: npt.NDArray) -> npt.NDArray:
+    """Replace the values of empty bins with None so they serialise as JSON null.
+
+    Args:
+        values (npt.NDArray): Statistic in each flat bin
+        counts (npt.NDArray): Number of rows in each flat bin
+
+    Returns
+    -------
+        npt.NDArray: Object array of the statistic, None for empty bins
+    """
+    output = values.astype(object)
+    if values.dtype.kind == "f":
+        output[(counts == 0) & np.isnan(values)] = None
+    return output
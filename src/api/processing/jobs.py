@@ -0,0 +1,522 @@
+"""Run long reads as background jobs, spooling their results to disk.
+
+Requests that take longer than a load balancer's timeout are submitted as
+jobs instead. Each job runs on a small worker pool and writes its result to
+a spool directory. Its status, progress and bytes written are recorded in a
+local SQLite table, so any API process sharing the spool can report on it.
+
+Finished results are deleted once they are older than a time-to-live, and
+the oldest are deleted early when the spool grows past its size limit. Bytes
+written by running jobs count towards the limit, and a job fails as soon as
+its result would not fit beside the results of other running jobs.
+Cleanup runs whenever jobs are submitted or looked up.
+
+Each job records the process, and the job manager within it, that runs it.
+Queued and running jobs are marked as interrupted once that process has
+exited, or, if the process id has been reused by the current process, once
+the job manager that ran them has been replaced.
+"""
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Literal, NamedTuple
+
+from loguru import logger
+
+from api.config import get_settings
+
+JobStatus = Literal["queued", "running", "succeeded", "failed", "expired"]
+DEFAULT_SPOOL_DIRECTORY = Path(tempfile.gettempdir()) / "swift-api-jobs"
+JOB_DATABASE_NAME = "jobs.sqlite"
+RESULT_SUFFIX = ".result"
+WRITE_SLICE_BYTES = 16 * 1024**2
+
+JOB_COLUMNS = (
+    "id",
+    "owner",
+    "kind",
+    "status",
+    "progress",
+    "bytes_written",
+    "media_type",
+    "headers",
+    "error",
+    "created",
+    "updated",
+    "pid",
+    "instance",
+)
+
+
+class JobError(Exception):
+    """Raised when a job cannot run, or its result is too large for the spool."""
+
+
+@dataclass
+class Job:
+    """State of a background job, as stored in the job table."""
+
+    id: str  # noqa: A003
+    owner: str
+    kind: str
+    status: JobStatus = "queued"
+    progress: float = 0.0
+    bytes_written: int = 0
+    media_type: str | None = None
+    headers: dict[str, str] = field(default_factory=dict)
+    error: str | None = None
+    created: float = field(default_factory=time.time)
+    updated: float = field(default_factory=time.time)
+    pid: int | None = None
+    instance: str | None = None
+
+    def describe(self) -> dict[str, Any]:
+        """Summarise the job for clients.
+
+        Returns
+        -------
+            dict[str, Any]: Job id, kind, status, progress, bytes written, error and timestamps
+        """
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": self.progress,
+            "bytes_written": self.bytes_written,
+            "error": self.error,
+            "created": self.created,
+            "updated": self.updated,
+        }
+
+
+class JobResult(NamedTuple):
+    """Media type and headers sent with a job result."""
+
+    media_type: str
+    headers: dict[str, str]
+
+
+class JobStore:
+    """Table of jobs held in a local SQLite database.
+
+    One connection is shared by all threads and guarded by a lock.
+    """
+
+    def __init__(self, database: str | Path):
+        """Class constructor.
+
+        Args:
+            database (str | Path): Path to the SQLite database, created if missing
+        """
+        self._connection = sqlite3.connect(
+            database,
+            check_same_thread=False,
+            isolation_level=None,
+        )
+        self._lock = threading.Lock()
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    progress REAL NOT NULL,
+                    bytes_written INTEGER NOT NULL,
+                    media_type TEXT,
+                    headers TEXT NOT NULL,
+                    error TEXT,
+                    created REAL NOT NULL,
+                    updated REAL NOT NULL,
+                    pid INTEGER,
+                    instance TEXT
+                )
+                """,
+            )
+            # Add the columns identifying the running process to older job tables
+            existing = {row[1] for row in self._connection.execute("PRAGMA table_info(jobs)")}
+            for column, column_type in (("pid", "INTEGER"), ("instance", "TEXT")):
+                if column not in existing:
+                    self._connection.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+
+    def add(self, job: Job) -> None:
+        """Insert a new job.
+
+        Args:
+            job (Job): Job to insert
+        """
+        values = [getattr(job, column) for column in JOB_COLUMNS]
+        values[JOB_COLUMNS.index("headers")] = json.dumps(job.headers)
+        with self._lock:
+            self._connection.execute(
+                f"INSERT INTO jobs ({', '.join(JOB_COLUMNS)}) "  # noqa: S608
+                f"VALUES ({', '.join('?' * len(JOB_COLUMNS))})",
+                values,
+            )
+
+    def update(self, job_id: str, **values: Any) -> None:
+        """Change some of the columns of a job, and its update time.
+
+        Args:
+            job_id (str): Job to update
+            **values (Any): New value of each changed column
+        """
+        values["updated"] = time.time()
+        if "headers" in values:
+            values["headers"] = json.dumps(values["headers"])
+        assignments = ", ".join(f"{column} = ?" for column in values)
+        with self._lock:
+            self._connection.execute(
+                f"UPDATE jobs SET {assignments} WHERE id = ?",  # noqa: S608
+                [*values.values(), job_id],
+            )
+
+    def get(self, job_id: str) -> Job | None:
+        """Retrieve a job.
+
+        Args:
+            job_id (str): Job to retrieve
+
+        Returns
+        -------
+            Job | None: The job, or None if it does not exist
+        """
+        jobs = self.select("id = ?", (job_id,))
+        return jobs[0] if jobs else None
+
+    def select(self, condition: str, parameters: Iterable[Any] = ()) -> list[Job]:
+        """Retrieve the jobs matching a condition, oldest first.
+
+        Args:
+            condition (str): SQL condition on the job columns
+            parameters (Iterable[Any], optional): Parameters of the condition. Defaults to ().
+
+        Returns
+        -------
+            list[Job]: Matching jobs
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs "  # noqa: S608
+                f"WHERE {condition} ORDER BY updated",
+                tuple(parameters),
+            ).fetchall()
+
+        jobs = []
+        for row in rows:
+            values = dict(zip(JOB_COLUMNS, row))
+            values["headers"] = json.loads(values["headers"])
+            jobs.append(Job(**values))
+        return jobs
+
+    def count(self) -> dict[str, int]:
+        """Count the jobs in each status.
+
+        Returns
+        -------
+            dict[str, int]: Number of jobs, keyed by status
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT status, COUNT(*) FROM jobs GROUP BY status",
+            ).fetchall()
+        return dict(rows)
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._connection.close()
+
+
+def is_process_running(pid: int) -> bool:
+    """Check whether a process exists on this host.
+
+    Args:
+        pid (int): Process id
+
+    Returns
+    -------
+        bool: Whether the process exists, even if owned by another user
+    """
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobContext:
+    """Handle passed to a running job to report progress and write its result."""
+
+    def __init__(self, store: JobStore, job_id: str, result_path: Path, max_spool_bytes: int):
+        """Class constructor.
+
+        Args:
+            store (JobStore): Table holding the job
+            job_id (str): Running job
+            result_path (Path): Spool file the result must be written to
+            max_spool_bytes (int): Largest total size of the results kept
+        """
+        self.store = store
+        self.job_id = job_id
+        self.result_path = result_path
+        self.max_spool_bytes = max_spool_bytes
+
+    def check_spool_space(self, result_bytes: int) -> None:
+        """Check that a result fits in the spool alongside the results of other running jobs.
+
+        Finished results are expired to make room, so only running jobs count.
+
+        Args:
+            result_bytes (int): Size of the result
+
+        Raises
+        ------
+            JobError: Raised if the result does not fit in the spool.
+        """
+        running = self.store.select("status = 'running' AND id != ?", (self.job_id,))
+        available_bytes = self.max_spool_bytes - sum(job.bytes_written for job in running)
+        if result_bytes > available_bytes:
+            message = (
+                f"The result of at least {result_bytes} bytes is larger than the "
+                f"{available_bytes} bytes left of the {self.max_spool_bytes} byte job spool."
+            )
+            raise JobError(message)
+
+    def report_progress(self, progress: float) -> None:
+        """Record the fraction of the job completed.
+
+        Args:
+            progress (float): Fraction of the job completed, between 0 and 1
+        """
+        self.store.update(self.job_id, progress=min(max(progress, 0.0), 1.0))
+
+    def write(self, chunks: Iterable[bytes]) -> int:
+        """Write the result to the spool file, recording the bytes written as it goes.
+
+        Large chunks are written in slices, so progress is recorded steadily.
+        Writing stops as soon as the result outgrows the space left in the spool.
+
+        Args:
+            chunks (Iterable[bytes]): Parts of the result
+
+        Returns
+        -------
+            int: Total number of bytes written
+        """
+        bytes_written = 0
+        with self.result_path.open("wb") as result_file:
+            for chunk in chunks:
+                view = memoryview(chunk).cast("B")
+                for offset in range(0, len(view), WRITE_SLICE_BYTES):
+                    piece = view[offset : offset + WRITE_SLICE_BYTES]
+                    self.check_spool_space(bytes_written + len(piece))
+                    bytes_written += result_file.write(piece)
+                    self.store.update(self.job_id, bytes_written=bytes_written)
+        return bytes_written
+
+
+JobFunction = Callable[[JobContext], JobResult]
+
+
+class JobManager:
+    """Run jobs on a worker pool, keeping their results in a bounded spool directory."""
+
+    def __init__(
+        self,
+        spool_directory: str | Path,
+        max_spool_bytes: int,
+        ttl_seconds: float,
+        max_workers: int,
+    ):
+        """Class constructor.
+
+        Args:
+            spool_directory (str | Path): Directory holding the job table and results
+            max_spool_bytes (int): Largest total size of the results kept
+            ttl_seconds (float): Time for which finished jobs and their results are kept
+            max_workers (int): Number of jobs run concurrently
+        """
+        self.spool_directory = Path(spool_directory)
+        self.spool_directory.mkdir(parents=True, exist_ok=True)
+        self.max_spool_bytes = max_spool_bytes
+        self.ttl_seconds = ttl_seconds
+        self.max_workers = max_workers
+
+        self.store = JobStore(self.spool_directory / JOB_DATABASE_NAME)
+        self.instance = uuid.uuid4().hex
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="swift-jobs")
+
+    def get_result_path(self, job_id: str) -> Path:
+        """Locate the spool file holding the result of a job.
+
+        Args:
+            job_id (str): Job id
+
+        Returns
+        -------
+            Path: Path to the result in the spool directory
+        """
+        return self.spool_directory / f"{job_id}{RESULT_SUFFIX}"
+
+    def submit(self, owner: str, kind: str, function: JobFunction) -> Job:
+        """Queue a job to run on the worker pool.
+
+        Args:
+            owner (str): User submitting the job
+            kind (str): Type of job, reported to clients
+            function (JobFunction): Function running the job and writing its result
+
+        Returns
+        -------
+            Job: The queued job
+        """
+        self.cleanup()
+        job = Job(
+            id=uuid.uuid4().hex,
+            owner=owner,
+            kind=kind,
+            pid=os.getpid(),
+            instance=self.instance,
+        )
+        self.store.add(job)
+        self._executor.submit(self._run, job.id, function)
+        return job
+
+    def get(self, job_id: str, owner: str) -> Job | None:
+        """Retrieve a job submitted by a user.
+
+        Args:
+            job_id (str): Job id
+            owner (str): User requesting the job
+
+        Returns
+        -------
+            Job | None: The job, or None if it does not exist or belongs to another user
+        """
+        self.cleanup()
+        job = self.store.get(job_id)
+        if job is None or job.owner != owner:
+            return None
+        return job
+
+    def _run(self, job_id: str, function: JobFunction) -> None:
+        """Run a job on a worker thread, recording its outcome.
+
+        Args:
+            job_id (str): Job to run
+            function (JobFunction): Function running the job and writing its result
+        """
+        result_path = self.get_result_path(job_id)
+        self.store.update(job_id, status="running")
+        context = JobContext(self.store, job_id, result_path, self.max_spool_bytes)
+        try:
+            result = function(context)
+            result_bytes = result_path.stat().st_size
+            context.check_spool_space(result_bytes)
+        except Exception as error:  # noqa: BLE001
+            logger.warning(f"Job {job_id} failed: {error}")
+            result_path.unlink(missing_ok=True)
+            # HTTP exceptions raised by request handlers hold their message in detail
+            self.store.update(
+                job_id,
+                status="failed",
+                error=str(getattr(error, "detail", None) or error),
+            )
+            return
+
+        self.store.update(
+            job_id,
+            status="succeeded",
+            progress=1.0,
+            bytes_written=result_bytes,
+            media_type=result.media_type,
+            headers=result.headers,
+        )
+        self.cleanup()
+
+    def cleanup(self) -> None:
+        """Expire finished jobs past their time-to-live, then the oldest results over the limit.
+
+        Jobs left queued or running by a stopped process are marked as failed.
+        """
+        expiry = time.time() - self.ttl_seconds
+        for job in self.store.select("status IN ('queued', 'running')"):
+            if self.is_interrupted(job, expiry):
+                self.store.update(job.id, status="failed", error="The job was interrupted.")
+
+        running = self.store.select("status = 'running'")
+        finished = self.store.select("status IN ('succeeded', 'failed')")
+        spool_bytes = sum(job.bytes_written for job in running) + sum(
+            job.bytes_written for job in finished if job.status == "succeeded"
+        )
+        for job in finished:
+            if job.updated >= expiry and spool_bytes <= self.max_spool_bytes:
+                continue
+            self.get_result_path(job.id).unlink(missing_ok=True)
+            self.store.update(job.id, status="expired")
+            if job.status == "succeeded":
+                spool_bytes -= job.bytes_written
+
+    def is_interrupted(self, job: Job, expiry: float) -> bool:
+        """Check whether a queued or running job has lost the process running it.
+
+        Args:
+            job (Job): Queued or running job
+            expiry (float): Time before which jobs without a recorded process are interrupted
+
+        Returns
+        -------
+            bool: Whether the job will never finish
+        """
+        if job.pid is None:
+            return job.updated < expiry
+        if job.pid == os.getpid():
+            return job.instance != self.instance
+        return not is_process_running(job.pid)
+
+    def stats(self) -> dict[str, int]:
+        """Report job counts and pool size.
+
+        Returns
+        -------
+            dict[str, int]: Number of workers and number of jobs in each status
+        """
+        return {"max_workers": self.max_workers, **self.store.count()}
+
+    def shutdown(self) -> None:
+        """Stop accepting jobs, wait for running jobs to finish and close the job table."""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        self.store.close()
+
+
+@lru_cache
+def get_job_manager() -> JobManager:
+    """Retrieve the process-wide job manager, configured from settings.
+
+    Returns
+    -------
+        JobManager: Shared job manager
+    """
+    settings = get_settings()
+    spool_directory = settings.job_spool_directory or DEFAULT_SPOOL_DIRECTORY
+    logger.info(f"Creating job manager with {settings.job_workers} workers in {spool_directory}")
+    return JobManager(
+        spool_directory,
+        settings.job_spool_max_bytes,
+        settings.job_result_ttl_seconds,
+        settings.job_workers,
+    )
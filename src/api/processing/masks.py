@@ -2,9 +2,21 @@
 from pathlib import Path
 
 import cloudpickle
+import numpy as np
+import numpy.typing as npt
 import swiftsimio as sw
+import unyt
+from swiftsimio.masks import SWIFTMask
+from swiftsimio.reader import SWIFTMetadata
 
-from api.processing.data_processing import SWIFTProcessor
+from api.processing.aggregation import split_ranges
+from api.processing.data_processing import SWIFTProcessor, SWIFTProcessorError
+from api.processing.file_pool import get_file_pool
+from api.processing.read_planner import get_range_indices
+
+SAMPLE_BLOCK_ROWS = 1024**2
+SPLITMIX_INCREMENT = 0x9E3779B97F4A7C15
+SPLITMIX_MULTIPLIERS = (np.uint64(0xBF58476D1CE4E5B9), np.uint64(0x94D049BB133111EB))
 
 
 def return_mask_boxsize(filename: Path) -> dict[str, str]:
@@ -17,7 +29,8 @@ def return_mask_boxsize(filename: Path) -> dict[str, str]:
     -------
         dict[str, str]: Dictionary containing boxsize array, data type and unyt units.
     """
-    mask = sw.mask(str(filename.resolve()))
+    with get_file_pool().open(filename):
+        mask = sw.mask(str(filename.resolve()))
     boxsize = mask.metadata.boxsize
 
     payload = SWIFTProcessor.generate_dict_from_ndarray(boxsize)
@@ -35,6 +48,205 @@ def return_mask(filename: Path) -> bytes:
     -------
         bytes: Pickled SWIFTMask object.
     """
-    mask = sw.mask(str(filename.resolve()))
+    with get_file_pool().open(filename):
+        mask = sw.mask(str(filename.resolve()))
 
     return cloudpickle.dumps(mask)
+
+
+def merge_ranges(ranges: npt.NDArray) -> npt.NDArray:
+    """Combine [start, stop) row ranges that touch or overlap, dropping empty ranges.
+
+    Args:
+        ranges (npt.NDArray): Array of [start, stop) row ranges
+
+    Returns
+    -------
+        npt.NDArray: Sorted, non-overlapping int64 row ranges
+    """
+    ranges = np.asarray(ranges, dtype=np.int64).reshape(-1, 2)
+    ranges = ranges[ranges[:, 1] > ranges[:, 0]]
+    if not ranges.size:
+        return ranges
+
+    ranges = ranges[np.argsort(ranges[:, 0], kind="stable")]
+    stops = np.maximum.accumulate(ranges[:, 1])
+    # A new range starts wherever there is a gap after every previous range
+    starts_new_range = np.concatenate(([True], ranges[1:, 0] > stops[:-1]))
+    range_indices = np.flatnonzero(starts_new_range)
+    range_ends = np.concatenate((range_indices[1:] - 1, [len(ranges) - 1]))
+
+    return np.column_stack((ranges[range_indices, 0], stops[range_ends]))
+
+
+def get_particle_group(metadata: SWIFTMetadata, particle_type: str) -> tuple[str, str]:
+    """Resolve a particle type to its SWIFTsimIO name and HDF5 group.
+
+    Args:
+        metadata (SWIFTMetadata): Metadata of the snapshot
+        particle_type (str): SWIFTsimIO particle name, e.g. "gas", or group name, e.g. "PartType0"
+
+    Raises
+    ------
+        SWIFTProcessorError: Raised if the particle type is not present in the snapshot.
+
+    Returns
+    -------
+        tuple[str, str]: Particle name and HDF5 group name
+    """
+    for particle_number, particle_name in zip(
+        metadata.present_particle_types,
+        metadata.present_particle_names,
+    ):
+        group = f"PartType{particle_number}"
+        if particle_type in (particle_name, group):
+            return particle_name, group
+
+    message = f"Particle type {particle_type} not found in {metadata.filename}."
+    raise SWIFTProcessorError(message)
+
+
+def create_region_mask(
+    filename: Path,
+    particle_type: str,
+    region: list[tuple[float, float] | None],
+    units: str | None = None,
+) -> tuple[npt.NDArray, int, str]:
+    """Select the rows of one particle type lying in the cells overlapping a region.
+
+    As with SWIFTsimIO spatial masks, the selection is coarse-grained to the
+    cells of the snapshot's top-level grid.
+
+    Args:
+        filename (Path): Path to file on disk
+        particle_type (str): SWIFTsimIO particle name or HDF5 group name
+        region (list[tuple[float, float] | None]):
+            Lower and upper bound along each axis, or None to leave an axis unrestricted
+        units (str | None, optional):
+            Units of the bounds. Defaults to the length units of the snapshot.
+
+    Raises
+    ------
+        SWIFTProcessorError: Raised for unknown particle types or invalid bounds.
+
+    Returns
+    -------
+        tuple[npt.NDArray, int, str]:
+            Merged [start, stop) row ranges, number of selected rows and HDF5 group name
+    """
+    mask = load_region_mask(filename, region, units)
+    particle_name, group = get_particle_group(mask.metadata, particle_type)
+
+    ranges = merge_ranges(getattr(mask, particle_name))
+    return ranges, int(getattr(mask, f"{particle_name}_size")), group
+
+
+def load_region_mask(
+    filename: Path,
+    region: list[tuple[float, float] | None] | None,
+    units: str | None = None,
+) -> SWIFTMask:
+    """Create a spatial mask of a snapshot, constrained to the cells overlapping a region.
+
+    Args:
+        filename (Path): Path to file on disk
+        region (list[tuple[float, float] | None] | None):
+            Lower and upper bound along each axis, or None to leave an axis
+            unrestricted. If None, the mask is left unconstrained.
+        units (str | None, optional):
+            Units of the bounds. Defaults to the length units of the snapshot.
+
+    Raises
+    ------
+        SWIFTProcessorError: Raised for invalid bounds.
+
+    Returns
+    -------
+        SWIFTMask: Spatial mask, holding the metadata of the snapshot
+    """
+    with get_file_pool().open(filename):
+        mask = sw.mask(str(filename.resolve()), spatial_only=True)
+    if region is None:
+        return mask
+
+    try:
+        length_units = unyt.Unit(units) if units else mask.units.length
+        restrict = [
+            None if bounds is None else unyt.unyt_array(bounds, length_units)
+            for bounds in region
+        ]
+        mask.constrain_spatial(restrict)
+    except (
+        unyt.exceptions.UnitParseError,
+        unyt.exceptions.UnitConversionError,
+        unyt.exceptions.UnitOperationError,
+    ) as error:
+        message = f"Invalid region units {units}: {error}"
+        raise SWIFTProcessorError(message) from error
+    return mask
+
+
+def sample_rows(rows: npt.NDArray, fraction: float, seed: int) -> npt.NDArray:
+    """Decide which rows belong to a deterministic random sample.
+
+    Each row index is hashed with the seed using the SplitMix64 finaliser, so
+    the decision for a row depends only on its index, the fraction and the
+    seed. Every field of a particle type therefore keeps the same rows, and a
+    sample of a subset of rows is the same subset of the full sample.
+
+    Args:
+        rows (npt.NDArray): Row indices
+        fraction (float): Probability of keeping each row
+        seed (int): Seed selecting the sample
+
+    Returns
+    -------
+        npt.NDArray: Boolean array, True for rows in the sample
+    """
+    hashed = rows.astype(np.uint64) + np.uint64((seed + 1) * SPLITMIX_INCREMENT % 2**64)
+    hashed = (hashed ^ (hashed >> np.uint64(30))) * SPLITMIX_MULTIPLIERS[0]
+    hashed = (hashed ^ (hashed >> np.uint64(27))) * SPLITMIX_MULTIPLIERS[1]
+    hashed ^= hashed >> np.uint64(31)
+    # The top 53 bits give a uniform double in [0, 1)
+    return (hashed >> np.uint64(11)) * 2.0**-53 < fraction
+
+
+def sample_ranges(
+    ranges: npt.NDArray,
+    fraction: float,
+    seed: int,
+    block_rows: int = SAMPLE_BLOCK_ROWS,
+) -> tuple[npt.NDArray, int]:
+    """Select a deterministic random sample of the rows in a set of row ranges.
+
+    Rows are considered in blocks, so the full list of row indices is never
+    built. The sampled rows keep the order of the given ranges, so a sample
+    is read in the same order as the rows it was drawn from, even if the
+    ranges are unsorted or overlap.
+
+    Args:
+        ranges (npt.NDArray): Array of [start, stop) row ranges
+        fraction (float): Probability of keeping each row
+        seed (int): Seed selecting the sample
+        block_rows (int, optional):
+            Number of rows considered at once. Defaults to SAMPLE_BLOCK_ROWS.
+
+    Returns
+    -------
+        tuple[npt.NDArray, int]: [start, stop) ranges of the sampled rows and their number
+    """
+    sampled_rows = []
+    for block in split_ranges(ranges, block_rows):
+        rows = get_range_indices(block[:, 0], block[:, 1] - block[:, 0])
+        sampled_rows.append(rows[sample_rows(rows, fraction, seed)])
+
+    rows = np.concatenate([np.zeros(0, dtype=np.int64), *sampled_rows])
+    if not len(rows):
+        return np.zeros((0, 2), dtype=np.int64), 0
+
+    # Consecutive sampled rows are combined into one range
+    breaks = np.flatnonzero(np.diff(rows) != 1) + 1
+    run_starts = np.insert(breaks, 0, 0)
+    run_stops = np.append(breaks, len(rows))
+    sampled = np.column_stack((rows[run_starts], rows[run_stops - 1] + 1))
+    return sampled, len(rows)
@@ -2,6 +2,7 @@
 import json
 from datetime import datetime
 from functools import lru_cache
+from pathlib import Path
 from typing import Any
 
 import cloudpickle
@@ -14,7 +15,11 @@ from swiftsimio.reader import (
 )
 from unyt import unyt_quantity
 
+from api.config import get_settings
+from api.processing.caching import ByteLRUCache
+from api.processing.file_pool import get_file_fingerprint, get_file_pool
 from api.processing.units import RemoteSWIFTUnits
+from api.timing import timed
 
 
 class RemoteSWIFTMetadataError(Exception):
@@ -53,13 +58,47 @@ class SWIFTMetadataEncoder(json.JSONEncoder):
         return json.JSONEncoder.default(self, obj)
 
 
-@lru_cache(maxsize=128)
-def create_swift_metadata(filename: str, units: RemoteSWIFTUnits | SWIFTUnits) -> bytes:
+@lru_cache
+def get_metadata_cache() -> ByteLRUCache:
+    """Retrieve the process-wide cache of serialised metadata, configured from settings.
+
+    Returns
+    -------
+        ByteLRUCache: Metadata cache keyed by file fingerprint
+    """
+    return ByteLRUCache(get_settings().metadata_cache_max_bytes, "metadata")
+
+
+@timed("metadata")
+def create_swift_metadata(filename: str | Path) -> bytes:
     """Return a SWIFTMetadata object, serialised with pickle.
 
+    Serialised metadata is cached against a fingerprint of the file, so repeat
+    requests are served from memory until the file changes on disk.
+
+    Args:
+        filename (str | Path): File path of specified HDF5 file
+
+    Raises
+    ------
+        RemoteSWIFTMetadataError: Raised in case of failed JSON serialisation.
+
+    Returns
+    -------
+        bytes: Pickled SWIFTMetadata object
+    """
+    fingerprint = get_file_fingerprint(filename)
+    return get_metadata_cache().get_or_create(
+        fingerprint,
+        lambda: serialise_swift_metadata(fingerprint.path),
+    )
+
+
+def serialise_swift_metadata(filename: str) -> bytes:
+    """Read a SWIFTMetadata object, with its units, and serialise it with pickle.
+
     Args:
         filename (str): File path of specified HDF5 file
-        units (Union[RemoteSWIFTUnits, SWIFTUnits]): Units object.
 
     Raises
     ------
@@ -69,7 +108,9 @@ def create_swift_metadata(filename: str, units: RemoteSWIFTUnits | SWIFTUnits) -
     -------
         bytes: Pickled SWIFTMetadata object
     """
-    metadata = SWIFTMetadata(filename, units)
+    with get_file_pool().open(filename):
+        units = SWIFTUnits(filename)
+        metadata = SWIFTMetadata(filename, units)
     if hasattr(metadata.units, "_handle"):
         metadata.units._handle = None  # do not serialize file handle
 
@@ -107,7 +148,8 @@ def create_swift_metadata_dict(filename: str, units: RemoteSWIFTUnits) -> dict:
     -------
         dict: Dictionary containg metadata.
     """
-    metadata = SWIFTMetadata(filename, units)
+    with get_file_pool().open(filename):
+        metadata = SWIFTMetadata(filename, units)
 
     metadata_dict = metadata.__dict__
 
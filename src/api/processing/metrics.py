@@ -0,0 +1,124 @@
+"""Define the Prometheus metrics describing requests, HDF5 reads and server resources.
+
+Metrics are kept in-process with `prometheus_client`. When the API runs as
+several Gunicorn workers, set PROMETHEUS_MULTIPROC_DIR to an empty directory
+shared by the workers before they start. Each worker then writes its values
+to files in that directory, and `/metrics` reports the sum over processes.
+Gauges only count live processes. The file pool, executors and caches
+update their metrics as they change, in the process using them, so every
+worker reports current values. Process pool workers count the bytes they
+read and return the count with each result, to be recorded by the API process.
+"""
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from prometheus_client import Counter, Gauge, Histogram
+
+LATENCY_BUCKETS_SECONDS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    120.0,
+    300.0,
+)
+RESPONSE_SIZE_BUCKETS_BYTES = tuple(float(1024 * 4**power) for power in range(13))
+
+REQUEST_DURATION = Histogram(
+    "swift_api_request_duration_seconds",
+    "Time taken to send the full response to a request.",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS_SECONDS,
+)
+RESPONSE_SIZE = Histogram(
+    "swift_api_response_size_bytes",
+    "Size of response bodies as sent, after any compression.",
+    ["method", "route"],
+    buckets=RESPONSE_SIZE_BUCKETS_BYTES,
+)
+HDF5_READ_BYTES = Counter(
+    "swift_api_hdf5_read_bytes",
+    "Bytes of field data read from HDF5 files, including rows read to merge nearby ranges.",
+)
+OPEN_FILES = Gauge(
+    "swift_api_open_files",
+    "HDF5 files held open by the file pool.",
+    multiprocess_mode="livesum",
+)
+EXECUTOR_TASKS = Gauge(
+    "swift_api_executor_tasks",
+    "Tasks waiting for, or running on, each I/O thread pool.",
+    ["executor", "state"],
+    multiprocess_mode="livesum",
+)
+CACHE_HITS = Counter(
+    "swift_api_cache_hits",
+    "Lookups answered from a cache.",
+    ["cache"],
+)
+CACHE_MISSES = Counter(
+    "swift_api_cache_misses",
+    "Lookups not found in a cache.",
+    ["cache"],
+)
+CACHE_BYTES = Gauge(
+    "swift_api_cache_bytes",
+    "Total size of the values held by a cache.",
+    ["cache"],
+    multiprocess_mode="livesum",
+)
+
+
+class HDF5ReadCount:
+    """Bytes of field data read while reads are being counted."""
+
+    def __init__(self):
+        """Class constructor."""
+        self.nbytes = 0
+
+
+_read_count: ContextVar[HDF5ReadCount | None] = ContextVar("hdf5_read_count", default=None)
+
+
+def record_hdf5_read(nbytes: int) -> None:
+    """Count bytes of field data read from an HDF5 file.
+
+    Inside `counting_hdf5_reads`, the bytes are added to its count instead.
+
+    Args:
+        nbytes (int): Number of bytes read
+    """
+    read_count = _read_count.get()
+    if read_count is None:
+        HDF5_READ_BYTES.inc(nbytes)
+    else:
+        read_count.nbytes += nbytes
+
+
+@contextmanager
+def counting_hdf5_reads() -> Iterator[HDF5ReadCount]:
+    """Count the bytes read in a block rather than recording them.
+
+    Used in process pool workers, whose metrics are not reported, so that
+    the count can be returned and recorded by the API process.
+
+    Yields
+    ------
+        HDF5ReadCount: Bytes read so far in the block
+    """
+    read_count = HDF5ReadCount()
+    token = _read_count.set(read_count)
+    try:
+        yield read_count
+    finally:
+        _read_count.reset(token)
@@ -0,0 +1,455 @@
+"""Read arrays in worker processes, returning them through shared memory.
+
+Range reads and array conversion hold the GIL, so threads alone limit each API
+process to roughly one core. With the process backend enabled, masked and
+unmasked reads run in a pool of worker processes. Each worker copies its result
+into a shared memory block and returns only the block name, shape and data type,
+so large arrays are never pickled across the process pipe. Inside
+`borrowing_shared_arrays`, results are used in place rather than copied out of
+shared memory, for example while a response body is built. Workers also return
+the number of bytes they read, which is recorded in the API process's metrics.
+"""
+import multiprocessing
+import threading
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from multiprocessing import shared_memory
+from typing import NamedTuple
+
+import numpy as np
+import numpy.typing as npt
+from loguru import logger
+
+from api.config import get_settings
+from api.processing.data_processing import SWIFTProcessor
+from api.processing.metrics import counting_hdf5_reads, record_hdf5_read
+from api.timing import timed
+
+
+class SharedArray(NamedTuple):
+    """Location and layout of an array held in shared memory."""
+
+    name: str
+    shape: tuple[int, ...]
+    data_type: np.dtype
+
+
+class WorkerResult(NamedTuple):
+    """Array read by a worker process and the bytes read from HDF5 to produce it."""
+
+    array: SharedArray | npt.NDArray
+    bytes_read: int
+
+
+def share_array(array: npt.NDArray) -> SharedArray | npt.NDArray:
+    """Copy an array into a new shared memory block.
+
+    The block is left for the receiving process to unlink. Arrays of Python
+    objects cannot be shared and are returned unchanged.
+
+    Args:
+        array (npt.NDArray): Array to share
+
+    Returns
+    -------
+        SharedArray | npt.NDArray: Description of the shared array, or the array itself
+    """
+    if array.dtype.hasobject:
+        return array
+
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    try:
+        shared = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+        shared[...] = array
+        del shared
+    finally:
+        block.close()
+    return SharedArray(block.name, array.shape, array.dtype)
+
+
+_borrowed_blocks: ContextVar[list[shared_memory.SharedMemory] | None] = ContextVar(
+    "borrowed_blocks",
+    default=None,
+)
+_unreleased_blocks: list[shared_memory.SharedMemory] = []
+_unreleased_lock = threading.Lock()
+
+
+def load_shared_array(shared_array: SharedArray | npt.NDArray) -> npt.NDArray:
+    """Load an array from shared memory, unlinking its shared memory block.
+
+    Inside `borrowing_shared_arrays`, the array is a view of the block, which
+    is released when the borrowing block exits. Otherwise the array is copied
+    and the block released at once.
+
+    Args:
+        shared_array (SharedArray | npt.NDArray): Array returned by `share_array`
+
+    Returns
+    -------
+        npt.NDArray: View of the shared array, or an array owned by the current process
+    """
+    if isinstance(shared_array, np.ndarray):
+        return shared_array
+
+    block = shared_memory.SharedMemory(name=shared_array.name)
+    block.unlink()
+    shared = np.ndarray(shared_array.shape, dtype=shared_array.data_type, buffer=block.buf)
+
+    borrowed_blocks = _borrowed_blocks.get()
+    if borrowed_blocks is not None:
+        borrowed_blocks.append(block)
+        return shared
+
+    try:
+        array = shared.copy()
+    finally:
+        del shared
+        block.close()
+    return array
+
+
+def release_blocks(blocks: list[shared_memory.SharedMemory]) -> None:
+    """Close shared memory blocks, keeping any still in use to close later.
+
+    A block cannot be closed while an array still refers to it, for example
+    from the traceback of an error. Such blocks are retried on the next call.
+
+    Args:
+        blocks (list[shared_memory.SharedMemory]): Blocks to close
+    """
+    with _unreleased_lock:
+        blocks = [*_unreleased_blocks, *blocks]
+        _unreleased_blocks.clear()
+        for block in blocks:
+            try:
+                block.close()
+            except BufferError:
+                _unreleased_blocks.append(block)
+
+
+@contextmanager
+def borrowing_shared_arrays() -> Iterator[None]:
+    """Use arrays returned by worker processes in place, without copying them.
+
+    Arrays loaded in the block are views of shared memory, and must not be
+    used, or kept, once the block exits.
+
+    Yields
+    ------
+        None: Control is returned to the block
+    """
+    blocks: list[shared_memory.SharedMemory] = []
+    token = _borrowed_blocks.set(blocks)
+    try:
+        yield
+    finally:
+        _borrowed_blocks.reset(token)
+        release_blocks(blocks)
+
+
+def load_worker_result(result: WorkerResult) -> npt.NDArray:
+    """Record the bytes a worker read and load the array it returned.
+
+    Args:
+        result (WorkerResult): Result returned by a worker process
+
+    Returns
+    -------
+        npt.NDArray: Array read by the worker, loaded as by `load_shared_array`
+    """
+    record_hdf5_read(result.bytes_read)
+    return load_shared_array(result.array)
+
+
+def read_masked_array_to_shared_memory(
+    filename: str,
+    field: str,
+    mask_json: str | None,
+    mask_data_type: str | None,
+    mask_size: int,
+    columns: int | None,
+) -> WorkerResult:
+    """Read a masked array into shared memory. Runs in a worker process.
+
+    Args:
+        filename (str): Path to HDF5 file
+        field (str): Field path to retrieve
+        mask_json (str | None): String representation of array mask
+        mask_data_type (str | None): Optionally include the original mask array dtype
+        mask_size (int): Size of array mask
+        columns (int | None): Selector for columns in the case of multidim arrays
+
+    Returns
+    -------
+        WorkerResult: Masked array, shared where possible, and the bytes read
+    """
+    with counting_hdf5_reads() as read_count:
+        array = SWIFTProcessor.get_array_masked(
+            filename,
+            field,
+            mask_json,
+            mask_data_type,
+            mask_size,
+            columns,
+        )
+    return WorkerResult(share_array(array), read_count.nbytes)
+
+
+def read_masked_ranges_to_shared_memory(
+    filename: str,
+    field: str,
+    mask: npt.NDArray,
+    mask_size: int,
+    columns: int | None,
+    output_dtype: np.dtype | None,
+) -> WorkerResult:
+    """Read a masked array into shared memory using a decoded mask. Runs in a worker process.
+
+    Args:
+        filename (str): Path to HDF5 file
+        field (str): Field path to retrieve
+        mask (npt.NDArray): Array of [start, stop) row ranges
+        mask_size (int): Size of array mask
+        columns (int | None): Selector for columns in the case of multidim arrays
+        output_dtype (np.dtype | None): Data type to convert the array to while reading
+
+    Returns
+    -------
+        WorkerResult: Masked array, shared where possible, and the bytes read
+    """
+    with counting_hdf5_reads() as read_count:
+        array = SWIFTProcessor.get_array_masked_from_ranges(
+            filename,
+            field,
+            mask,
+            mask_size,
+            columns,
+            output_dtype,
+        )
+    return WorkerResult(share_array(array), read_count.nbytes)
+
+
+def read_unmasked_array_to_shared_memory(
+    filename: str,
+    field: str,
+    columns: int | None,
+    start: int | None,
+    stop: int | None,
+    output_dtype: np.dtype | None,
+) -> WorkerResult | None:
+    """Read an unmasked array into shared memory. Runs in a worker process.
+
+    Args:
+        filename (str): Path to HDF5 file
+        field (str): Field path to retrieve
+        columns (int | None): Selector for columns in the case of multidim arrays
+        start (int | None): First row to read
+        stop (int | None): Row after the last row to read
+        output_dtype (np.dtype | None): Data type to convert the array to while reading
+
+    Returns
+    -------
+        WorkerResult | None: Unmasked array, shared where possible, and the bytes read.
+            Returns None if the field is not found.
+    """
+    with counting_hdf5_reads() as read_count:
+        array = SWIFTProcessor.get_array_unmasked(
+            filename,
+            field,
+            columns,
+            start,
+            stop,
+            output_dtype,
+        )
+    if array is None:
+        return None
+    return WorkerResult(share_array(array), read_count.nbytes)
+
+
+class SWIFTProcessPool:
+    """Pool of worker processes reading arrays from HDF5 files.
+
+    Provides the same array reading methods as `SWIFTProcessor`. Worker
+    processes are started on first use.
+    """
+
+    def __init__(self, max_workers: int | None = None):
+        """Class constructor.
+
+        Args:
+            max_workers (int | None, optional):
+                Number of worker processes. Defaults to the number of CPUs.
+        """
+        self.max_workers = max_workers
+
+        self._executor: ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Retrieve the process pool, starting it if required.
+
+        Workers are spawned rather than forked, as forking a process
+        with open HDF5 files and running threads is unsafe.
+
+        Returns
+        -------
+            ProcessPoolExecutor: Running process pool
+        """
+        with self._lock:
+            if self._executor is None:
+                logger.info("Starting process pool for array reads")
+                self._executor = ProcessPoolExecutor(
+                    self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    @timed("read")
+    def get_array_masked(
+        self,
+        filename: str,
+        field: str,
+        mask_json: str | None,
+        mask_data_type: str | None,
+        mask_size: int,
+        columns: int | None = None,
+    ) -> npt.NDArray:
+        """Retrieve a masked array using a worker process.
+
+        Args:
+            filename (str): Path to HDF5 file
+            field (str): Field path to retrieve
+            mask_json (str | None): String representation of array mask
+            mask_data_type (str | None): Optionally include the original mask array dtype
+            mask_size (int): Size of array mask
+            columns (int | None, optional):
+                Selector for columns in the case of multidim arrays. Defaults to None.
+
+        Returns
+        -------
+            npt.NDArray: Array with requested elements
+        """
+        future = self._get_executor().submit(
+            read_masked_array_to_shared_memory,
+            filename,
+            field,
+            mask_json,
+            mask_data_type,
+            mask_size,
+            columns,
+        )
+        return load_worker_result(future.result())
+
+    @timed("read")
+    def get_array_masked_from_ranges(
+        self,
+        filename: str,
+        field: str,
+        mask: npt.NDArray,
+        mask_size: int,
+        columns: int | None = None,
+        output_dtype: np.dtype | None = None,
+    ) -> npt.NDArray:
+        """Retrieve a masked array using an already decoded mask and a worker process.
+
+        Args:
+            filename (str): Path to HDF5 file
+            field (str): Field path to retrieve
+            mask (npt.NDArray): Array of [start, stop) row ranges
+            mask_size (int): Size of array mask
+            columns (int | None, optional):
+                Selector for columns in the case of multidim arrays. Defaults to None.
+            output_dtype (np.dtype | None, optional):
+                Data type to convert the array to while reading. Defaults to None.
+
+        Returns
+        -------
+            npt.NDArray: Array with requested elements
+        """
+        future = self._get_executor().submit(
+            read_masked_ranges_to_shared_memory,
+            filename,
+            field,
+            mask,
+            mask_size,
+            columns,
+            output_dtype,
+        )
+        return load_worker_result(future.result())
+
+    @timed("read")
+    def get_array_unmasked(
+        self,
+        filename: str,
+        field: str,
+        columns: int | None = None,
+        start: int | None = None,
+        stop: int | None = None,
+        output_dtype: np.dtype | None = None,
+    ) -> npt.NDArray | None:
+        """Retrieve an unmasked array using a worker process.
+
+        Args:
+            filename (str): Path to HDF5 file
+            field (str): Field path to retrieve
+            columns (int | None, optional):
+                Selector for columns in the case of multidim arrays. Defaults to None.
+            start (int | None, optional): First row to read. Defaults to None.
+            stop (int | None, optional): Row after the last row to read. Defaults to None.
+            output_dtype (np.dtype | None, optional):
+                Data type to convert the array to while reading. Defaults to None.
+
+        Returns
+        -------
+            npt.NDArray | None:
+                Array with requested elements. Returns None if the field is not found.
+        """
+        future = self._get_executor().submit(
+            read_unmasked_array_to_shared_memory,
+            filename,
+            field,
+            columns,
+            start,
+            stop,
+            output_dtype,
+        )
+        result = future.result()
+        if result is None:
+            return None
+        return load_worker_result(result)
+
+    def shutdown(self) -> None:
+        """Stop the worker processes, if started."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
+
+
+@lru_cache
+def get_process_pool() -> SWIFTProcessPool:
+    """Retrieve the process-wide pool of array reading processes, configured from settings.
+
+    Returns
+    -------
+        SWIFTProcessPool: Shared process pool
+    """
+    return SWIFTProcessPool(get_settings().process_pool_workers)
+
+
+def get_array_reader() -> type[SWIFTProcessor] | SWIFTProcessPool:
+    """Select how arrays are read according to the configured processing backend.
+
+    Returns
+    -------
+        type[SWIFTProcessor] | SWIFTProcessPool:
+            Object providing `get_array_masked` and `get_array_unmasked`,
+            reading in the current thread or in a worker process.
+    """
+    if get_settings().processing_backend == "process":
+        return get_process_pool()
+    return SWIFTProcessor
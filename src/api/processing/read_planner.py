@@ -0,0 +1,306 @@
+"""Plan masked reads against the chunk grid of a dataset.
+
+Reading each requested range separately decompresses a chunk once for every
+range that touches it. Instead, ranges are sorted and widened to chunk
+boundaries. Ranges sharing a chunk, or separated by less than a configurable
+gap, are merged into a single read. Each read is performed once and its rows
+are scattered into the output in the order the ranges were requested.
+"""
+import itertools
+from typing import Any, NamedTuple
+
+import h5py
+import numpy as np
+import numpy.typing as npt
+
+from api.processing.metrics import record_hdf5_read
+
+
+class ReadPlan(NamedTuple):
+    """Reads covering a set of requested row ranges.
+
+    The requested ranges are stored sorted by their first row, alongside the
+    output row each one is copied to. The ranges served by read `i` are
+    `ranges[members[i]:members[i + 1]]`.
+    """
+
+    reads: npt.NDArray
+    members: npt.NDArray
+    ranges: npt.NDArray
+    destinations: npt.NDArray
+    size: int
+
+
+def plan_reads(
+    ranges: npt.NDArray,
+    total_rows: int,
+    chunk_rows: int | None,
+    gap_rows: int,
+    max_read_rows: int,
+) -> ReadPlan:
+    """Group requested row ranges into as few reads as possible.
+
+    Reads are widened to whole chunks for chunked datasets. Ranges touching
+    the same chunk always share a read, so no chunk is read twice. Otherwise,
+    ranges are merged while the gap between them is at most `gap_rows` and the
+    read stays within `max_read_rows`. Ranges crossing a multiple of
+    `max_read_rows` are split there, so long ranges are read in pieces.
+
+    Args:
+        ranges (npt.NDArray): Array of [start, stop) row ranges, in output order
+        total_rows (int): Number of rows in the dataset
+        chunk_rows (int | None): Rows in each chunk, or None for contiguous datasets
+        gap_rows (int): Largest number of unrequested rows read to merge two ranges
+        max_read_rows (int): Largest number of rows in a read, a multiple of the chunk rows
+
+    Returns
+    -------
+        ReadPlan: Reads and the placement of each requested range
+    """
+    ranges = np.asarray(ranges, dtype=np.int64).reshape(-1, 2)
+    lengths = ranges[:, 1] - ranges[:, 0]
+    destinations = np.cumsum(lengths) - lengths
+
+    requested = lengths > 0
+    # Split before sorting, as pieces of overlapping ranges may start after later ranges
+    ranges, destinations = split_ranges_at(
+        ranges[requested],
+        destinations[requested],
+        max_read_rows,
+    )
+    order = np.argsort(ranges[:, 0], kind="stable")
+    ranges = ranges[order]
+    destinations = destinations[order]
+
+    read_starts, read_stops = ranges[:, 0], ranges[:, 1]
+    if chunk_rows is not None:
+        read_starts = read_starts // chunk_rows * chunk_rows
+        read_stops = np.minimum(-(-read_stops // chunk_rows) * chunk_rows, total_rows)
+
+    members = find_read_starts(
+        read_starts,
+        read_stops,
+        gap_rows,
+        max_read_rows,
+        chunked=chunk_rows is not None,
+    )
+    reads = np.zeros((0, 2), dtype=np.int64)
+    if len(members):
+        reads = np.column_stack(
+            (read_starts[members], np.maximum.reduceat(read_stops, members)),
+        )
+
+    return ReadPlan(
+        reads=reads,
+        members=np.append(members, len(ranges)),
+        ranges=ranges,
+        destinations=destinations,
+        size=int(np.sum(lengths[requested])),
+    )
+
+
+def find_read_starts(
+    starts: npt.NDArray,
+    stops: npt.NDArray,
+    gap_rows: int,
+    max_read_rows: int,
+    *,
+    chunked: bool,
+) -> npt.NDArray:
+    """Find the sorted ranges that begin a new read.
+
+    A range begins a new read when it starts more than `gap_rows` after every
+    earlier range stops, or when adding it would take the read beyond
+    `max_read_rows`. Ranges overlapping an earlier one always share its read
+    for chunked datasets, as their widened ranges share a chunk.
+
+    Args:
+        starts (npt.NDArray): First row of each range, sorted
+        stops (npt.NDArray): Row after the last row of each range
+        gap_rows (int): Largest number of unrequested rows read to merge two ranges
+        max_read_rows (int): Largest number of rows in a read
+        chunked (bool): Whether the ranges were widened to whole chunks
+
+    Returns
+    -------
+        npt.NDArray: Sorted indices of the ranges beginning each read
+    """
+    if len(starts) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    running_stops = np.maximum.accumulate(stops)
+    after_gap = starts[1:] - running_stops[:-1] > gap_rows
+    run_starts = np.flatnonzero(np.concatenate(([True], after_gap)))
+    run_stops = np.append(run_starts[1:], len(starts))
+    oversized = running_stops[run_stops - 1] - starts[run_starts] > max_read_rows
+    if not np.any(oversized):
+        return run_starts
+
+    can_split = np.ones(len(starts), dtype=bool)
+    if chunked:
+        can_split[1:] = starts[1:] >= running_stops[:-1]
+    split_indices = np.flatnonzero(can_split)
+
+    # Where a run exceeds the read limit depends on where its previous read
+    # began, so oversized runs are split one read at a time.
+    splits = []
+    for run_start, stop in zip(run_starts[oversized].tolist(), run_stops[oversized].tolist()):
+        first = run_start
+        while True:
+            limit = starts[first] + max_read_rows
+            index = first + max(
+                int(np.searchsorted(running_stops[first:stop], limit, side="right")),
+                1,
+            )
+            position = int(np.searchsorted(split_indices, index))
+            if position == len(split_indices) or split_indices[position] >= stop:
+                break
+            first = int(split_indices[position])
+            splits.append(first)
+    return np.sort(np.concatenate((run_starts, np.array(splits, dtype=np.int64))))
+
+
+def split_ranges_at(
+    ranges: npt.NDArray,
+    destinations: npt.NDArray,
+    piece_rows: int,
+) -> tuple[npt.NDArray, npt.NDArray]:
+    """Split ranges wherever they cross a multiple of `piece_rows`.
+
+    Args:
+        ranges (npt.NDArray): Array of [start, stop) row ranges
+        destinations (npt.NDArray): Output row of the first row of each range
+        piece_rows (int): Spacing of the split points
+
+    Returns
+    -------
+        tuple[npt.NDArray, npt.NDArray]: Split ranges, in the same order, and their output rows
+    """
+    first_pieces = ranges[:, 0] // piece_rows
+    pieces = (ranges[:, 1] - 1) // piece_rows - first_pieces + 1
+    if not np.any(pieces > 1):
+        return ranges, destinations
+
+    range_indices = np.repeat(np.arange(len(ranges)), pieces)
+    piece_indices = get_range_indices(first_pieces, pieces)
+    starts = np.maximum(ranges[range_indices, 0], piece_indices * piece_rows)
+    stops = np.minimum(ranges[range_indices, 1], (piece_indices + 1) * piece_rows)
+    return (
+        np.column_stack((starts, stops)),
+        destinations[range_indices] + starts - ranges[range_indices, 0],
+    )
+
+
+def get_range_indices(starts: npt.NDArray, lengths: npt.NDArray) -> npt.NDArray:
+    """List every index in a set of ranges, in order.
+
+    Args:
+        starts (npt.NDArray): First index of each range
+        lengths (npt.NDArray): Number of indices in each range
+
+    Returns
+    -------
+        npt.NDArray: Concatenated indices of all the ranges
+    """
+    range_offsets = np.cumsum(lengths) - lengths
+    return np.repeat(starts - range_offsets, lengths) + np.arange(np.sum(lengths))
+
+
+def execute_read_plan(
+    plan: ReadPlan,
+    source: h5py.Dataset | npt.NDArray,
+    output: npt.NDArray,
+    columns: np.lib.index_tricks.IndexExpression = np.s_[:],
+) -> npt.NDArray:
+    """Perform the reads of a plan, scattering the requested rows into an output array.
+
+    Args:
+        plan (ReadPlan): Plan returned by `plan_reads`
+        source (h5py.Dataset | npt.NDArray): Dataset, or memory-mapped array, to read
+        output (npt.NDArray): Array receiving the requested rows in output order
+        columns (np.lib.index_tricks.IndexExpression, optional):
+            Selector for columns in the case of multidim arrays. Defaults to np.s_[:].
+
+    Returns
+    -------
+        npt.NDArray: The output array
+    """
+    for read_index, (read_start, read_stop) in enumerate(plan.reads.tolist()):
+        first, last = plan.members[read_index], plan.members[read_index + 1]
+        starts = plan.ranges[first:last, 0]
+        lengths = plan.ranges[first:last, 1] - starts
+        destinations = plan.destinations[first:last]
+
+        rows = np.s_[read_start:read_stop]
+        block = source[rows, columns] if source.ndim > 1 else source[rows]
+        record_hdf5_read(block.nbytes)
+
+        if last - first == 1:
+            # Copy single ranges as a slice, avoiding index arrays
+            offset = starts[0] - read_start
+            output[destinations[0] : destinations[0] + lengths[0]] = block[
+                offset : offset + lengths[0]
+            ]
+        else:
+            output[get_range_indices(destinations, lengths)] = block[
+                get_range_indices(starts - read_start, lengths)
+            ]
+    return output
+
+
+def explain_read_plan(
+    plan: ReadPlan,
+    dataset: h5py.Dataset,
+    *,
+    mapped: bool,
+) -> dict[str, Any]:
+    """Summarise the work a plan does against a dataset.
+
+    Args:
+        plan (ReadPlan): Plan returned by `plan_reads`
+        dataset (h5py.Dataset): Dataset the plan reads
+        mapped (bool): Whether the dataset is read through a memory map
+
+    Returns
+    -------
+        dict[str, Any]:
+            Dataset layout, numbers of requested ranges, rows and reads, rows
+            and uncompressed bytes read, and chunks and stored bytes touched
+    """
+    row_bytes = dataset.dtype.itemsize * int(np.prod(dataset.shape[1:]))
+    read_rows = int(np.sum(plan.reads[:, 1] - plan.reads[:, 0]))
+
+    explanation = {
+        "layout": "contiguous" if dataset.chunks is None else "chunked",
+        "mapped": mapped,
+        "ranges": len(plan.ranges),
+        "rows": plan.size,
+        "reads": len(plan.reads),
+        "rows_read": read_rows,
+        "bytes_read": read_rows * row_bytes,
+        "chunks": None,
+        "stored_bytes": read_rows * row_bytes,
+    }
+
+    if dataset.chunks is not None:
+        chunk_rows = dataset.chunks[0]
+        chunk_starts = np.concatenate(
+            [np.arange(start, stop, chunk_rows) for start, stop in plan.reads.tolist()]
+            or [np.zeros(0, dtype=np.int64)],
+        )
+        trailing_offsets = list(
+            itertools.product(
+                *(
+                    range(0, length, chunk_length)
+                    for length, chunk_length in zip(dataset.shape[1:], dataset.chunks[1:])
+                ),
+            ),
+        )
+        explanation["chunks"] = len(chunk_starts) * len(trailing_offsets)
+        explanation["stored_bytes"] = sum(
+            dataset.id.get_chunk_info_by_coord((int(start), *offsets)).size
+            for start in chunk_starts
+            for offsets in trailing_offsets
+        )
+
+    return explanation
@@ -0,0 +1,71 @@
+"""Cache serialised array responses for repeated data requests.
+
+Notebooks are often rerun, sending exactly the same request again. Serialised
+responses are cached against the file fingerprint, the field and columns, the
+rows selected and the output format, so repeated requests skip both reading
+and encoding. Masks are identified by a hash of the decoded ranges, so the same
+mask sent as JSON or as a binary upload shares a cache entry.
+"""
+import hashlib
+from collections.abc import Hashable
+from functools import lru_cache
+
+import numpy as np
+import numpy.typing as npt
+
+from api.config import get_settings
+from api.processing.caching import ByteLRUCache
+from api.processing.file_pool import get_file_fingerprint
+
+
+@lru_cache
+def get_result_cache() -> ByteLRUCache:
+    """Retrieve the process-wide cache of serialised array responses, configured from settings.
+
+    Returns
+    -------
+        ByteLRUCache: Response body cache keyed by `create_result_key`
+    """
+    return ByteLRUCache(get_settings().result_cache_max_bytes, "result")
+
+
+def hash_mask(mask: npt.NDArray) -> str:
+    """Hash the row ranges of a decoded mask.
+
+    Masks are converted to int64 first, so the hash does not depend on the
+    integer type the mask was sent with.
+
+    Args:
+        mask (npt.NDArray): Array of [start, stop) row ranges
+
+    Returns
+    -------
+        str: Hexadecimal BLAKE2b digest of the shape and values of the ranges
+    """
+    ranges = np.ascontiguousarray(mask, dtype=np.int64)
+    digest = hashlib.blake2b(str(ranges.shape).encode(), digest_size=16)
+    digest.update(ranges.tobytes())
+    return digest.hexdigest()
+
+
+def create_result_key(
+    filename: str,
+    field: str,
+    columns: int | None,
+    selection: Hashable,
+    array_format: str,
+) -> tuple[Hashable, ...]:
+    """Create the cache key for an array response.
+
+    Args:
+        filename (str): Path to HDF5 file
+        field (str): Field path
+        columns (int | None): Selector for columns in the case of multidim arrays
+        selection (Hashable): Description of the rows selected, such as a mask hash
+        array_format (str): Output format
+
+    Returns
+    -------
+        tuple[Hashable, ...]: Key identifying the response for this version of the file
+    """
+    return (get_file_fingerprint(filename), field, columns, selection, array_format)
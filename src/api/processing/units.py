@@ -9,6 +9,10 @@ from fastapi import HTTPException, status
 from swiftsimio.reader import SWIFTUnits
 from unyt import unyt_quantity
 
+from api.config import get_settings
+from api.processing.caching import ByteLRUCache
+from api.processing.file_pool import get_file_fingerprint, get_file_pool
+
 
 class RemoteSWIFTUnitsError(Exception):
     """Custom error class for metadata serialisation."""
@@ -117,7 +121,8 @@ def retrieve_units_json_compatible(filename: str) -> dict:
     -------
         dict: JSON-serialisable units dictionary.
     """
-    units = SWIFTUnits(filename)
+    with get_file_pool().open(filename):
+        units = SWIFTUnits(filename)
     if hasattr(units, "_handle"):
         units._handle = None  # do not serialize file handle
     return convert_swift_units_dict_types(units.__dict__)
@@ -133,7 +138,8 @@ def retrieve_swiftunits_dict(filename: str) -> dict:
     -------
         dict: Dictionary representation of SWIFTUnits object.
     """
-    return SWIFTUnits(filename).__dict__
+    with get_file_pool().open(filename):
+        return SWIFTUnits(filename).__dict__
 
 
 def create_unyt_quantities(swift_unit_dict: dict) -> dict[str, Any]:
@@ -173,10 +179,40 @@ def create_unyt_quantities(swift_unit_dict: dict) -> dict[str, Any]:
     return swift_unit_dict
 
 
-@lru_cache(maxsize=128)
+@lru_cache
+def get_units_cache() -> ByteLRUCache:
+    """Retrieve the process-wide cache of serialised units, configured from settings.
+
+    Returns
+    -------
+        ByteLRUCache: Units cache keyed by file fingerprint
+    """
+    return ByteLRUCache(get_settings().units_cache_max_bytes, "units")
+
+
 def create_swift_units(filename: Path) -> bytes:
     """Return a SWIFTUnits object, serialised with pickle.
 
+    Serialised units are cached against a fingerprint of the file, so repeat
+    requests are served from memory until the file changes on disk.
+
+    Args:
+        filename (Path): File path of specified HDF5 file
+
+    Returns
+    -------
+        bytes: Pickled SWIFTUnits object
+    """
+    fingerprint = get_file_fingerprint(filename)
+    return get_units_cache().get_or_create(
+        fingerprint,
+        lambda: serialise_swift_units(Path(fingerprint.path)),
+    )
+
+
+def serialise_swift_units(filename: Path) -> bytes:
+    """Read a SWIFTUnits object and serialise it with pickle.
+
     Args:
         filename (Path): File path of specified HDF5 file
 
@@ -188,10 +224,42 @@ def create_swift_units(filename: Path) -> bytes:
     -------
         bytes: Pickled SWIFTUnits object
     """
-    units = SWIFTUnits(filename)
+    with get_file_pool().open(filename):
+        units = SWIFTUnits(filename)
 
     try:
         return cloudpickle.dumps(units)
     except Exception as error:  # noqa: BLE001
         message = f"Error serialising metadata: {error!s}"
         raise RemoteSWIFTUnitsError(message) from error
+
+
+def get_field_units(filename: str, field: str) -> unyt_quantity:
+    """Retrieve the units of a field, as SWIFTsimIO derives them from its attributes.
+
+    Args:
+        filename (str): Path to HDF5 file.
+        field (str): Field path, e.g. "PartType0/Masses".
+
+    Returns
+    -------
+        unyt_quantity: Internal unit of the field, dimensionless if it has no units.
+    """
+    with get_file_pool().open(filename) as handle:
+        units = SWIFTUnits(filename)
+        attributes = handle[field].attrs
+
+        base_units = {
+            "I": units.current,
+            "L": units.length,
+            "M": units.mass,
+            "T": units.temperature,
+            "t": units.time,
+        }
+        field_units = unyt_quantity(1.0)
+        for dimension, base_unit in base_units.items():
+            exponent = attributes.get(f"U_{dimension} exponent", [0.0])[0]
+            if exponent != 0.0:
+                field_units = field_units * base_unit**exponent
+
+    return field_units
@@ -0,0 +1,127 @@
+"""Collect cProfile profiles of the work done for a single request.
+
+The profile of the request being handled is held in a context variable.
+`BoundedExecutor.run` runs each task of a profiled request under its own
+profiler, and the profiles are merged when the request finishes. Code run
+directly on the event loop is not profiled.
+
+Only one task is profiled at a time, across all requests. From Python 3.12,
+cProfile uses `sys.monitoring`, which allows a single active profiler per
+process, and a profiler then records every thread. Tasks started while
+another is being profiled run unprofiled. On Python 3.12 and later, work
+done by other threads while a task is profiled, including other requests,
+appears in its profile.
+"""
+import cProfile
+import pstats
+import threading
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import TypeVar
+
+from loguru import logger
+
+T = TypeVar("T")
+
+PROFILE_SUFFIX = ".prof"
+
+_profiler_lock = threading.Lock()
+
+
+class RequestProfile:
+    """Profiles collected while handling one request."""
+
+    def __init__(self, request_id: str):
+        """Class constructor.
+
+        Args:
+            request_id (str): Id of the profiled request
+        """
+        self.request_id = request_id
+
+        self._profiles: list[cProfile.Profile] = []
+        self._lock = threading.Lock()
+
+    def run(self, call: Callable[[], T]) -> T:
+        """Run a task under its own profiler, keeping the profile.
+
+        The task is run unprofiled if another task is being profiled.
+
+        Args:
+            call (Callable[[], T]): Task to run
+
+        Returns
+        -------
+            T: Value returned by the task
+        """
+        if not _profiler_lock.acquire(blocking=False):
+            logger.info(
+                f"Not profiling a task of request {self.request_id}, "
+                "another task is being profiled",
+            )
+            return call()
+
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(call)
+        finally:
+            _profiler_lock.release()
+            with self._lock:
+                self._profiles.append(profile)
+
+    def save(self, directory: Path) -> Path | None:
+        """Merge the profiles collected so far and write them to a file.
+
+        Args:
+            directory (Path): Directory to write the profile to
+
+        Returns
+        -------
+            Path | None:
+                Path of the profile, named after the request id, or None if no
+                tasks were profiled
+        """
+        with self._lock:
+            if not self._profiles:
+                return None
+            stats = pstats.Stats(*self._profiles)
+        directory.mkdir(parents=True, exist_ok=True)
+        profile_file = directory / f"{self.request_id}{PROFILE_SUFFIX}"
+        stats.dump_stats(profile_file)
+        return profile_file
+
+
+_request_profile: ContextVar[RequestProfile | None] = ContextVar(
+    "request_profile",
+    default=None,
+)
+
+
+def get_request_profile() -> RequestProfile | None:
+    """Retrieve the profile of the current request.
+
+    Returns
+    -------
+        RequestProfile | None: Profile of the request, or None if it is not being profiled
+    """
+    return _request_profile.get()
+
+
+@contextmanager
+def profiling(profile: RequestProfile) -> Iterator[RequestProfile]:
+    """Collect profiles of the executor tasks run for the current request.
+
+    Args:
+        profile (RequestProfile): Profile of the request
+
+    Yields
+    ------
+        RequestProfile: The profile, collecting tasks until the block exits
+    """
+    token = _request_profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _request_profile.reset(token)
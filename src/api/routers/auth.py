@@ -2,33 +2,18 @@
 
 Handles token based authentication.
 """
-from functools import lru_cache
-
 import jwt
 from fastapi import APIRouter, Depends, HTTPException, Security, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from loguru import logger
 from pydantic import BaseModel
 
-from api.config import Settings
+from api.config import Settings, get_settings
+from api.timing import timed
 from api.virgo_auth import SwiftAuthenticator
 
 bearer_scheme = HTTPBearer()
 
-
-@lru_cache
-def get_settings() -> Settings:
-    """Retrieve an instance of the Settings object.
-
-    Required by FastAPI when used with Depends.
-
-    Returns
-    -------
-        Settings: Settings object
-    """
-    return Settings()
-
-
 router = APIRouter()
 
 
@@ -126,7 +111,8 @@ def get_authenticated_user(
             detail="No token provided with request.",
         )
     logger.info(f"Received token: {authorisation.credentials}")
-    return decode_jwt(authorisation.credentials, settings)
+    with timed("auth"):
+        return decode_jwt(authorisation.credentials, settings)
 
 
 @router.post("/token")
@@ -1,19 +1,80 @@
 """Defines routes that return numpy arrays from HDF5 files."""
+import base64
+import binascii
+import json
+import os
+import tempfile
+from collections.abc import Callable, Hashable, Iterable, Iterator
 from pathlib import Path
-
-from fastapi import APIRouter, Depends, HTTPException, Response, status
-from pydantic import BaseModel
-from swiftsimio.reader import SWIFTUnits
-
+from typing import Literal
+
+import numpy as np
+import numpy.typing as npt
+from fastapi import (
+    APIRouter,
+    Depends,
+    File,
+    Form,
+    HTTPException,
+    Request,
+    Response,
+    UploadFile,
+    status,
+)
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from starlette.background import BackgroundTask
+
+from api.config import Settings, get_settings
+from api.processing.aggregation import (
+    AGGREGATE_OPERATIONS,
+    AggregateOperation,
+    aggregate_field,
+)
+from api.processing.arrow import (
+    ARROW_MEDIA_TYPE,
+    create_field_metadata,
+    generate_arrow_from_ndarrays,
+)
+from api.processing.compression import (
+    compress_chunks,
+    get_available_encodings,
+    get_shuffle_itemsize,
+    negotiate_encoding,
+    shuffle_npy_chunks,
+)
 from api.processing.data_processing import (
     SWIFTProcessor,
     SWIFTProcessorError,
     get_dataset_alias_map,
 )
-from api.processing.masks import return_mask, return_mask_boxsize
-from api.processing.metadata import create_swift_metadata
-from api.processing.units import create_swift_units, retrieve_units_json_compatible
+from api.processing.executors import (
+    BoundedExecutor,
+    get_data_executor,
+    get_metadata_executor,
+)
+from api.processing.extract import extract_snapshot
+from api.processing.file_pool import get_file_pool
+from api.processing.histograms import HistogramAxis, HistogramStatistic, histogram_fields
+from api.processing.masks import (
+    create_region_mask,
+    get_particle_group,
+    load_region_mask,
+    merge_ranges,
+    return_mask,
+    return_mask_boxsize,
+    sample_ranges,
+)
+from api.processing.metadata import create_swift_metadata, get_metadata_cache
+from api.processing.process_pool import borrowing_shared_arrays, get_array_reader
+from api.processing.result_cache import create_result_key, get_result_cache, hash_mask
+from api.processing.units import (
+    create_swift_units,
+    get_units_cache,
+    retrieve_units_json_compatible,
+)
 from api.routers.auth import get_authenticated_user
+from api.timing import timed
 
 router = APIRouter(
     prefix="/swiftdata",
@@ -21,6 +82,23 @@ router = APIRouter(
 
 dataset_map = get_dataset_alias_map()
 
+NPY_MEDIA_TYPE = "application/x-npy"
+NPZ_MEDIA_TYPE = "application/x-npz"
+HDF5_MEDIA_TYPE = "application/x-hdf5"
+RESULT_CACHE_HEADER = "X-Result-Cache"
+ORIGINAL_DTYPE_HEADER = "X-Original-Dtype"
+BINARY_MEDIA_TYPES = (NPY_MEDIA_TYPE, "application/octet-stream")
+BYTE_SHUFFLE_HEADER = "X-Byte-Shuffle"
+BYTE_SHUFFLE_OPT_IN = "1"
+
+ArrayFormat = Literal["json", "npy", "arrow"]
+BatchFormat = Literal["npz", "arrow"]
+ARRAY_MEDIA_TYPES = {
+    "json": JSONResponse.media_type,
+    "npy": NPY_MEDIA_TYPE,
+    "arrow": ARROW_MEDIA_TYPE,
+}
+
 
 class SWIFTBaseDataSpec(BaseModel):
     """Data required in each POST request.
@@ -50,6 +128,97 @@ class SWIFTMaskedDataSpec(SWIFTBaseDataSpec):
     mask_data_type: str | None = None
     mask_size: int
     columns: None | int = None
+    format: ArrayFormat | None = None  # noqa: A003
+    sample_fraction: float | None = Field(None, gt=0, le=1)
+    seed: int = 0
+    explain: bool = False
+    output_dtype: str | None = None
+    allow_unsafe_cast: bool = False
+
+
+class SWIFTMaskedBatchDataSpec(SWIFTBaseDataSpec):
+    """Data required in each request for several masked fields sharing one mask.
+
+    A Pydantic model to validate HTTP POST requests.
+
+    Args:
+        BaseModel (_type_): Pydantic BaseModel
+    """
+
+    fields: list[str]
+    columns: list[int | None] | None = None
+    mask_array_json: str
+    mask_data_type: str | None = None
+    mask_size: int
+    format: BatchFormat | None = None  # noqa: A003
+
+
+class SWIFTAggregateDataSpec(SWIFTBaseDataSpec):
+    """Data required in each request for an aggregation over a field.
+
+    A Pydantic model to validate HTTP POST requests.
+
+    Args:
+        BaseModel (_type_): Pydantic BaseModel
+    """
+
+    field: str
+    operations: list[AggregateOperation] = list(AGGREGATE_OPERATIONS)
+    mask_array_json: str | None = None
+    mask_data_type: str | None = None
+    columns: None | int = None
+
+
+class SWIFTHistogramDataSpec(SWIFTBaseDataSpec):
+    """Data required in each request for a histogram of one or two fields.
+
+    A Pydantic model to validate HTTP POST requests.
+
+    Args:
+        BaseModel (_type_): Pydantic BaseModel
+    """
+
+    fields: list[str] = Field(min_length=1, max_length=2)
+    bins: list[HistogramAxis] = Field(min_length=1, max_length=2)
+    columns: list[int | None] | None = None
+    weights: str | None = None
+    statistic: HistogramStatistic = "count"
+    mask_array_json: str | None = None
+    mask_data_type: str | None = None
+
+
+class SWIFTRegionDataSpec(SWIFTBaseDataSpec):
+    """Data required in each request for a spatial region.
+
+    A Pydantic model to validate HTTP POST requests.
+
+    Args:
+        BaseModel (_type_): Pydantic BaseModel
+    """
+
+    particle_type: str
+    region: list[tuple[float, float] | None] = Field(min_length=3, max_length=3)
+    units: str | None = None
+    fields: list[str] | None = None
+    columns: list[int | None] | None = None
+    format: ArrayFormat | None = None  # noqa: A003
+
+
+class SWIFTExtractDataSpec(SWIFTBaseDataSpec):
+    """Data required in each request for a subset of a snapshot written to a new file.
+
+    A Pydantic model to validate HTTP POST requests.
+
+    Args:
+        BaseModel (_type_): Pydantic BaseModel
+    """
+
+    particle_types: list[str] = Field(min_length=1)
+    fields: list[str] | None = None
+    region: list[tuple[float, float] | None] | None = Field(None, min_length=3, max_length=3)
+    units: str | None = None
+    mask_array_json: str | None = None
+    mask_data_type: str | None = None
 
 
 class SWIFTUnmaskedDataSpec(SWIFTBaseDataSpec):
@@ -64,6 +233,15 @@ class SWIFTUnmaskedDataSpec(SWIFTBaseDataSpec):
     filename: str | None = None
     field: str
     columns: None | int = None
+    format: ArrayFormat | None = None  # noqa: A003
+    stream: bool = False
+    start: int | None = Field(None, ge=0)
+    stop: int | None = Field(None, ge=0)
+    cursor: str | None = None
+    sample_fraction: float | None = Field(None, gt=0, le=1)
+    seed: int = 0
+    output_dtype: str | None = None
+    allow_unsafe_cast: bool = False
 
 
 class SWIFTDataSpecException(HTTPException):
@@ -87,7 +265,7 @@ class SWIFTDataSpecException(HTTPException):
 
 
 @router.post("/mask_boxsize")
-def get_mask_boxsize(
+async def get_mask_boxsize(
     data_spec: SWIFTBaseDataSpec,
     _: str = Depends(get_authenticated_user),
 ) -> dict:
@@ -100,10 +278,10 @@ def get_mask_boxsize(
     -------
         dict[str, str]: Dictionary containing boxsize array, data type and unyt units.
     """
-    processor = SWIFTProcessor(dataset_map)
-    file_path = get_file_path(data_spec, processor)
+    executor = get_metadata_executor()
+    file_path = await executor.run(get_file_path, data_spec, SWIFTProcessor(dataset_map))
 
-    return return_mask_boxsize(file_path)
+    return await executor.run(return_mask_boxsize, file_path)
 
 
 @router.post("/filepath")
@@ -125,26 +303,32 @@ def get_filepath_from_alias(
 
 
 @router.post("/mask")
-def get_mask(
+async def get_mask(
     data_spec: SWIFTBaseDataSpec,
+    request: Request,
+    settings: Settings = Depends(get_settings),
     _: str = Depends(get_authenticated_user),
 ) -> bytes:
     """Retrieve SWIFTMask object.
 
     Args:
         data_spec (SWIFTBaseDataSpec): Basic data specification indicating filename or alias.
+        request (Request): Incoming request, used for content negotiation
+        settings (Settings): Settings object defining compression levels
 
     Returns
     -------
         bytes: Pickled SWIFTMask object.
     """
-    processor = SWIFTProcessor(dataset_map)
-    file_path = get_file_path(data_spec, processor)
+    executor = get_metadata_executor()
+    file_path = await executor.run(get_file_path, data_spec, SWIFTProcessor(dataset_map))
 
-    serialised_mask = return_mask(file_path)
-    return Response(content=serialised_mask, media_type="application/octet-stream")
+    serialised_mask = await executor.run(return_mask, file_path)
+    response = Response(content=serialised_mask, media_type="application/octet-stream")
+    return encode_response(response, request, settings, executor)
 
 
+@timed("alias")
 def get_file_path(data_spec: SWIFTBaseDataSpec, processor: SWIFTProcessor) -> Path:
     """Retrieve a file path from a data spec object.
 
@@ -185,189 +369,1616 @@ def get_file_path(data_spec: SWIFTBaseDataSpec, processor: SWIFTProcessor) -> Pa
     return Path(file_path)
 
 
-@router.post("/masked_dataset")
-def get_masked_array_data(
-    data_spec: SWIFTMaskedDataSpec,
-    _: str = Depends(get_authenticated_user),
-) -> dict:
-    """Retrieve a masked array from a dataset.
+def negotiate_media_type(accept: str | None, available: Iterable[str]) -> str | None:
+    """Choose a media type from an Accept header.
 
-    Applies masking to an array generated from the HDF5 file
-    and returns the resulting array as JSON.
+    The media type with the highest quality value is chosen, with ties broken
+    by the order of the available media types. Only media types named in the
+    header can be chosen, so wildcards such as "*/*" leave the choice to the
+    caller, and types with a quality of 0 are never chosen.
 
     Args:
-        data_spec (SWIFTMaskedDataSpec):
-            Dataset information required in POST request
+        accept (str | None): Accept header sent with the request
+        available (Iterable[str]): Media types the server can produce, in order of preference
 
-    Raises
-    ------
-        SWIFTDataSpecException:
-            Exceptions raised for incorrectly formatted requests
+    Returns
+    -------
+        str | None: Chosen media type, or None if no available media type is accepted
+    """
+    if not accept:
+        return None
+
+    qualities = {}
+    for item in accept.split(","):
+        media_type, *parameters = (part.strip() for part in item.split(";"))
+        quality = 1.0
+        for parameter in parameters:
+            name, _, value = parameter.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[media_type.lower()] = quality
+
+    best_media_type, best_quality = None, 0.0
+    for media_type in available:
+        quality = qualities.get(media_type, 0.0)
+        if quality > best_quality:
+            best_media_type, best_quality = media_type, quality
+    return best_media_type
+
+
+def get_array_format(requested_format: ArrayFormat | None, accept: str | None) -> ArrayFormat:
+    """Decide how an array should be returned to the client.
+
+    An explicit format in the data spec takes precedence over the Accept header.
+
+    Args:
+        requested_format (ArrayFormat | None): Format requested in the data spec
+        accept (str | None): Accept header sent with the request
 
     Returns
     -------
-        dict[str, str]:
-            Numpy ndarray formatted as JSON. The resulting dictionary
-            contains the array and the original data type.
+        ArrayFormat: "arrow" or "npy" for binary responses, otherwise "json"
     """
-    processor = SWIFTProcessor(dataset_map)
+    if requested_format:
+        return requested_format
+    media_type = negotiate_media_type(
+        accept,
+        (ARROW_MEDIA_TYPE, *BINARY_MEDIA_TYPES, JSONResponse.media_type),
+    )
+    if media_type == ARROW_MEDIA_TYPE:
+        return "arrow"
+    if media_type in BINARY_MEDIA_TYPES:
+        return "npy"
+    return "json"
 
-    file_path = str(get_file_path(data_spec, processor).resolve())
 
-    if not data_spec.mask_array_json:
-        raise SWIFTDataSpecException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="No mask information found. \
-            Use the unmasked endpoint if requesting unmasked data.",
-        )
+def get_batch_format(requested_format: BatchFormat | None, accept: str | None) -> BatchFormat:
+    """Decide how several arrays should be returned to the client.
+
+    An explicit format in the data spec takes precedence over the Accept header.
+
+    Args:
+        requested_format (BatchFormat | None): Format requested in the data spec
+        accept (str | None): Accept header sent with the request
+
+    Returns
+    -------
+        BatchFormat: "arrow" for Arrow IPC responses, otherwise "npz"
+    """
+    if requested_format:
+        return requested_format
+    if negotiate_media_type(accept, (ARROW_MEDIA_TYPE, NPZ_MEDIA_TYPE)) == ARROW_MEDIA_TYPE:
+        return "arrow"
+    return "npz"
+
+
+def get_arrow_metadata(
+    file_path: str,
+    field: str,
+    array_format: ArrayFormat,
+) -> dict[str, str] | None:
+    """Describe a field for an Arrow response.
+
+    Args:
+        file_path (str): Path to the HDF5 file
+        field (str): Field path being returned
+        array_format (ArrayFormat): Output format
+
+    Raises
+    ------
+        SWIFTDataSpecException: HTTP 400 exception if the field is not found.
 
+    Returns
+    -------
+        dict[str, str] | None: Metadata of the Arrow column, or None for other formats
+    """
+    if array_format != "arrow":
+        return None
     try:
-        masked_array = SWIFTProcessor.get_array_masked(
-            file_path,
-            data_spec.field,
-            data_spec.mask_array_json,
-            data_spec.mask_data_type,
-            data_spec.mask_size,
-            data_spec.columns,
-        )
-    except SWIFTProcessorError:
+        return create_field_metadata(file_path, field)
+    except SWIFTProcessorError as error:
         raise SWIFTDataSpecException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Field {data_spec.field} not found in the requested file {file_path}.",
-        ) from SWIFTProcessorError
-
-    return processor.generate_dict_from_ndarray(
-        masked_array,
-    )
+            detail=str(error),
+        ) from error
 
 
-@router.post("/unmasked_dataset")
-def get_unmasked_array_data(
-    data_spec: SWIFTUnmaskedDataSpec,
-    _: str = Depends(get_authenticated_user),
-) -> dict:
-    """Retrieve an unmasked array from a dataset.
+@timed("encode")
+def create_array_response(
+    array: npt.NDArray,
+    array_format: ArrayFormat,
+    name: str = "array",
+    metadata: dict[str, str] | None = None,
+) -> Response:
+    """Serialise an array in the requested format.
 
-    Returns the array generated from the HDF5 file
-    using the data specification provided.
+    JSON responses are rendered here, rather than by FastAPI, so that encoding
+    large arrays runs on the executor instead of the event loop.
 
     Args:
-        data_spec (SWIFTUnmaskedDataSpec):
-            Dataset information required in POST request
+        array (npt.NDArray): Array to return to the client
+        array_format (ArrayFormat): Output format
+        name (str, optional): Name of the Arrow column. Defaults to "array".
+        metadata (dict[str, str] | None, optional):
+            Metadata of the Arrow column, such as its units. Defaults to None.
 
     Raises
     ------
-        SWIFTDataSpecException:
-            Exceptions raised for incorrectly formatted requests
+        SWIFTDataSpecException: HTTP 400 exception if the array cannot be sent as binary.
 
     Returns
     -------
-        dict[str, str]:
-            Numpy ndarray formatted as JSON. The resulting dictionary
-            contains the array and the original data type.
+        Response:
+            JSON response holding the array and its data type, a binary NPY
+            response holding the raw array buffer with its dtype, shape and byte
+            order, or an Arrow IPC stream with the array as its only column.
     """
-    processor = SWIFTProcessor(dataset_map)
+    if array_format in ("npy", "arrow"):
+        try:
+            if array_format == "npy":
+                content = SWIFTProcessor.generate_npy_from_ndarray(array)
+            else:
+                content = generate_arrow_from_ndarrays({name: array}, {name: metadata or {}})
+        except SWIFTProcessorError as error:
+            raise SWIFTDataSpecException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(error),
+            ) from error
+        return Response(content=content, media_type=ARRAY_MEDIA_TYPES[array_format])
 
-    file_path = str(get_file_path(data_spec, processor).resolve())
+    return JSONResponse(content=SWIFTProcessor.generate_dict_from_ndarray(array))
 
-    unmasked_array = SWIFTProcessor.get_array_unmasked(
-        file_path,
-        data_spec.field,
-        data_spec.columns,
-    )
 
-    return processor.generate_dict_from_ndarray(
-        unmasked_array,
+def create_cached_array_response(
+    cache_key: Hashable,
+    array_format: ArrayFormat,
+    read_array: Callable[[], npt.NDArray],
+    name: str = "array",
+    metadata: dict[str, str] | None = None,
+) -> Response:
+    """Serialise an array, reusing a cached response body for repeated requests.
+
+    Identical requests arriving together share a single read: the first one
+    reads and serialises the array while the others wait for its body. Arrays
+    read by the process pool are serialised straight from shared memory. The
+    X-Result-Cache header reports whether the body came from the cache, was
+    created by this request, or was shared with a concurrent request.
+
+    Args:
+        cache_key (Hashable): Key created by `create_result_key`
+        array_format (ArrayFormat): Output format
+        read_array (Callable[[], npt.NDArray]): Function reading the array on a cache miss
+        name (str, optional): Name of the Arrow column. Defaults to "array".
+        metadata (dict[str, str] | None, optional):
+            Metadata of the Arrow column, such as its units. Defaults to None.
+
+    Returns
+    -------
+        Response: Array in the requested format
+    """
+
+    def create_body() -> bytes:
+        with borrowing_shared_arrays():
+            return create_array_response(read_array(), array_format, name, metadata).body
+
+    body, cache_status = get_result_cache().get_or_create_with_status(cache_key, create_body)
+    return Response(
+        content=body,
+        media_type=ARRAY_MEDIA_TYPES[array_format],
+        headers={RESULT_CACHE_HEADER: cache_status},
     )
 
 
-@router.post("/metadata_remoteunits")
-def retrieve_metadata_with_remote_units(
-    data_spec: SWIFTBaseDataSpec,
-    _: str = Depends(get_authenticated_user),
-) -> Response:
-    """Retrieve metadata from a file path.
+def encode_chunks(
+    chunks: Iterable[bytes],
+    request: Request,
+    settings: Settings,
+    npy_layout: tuple[np.dtype, int] | None = None,
+) -> tuple[Iterable[bytes], dict[str, str]]:
+    """Compress a response body with the encoding negotiated with the client.
+
+    NPY bodies of numeric arrays are byte-shuffled before compression when the
+    client sends the X-Byte-Shuffle header. The response then repeats this header
+    with the item size and block size needed to reverse the shuffle.
 
     Args:
-        data_spec (SWIFTBaseDataSpec): Base dataspec specifying file path or alias.
+        chunks (Iterable[bytes]): Uncompressed body chunks
+        request (Request): Incoming request, used for content negotiation
+        settings (Settings): Settings object defining compression levels
+        npy_layout (tuple[np.dtype, int] | None, optional):
+            Data type and header length of an NPY body. Defaults to None.
 
     Returns
     -------
-        dict: Metadata for specified file
+        tuple[Iterable[bytes], dict[str, str]]: Encoded body chunks and headers describing them
     """
-    processor = SWIFTProcessor(dataset_map)
-    file_path = str(get_file_path(data_spec, processor).resolve())
+    headers = {"Vary": "Accept-Encoding"}
+    encoding = negotiate_encoding(
+        request.headers.get("accept-encoding"),
+        get_available_encodings(),
+    )
+    if encoding is None:
+        return chunks, headers
+
+    if npy_layout is not None and request.headers.get(BYTE_SHUFFLE_HEADER) == BYTE_SHUFFLE_OPT_IN:
+        data_type, header_bytes = npy_layout
+        itemsize = get_shuffle_itemsize(data_type)
+        if itemsize is not None:
+            block_bytes = max(settings.byte_shuffle_block_bytes // itemsize, 1) * itemsize
+            chunks = shuffle_npy_chunks(chunks, header_bytes, itemsize, block_bytes)
+            headers[BYTE_SHUFFLE_HEADER] = f"itemsize={itemsize}; block-bytes={block_bytes}"
+
+    levels = {
+        "gzip": settings.gzip_level,
+        "zstd": settings.zstd_level,
+        "lz4": settings.lz4_level,
+    }
+    headers["Content-Encoding"] = encoding
+    return compress_chunks(chunks, encoding, levels[encoding]), headers
+
+
+def encode_response(
+    response: Response,
+    request: Request,
+    settings: Settings,
+    executor: BoundedExecutor,
+) -> Response:
+    """Compress a response if the client accepts a supported encoding.
 
-    swift_units = SWIFTUnits(file_path)
+    Compression runs on the executor as the body is sent. Bodies smaller
+    than the configured minimum are sent unchanged.
 
-    serialised_metadata = create_swift_metadata(file_path, swift_units)
+    Args:
+        response (Response): Uncompressed response
+        request (Request): Incoming request, used for content negotiation
+        settings (Settings): Settings object defining compression levels
+        executor (BoundedExecutor): Executor to compress the body on
 
-    return Response(content=serialised_metadata, media_type="application/octet-stream")
+    Returns
+    -------
+        Response: Original response, or a streamed compressed response
+    """
+    if len(response.body) < settings.compression_min_bytes:
+        response.headers["Vary"] = "Accept-Encoding"
+        return response
+
+    npy_layout = None
+    if response.media_type == NPY_MEDIA_TYPE:
+        npy_layout = SWIFTProcessor.read_npy_header(response.body)
+
+    chunks, headers = encode_chunks([response.body], request, settings, npy_layout)
+    if "Content-Encoding" not in headers:
+        response.headers.update(headers)
+        return response
+
+    passed_headers = {
+        name: value
+        for name, value in response.headers.items()
+        if name not in ("content-length", "content-type")
+    }
+    return StreamingResponse(
+        executor.iterate(iter(chunks)),
+        status_code=response.status_code,
+        media_type=response.media_type,
+        headers={**passed_headers, **headers},
+    )
 
 
-@router.post("/metadata")
-def retrieve_metadata(
-    data_spec: SWIFTBaseDataSpec,
+@router.post("/masked_dataset", response_model=None)
+async def get_masked_array_data(
+    data_spec: SWIFTMaskedDataSpec,
+    request: Request,
+    settings: Settings = Depends(get_settings),
     _: str = Depends(get_authenticated_user),
 ) -> Response:
-    """Retrieve metadata from a file path.
+    """Retrieve a masked array from a dataset.
+
+    Applies masking to an array generated from the HDF5 file
+    and returns the resulting array as JSON, or as NPY if requested
+    via the data spec format or the Accept header.
 
     Args:
-        data_spec (SWIFTBaseDataSpec): Base dataspec specifying file path or alias.
+        data_spec (SWIFTMaskedDataSpec):
+            Dataset information required in POST request
+        request (Request): Incoming request, used for content negotiation
+        settings (Settings): Settings object defining compression levels
 
     Returns
     -------
-        dict: Metadata for specified file
+        Response:
+            Numpy ndarray formatted as JSON. The resulting dictionary
+            contains the array and the original data type. Binary
+            requests receive the array in NPY format. With explain set,
+            a summary of the planned reads is returned instead.
     """
-    processor = SWIFTProcessor(dataset_map)
-    file_path = str(get_file_path(data_spec, processor).resolve())
+    executor = get_data_executor()
+    array_format = get_array_format(data_spec.format, request.headers.get("accept"))
+    response = await executor.run(read_masked_array, data_spec, array_format)
+    return encode_response(response, request, settings, executor)
 
-    swift_units = SWIFTUnits(file_path)
 
-    serialised_metadata = create_swift_metadata(file_path, swift_units)
+def read_masked_array(data_spec: SWIFTMaskedDataSpec, array_format: ArrayFormat) -> Response:
+    """Read a masked array and serialise it. Blocks, so runs on the data executor.
 
-    return Response(content=serialised_metadata, media_type="application/octet-stream")
+    Args:
+        data_spec (SWIFTMaskedDataSpec):
+            Dataset information required in POST request
+        array_format (ArrayFormat): Output format
 
+    Raises
+    ------
+        SWIFTDataSpecException:
+            Exceptions raised for incorrectly formatted requests
 
-@router.post("/units_dict")
-def retrieve_units_dict(
-    data_spec: SWIFTBaseDataSpec,
-    _: str = Depends(get_authenticated_user),
-) -> dict:
-    """Retrieve units for the specified file.
+    Returns
+    -------
+        Response: Masked array in the requested format
+    """
+    file_path, mask = load_masked_selection(data_spec)
+
+    try:
+        if data_spec.explain:
+            return JSONResponse(
+                content=SWIFTProcessor.explain_masked_read(file_path, data_spec.field, mask),
+            )
+
+        output_dtype, dtype_headers = get_output_dtype(
+            file_path,
+            data_spec.field,
+            data_spec.output_dtype,
+            allow_unsafe_cast=data_spec.allow_unsafe_cast,
+        )
+        selection = ("mask", hash_mask(mask), data_spec.mask_size)
+        if data_spec.sample_fraction is not None:
+            selection = (*selection, data_spec.sample_fraction, data_spec.seed)
+        if output_dtype is not None:
+            selection = (*selection, output_dtype.str)
+        response = create_cached_array_response(
+            create_result_key(
+                file_path,
+                data_spec.field,
+                data_spec.columns,
+                selection,
+                array_format,
+            ),
+            array_format,
+            lambda: read_masked_rows(file_path, data_spec, mask, output_dtype),
+            data_spec.field,
+            get_arrow_metadata(file_path, data_spec.field, array_format),
+        )
+    except SWIFTProcessorError as error:
+        raise SWIFTDataSpecException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(error),
+        ) from error
+
+    response.headers.update(dtype_headers)
+    return response
+
+
+def load_masked_selection(data_spec: SWIFTMaskedDataSpec) -> tuple[str, npt.NDArray]:
+    """Locate the file and decode the mask of a masked request.
 
     Args:
-        data_spec (SWIFTBaseDataSpec): Base dataspec specifying file path or alias.
+        data_spec (SWIFTMaskedDataSpec):
+            Dataset information required in POST request
+
+    Raises
+    ------
+        SWIFTDataSpecException:
+            HTTP 400 exception if the mask is missing or cannot be decoded.
 
     Returns
     -------
-        dict: Unit data for specified file
+        tuple[str, npt.NDArray]: Path to the HDF5 file and array of [start, stop) row ranges
     """
     processor = SWIFTProcessor(dataset_map)
 
     file_path = str(get_file_path(data_spec, processor).resolve())
 
-    return retrieve_units_json_compatible(file_path)
+    if not data_spec.mask_array_json:
+        raise SWIFTDataSpecException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No mask information found. \
+            Use the unmasked endpoint if requesting unmasked data.",
+        )
+
+    try:
+        mask = SWIFTProcessor.load_ndarray_from_json(
+            data_spec.mask_array_json,
+            data_spec.mask_data_type,
+        )
+    except SWIFTProcessorError as error:
+        raise SWIFTDataSpecException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(error),
+        ) from error
+    return file_path, mask
 
 
-@router.post("/units")
-def retrieve_units(
-    data_spec: SWIFTBaseDataSpec,
-    _: str = Depends(get_authenticated_user),
-) -> dict:
-    """Retrieve units for the specified file.
+def read_masked_rows(
+    file_path: str,
+    data_spec: SWIFTMaskedDataSpec,
+    mask: npt.NDArray,
+    output_dtype: np.dtype | None = None,
+) -> npt.NDArray:
+    """Read the rows of a field selected by a mask, or a sample of them.
 
     Args:
-        data_spec (SWIFTBaseDataSpec): Base dataspec specifying file path or alias.
+        file_path (str): Path to the HDF5 file
+        data_spec (SWIFTMaskedDataSpec): Dataset information required in POST request
+        mask (npt.NDArray): Array of [start, stop) row ranges
+        output_dtype (np.dtype | None, optional):
+            Data type to convert the rows to while reading. Defaults to None.
 
     Returns
     -------
-        dict: Unit data for specified file
+        npt.NDArray: Selected rows of the field
     """
-    processor = SWIFTProcessor(dataset_map)
+    if data_spec.sample_fraction is not None:
+        return read_sampled_array(file_path, data_spec, mask, output_dtype)
 
-    file_path = get_file_path(data_spec, processor).resolve()
+    return get_array_reader().get_array_masked_from_ranges(
+        file_path,
+        data_spec.field,
+        mask,
+        data_spec.mask_size,
+        data_spec.columns,
+        output_dtype,
+    )
+
+
+@router.post("/masked_dataset_upload", response_model=None)
+async def get_masked_array_data_from_upload(
+    request: Request,
+    field: str = Form(),
+    mask_size: int = Form(),
+    mask: UploadFile = File(),
+    alias: str | None = Form(None),
+    filename: str | None = Form(None),
+    mask_data_type: str | None = Form(None),
+    columns: int | None = Form(None),
+    array_format: ArrayFormat | None = Form(None, alias="format"),
+    settings: Settings = Depends(get_settings),
+    _: str = Depends(get_authenticated_user),
+) -> Response:
+    """Retrieve a masked array from a dataset using a binary mask upload.
+
+    Accepts a multipart form in which the mask is uploaded as a file holding
+    the raw buffer of int32 or int64 start/stop pairs, avoiding the cost of
+    parsing large masks from JSON.
+
+    Args:
+        request (Request): Incoming request, used for content negotiation
+        field (str): Field path to retrieve
+        mask_size (int): Size of array mask
+        mask (UploadFile): Raw buffer of integer start/stop pairs
+        alias (str | None): Dataset alias
+        filename (str | None): Full path to the HDF5 file
+        mask_data_type (str | None): Integer data type of the mask. Defaults to int64.
+        columns (int | None): Selector for columns in the case of multidim arrays
+        array_format (ArrayFormat | None): Output format, sent as the "format" form field
+        settings (Settings): Settings object defining compression levels
 
-    serialised_units = create_swift_units(file_path)
+    Returns
+    -------
+        Response:
+            Numpy ndarray formatted as JSON, or in NPY format for binary requests.
+    """
+    data_spec = SWIFTBaseDataSpec(alias=alias, filename=filename)
+    mask_bytes = await mask.read()
+    array_format = get_array_format(array_format, request.headers.get("accept"))
+
+    executor = get_data_executor()
+    response = await executor.run(
+        read_masked_array_from_bytes,
+        data_spec,
+        field,
+        mask_bytes,
+        mask_data_type,
+        mask_size,
+        columns,
+        array_format,
+    )
+    return encode_response(response, request, settings, executor)
 
-    return Response(content=serialised_units, media_type="application/octet-stream")
+
+def read_masked_array_from_bytes(
+    data_spec: SWIFTBaseDataSpec,
+    field: str,
+    mask_bytes: bytes,
+    mask_data_type: str | None,
+    mask_size: int,
+    columns: int | None,
+    array_format: ArrayFormat,
+) -> Response:
+    """Read a masked array using a binary mask and serialise it. Runs on the data executor.
+
+    Args:
+        data_spec (SWIFTBaseDataSpec): Data specification indicating filename or alias
+        field (str): Field path to retrieve
+        mask_bytes (bytes): Raw buffer of integer start/stop pairs
+        mask_data_type (str | None): Integer data type of the mask
+        mask_size (int): Size of array mask
+        columns (int | None): Selector for columns in the case of multidim arrays
+        array_format (ArrayFormat): Output format
+
+    Raises
+    ------
+        SWIFTDataSpecException:
+            Exceptions raised for incorrectly formatted requests
+
+    Returns
+    -------
+        Response: Masked array in the requested format
+    """
+    processor = SWIFTProcessor(dataset_map)
+
+    file_path = str(get_file_path(data_spec, processor).resolve())
+
+    try:
+        mask_ranges = SWIFTProcessor.load_ndarray_from_bytes(mask_bytes, mask_data_type)
+    except SWIFTProcessorError as error:
+        raise SWIFTDataSpecException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(error),
+        ) from error
+
+    if not mask_ranges.size:
+        raise SWIFTDataSpecException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No mask information found. \
+            Use the unmasked endpoint if requesting unmasked data.",
+        )
+
+    try:
+        return create_cached_array_response(
+            create_result_key(
+                file_path,
+                field,
+                columns,
+                ("mask", hash_mask(mask_ranges), mask_size),
+                array_format,
+            ),
+            array_format,
+            lambda: get_array_reader().get_array_masked_from_ranges(
+                file_path,
+                field,
+                mask_ranges,
+                mask_size,
+                columns,
+            ),
+            field,
+            get_arrow_metadata(file_path, field, array_format),
+        )
+    except SWIFTProcessorError as error:
+        raise SWIFTDataSpecException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(error),
+        ) from error
+
+
+@router.post("/masked_batch")
+async def get_masked_batch_array_data(
+    data_spec: SWIFTMaskedBatchDataSpec,
+    request: Request,
+    settings: Settings = Depends(get_settings),
+    _: str = Depends(get_authenticated_user),
+) -> Response:
+    """Retrieve several masked arrays from a dataset using a single mask.
+
+    The mask is parsed once and the file opened once for all fields.
+
+    Args:
+        data_spec (SWIFTMaskedBatchDataSpec):
+            Dataset information required in POST request
+        request (Request): Incoming request, used for content negotiation
+        settings (Settings): Settings object defining compression levels
+
+    Returns
+    -------
+        Response:
+            NPZ archive holding one array per requested field, keyed by field name,
+            or an Arrow IPC stream with one column per field if requested via the
+            data spec format or the Accept header.
+    """
+    executor = get_data_executor()
+    batch_format = get_batch_format(data_spec.format, request.headers.get("accept"))
+    response = await executor.run(read_masked_batch, data_spec, batch_format)
+    return encode_response(response, request, settings, executor)
+
+
+def read_masked_batch(data_spec: SWIFTMaskedBatchDataSpec, batch_format: BatchFormat) -> Response:
+    """Read several masked arrays into an NPZ archive or Arrow stream. Runs on the data executor.
+
+    Args:
+        data_spec (SWIFTMaskedBatchDataSpec):
+            Dataset information required in POST request
+        batch_format (BatchFormat): Output format
+
+    Raises
+    ------
+        SWIFTDataSpecException:
+            Exceptions raised for incorrectly formatted requests
+
+    Returns
+    -------
+        Response: NPZ archive or Arrow IPC stream holding one array per requested field
+    """
+    processor = SWIFTProcessor(dataset_map)
+
+    file_path = str(get_file_path(data_spec, processor).resolve())
+
+    validate_fields(data_spec.fields, data_spec.columns)
+
+    try:
+        mask = SWIFTProcessor.load_ndarray_from_json(
+            data_spec.mask_array_json,
+            data_spec.mask_data_type,
+        )
+        masked_arrays = SWIFTProcessor.get_arrays_masked_from_ranges(
+            file_path,
+            data_spec.fields,
+            mask,
+            data_spec.mask_size,
+            data_spec.columns,
+        )
+        return create_batch_response(
+            masked_arrays,
+            batch_format,
+            file_path,
+            dict(zip(data_spec.fields, data_spec.fields)),
+        )
+    except SWIFTProcessorError as error:
+        raise SWIFTDataSpecException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(error),
+        ) from error
+
+
+@timed("encode")
+def create_batch_response(
+    arrays: dict[str, npt.NDArray],
+    batch_format: BatchFormat,
+    file_path: str,
+    field_paths: dict[str, str],
+) -> Response:
+    """Serialise several arrays of a file as an NPZ archive or an Arrow IPC stream.
+
+    Args:
+        arrays (dict[str, npt.NDArray]): Arrays keyed by the name returned to the client
+        batch_format (BatchFormat): Output format
+        file_path (str): Path to the HDF5 file the arrays were read from
+        field_paths (dict[str, str]): Field path of each array, keyed by name
+
+    Raises
+    ------
+        SWIFTProcessorError: Raised if the arrays cannot be serialised.
+
+    Returns
+    -------
+        Response: NPZ archive, or Arrow IPC stream with field units in the column metadata
+    """
+    if batch_format == "npz":
+        content = SWIFTProcessor.generate_npz_from_ndarrays(arrays)
+        return Response(content=content, media_type=NPZ_MEDIA_TYPE)
+
+    metadata = {name: create_field_metadata(file_path, field_paths[name]) for name in arrays}
+    content = generate_arrow_from_ndarrays(arrays, metadata)
+    return Response(content=content, media_type=ARROW_MEDIA_TYPE)
+
+
+@router.post("/aggregate")
+async def get_aggregate_data(
+    data_spec: SWIFTAggregateDataSpec,
+    settings: Settings = Depends(get_settings),
+    _: str = Depends(get_authenticated_user),
+) -> dict:
+    """Reduce a field, optionally masked, to summary values.
+
+    The field is read and reduced in blocks, so the full array is never
+    held in memory or sent to the client.
+
+    Args:
+        data_spec (SWIFTAggregateDataSpec):
+            Dataset information required in POST request
+        settings (Settings): Settings object defining the block size
+
+    Returns
+    -------
+        dict:
+            Value of each requested reduction, with the units
+            and scale factor exponent of the field.
+    """
+    return await get_data_executor().run(
+        read_aggregate,
+        data_spec,
+        settings.stream_block_size_bytes,
+    )
+
+
+def read_aggregate(data_spec: SWIFTAggregateDataSpec, block_size_bytes: int) -> dict:
+    """Calculate the reductions requested for a field. Runs on the data executor.
+
+    Args:
+        data_spec (SWIFTAggregateDataSpec):
+            Dataset information required in POST request
+        block_size_bytes (int): Approximate size of each block read from the file
+
+    Raises
+    ------
+        SWIFTDataSpecException:
+            Exceptions raised for incorrectly formatted requests
+
+    Returns
+    -------
+        dict: Value of each requested reduction, with the units of the field
+    """
+    processor = SWIFTProcessor(dataset_map)
+
+    file_path = str(get_file_path(data_spec, processor).resolve())
+
+    try:
+        mask = None
+        if data_spec.mask_array_json:
+            mask = SWIFTProcessor.load_ndarray_from_json(
+                data_spec.mask_array_json,
+                data_spec.mask_data_type,
+            )
+        return aggregate_field(
+            file_path,
+            data_spec.field,
+            data_spec.operations,
+            mask,
+            data_spec.columns,
+            block_size_bytes,
+        )
+    except SWIFTProcessorError as error:
+        raise SWIFTDataSpecException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(error),
+        ) from error
+
+
+@router.post("/histogram")
+async def get_histogram_data(
+    data_spec: SWIFTHistogramDataSpec,
+    settings: Settings = Depends(get_settings),
+    _: str = Depends(get_authenticated_user),
+) -> dict:
+    """Calculate a 1D or 2D histogram or binned statistic of fields.
+
+    The fields are binned in blocks on the server and only the bins are
+    returned, e.g. for phase diagrams or mass functions.
+
+    Args:
+        data_spec (SWIFTHistogramDataSpec):
+            Dataset information required in POST request
+        settings (Settings): Settings object defining the block size
+
+    Returns
+    -------
+        dict:
+            Bin edges, number of rows in each bin, the requested statistic
+            in each bin (null for empty bins) and the units of each field.
+    """
+    return await get_data_executor().run(
+        read_histogram,
+        data_spec,
+        settings.stream_block_size_bytes,
+    )
+
+
+def read_histogram(data_spec: SWIFTHistogramDataSpec, block_size_bytes: int) -> dict:
+    """Calculate the histogram requested for one or two fields. Runs on the data executor.
+
+    Args:
+        data_spec (SWIFTHistogramDataSpec):
+            Dataset information required in POST request
+        block_size_bytes (int): Approximate size of each block read from each field
+
+    Raises
+    ------
+        SWIFTDataSpecException:
+            Exceptions raised for incorrectly formatted requests
+
+    Returns
+    -------
+        dict: Bin edges, counts and statistic in each bin, and the units of each field
+    """
+    processor = SWIFTProcessor(dataset_map)
+
+    file_path = str(get_file_path(data_spec, processor).resolve())
+
+    validate_fields(data_spec.fields, data_spec.columns, repeat_fields=True)
+    if len(data_spec.bins) != len(data_spec.fields):
+        raise SWIFTDataSpecException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="One set of bins must be provided for each field.",
+        )
+
+    try:
+        mask = None
+        if data_spec.mask_array_json:
+            mask = SWIFTProcessor.load_ndarray_from_json(
+                data_spec.mask_array_json,
+                data_spec.mask_data_type,
+            )
+        return histogram_fields(
+            file_path,
+            data_spec.fields,
+            data_spec.bins,
+            data_spec.statistic,
+            data_spec.weights,
+            mask,
+            data_spec.columns,
+            block_size_bytes,
+        )
+    except SWIFTProcessorError as error:
+        raise SWIFTDataSpecException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(error),
+        ) from error
+
+
+def validate_fields(
+    fields: list[str],
+    columns: list[int | None] | None,
+    *,
+    repeat_fields: bool = False,
+) -> None:
+    """Check the fields and column selectors requested together.
+
+    Args:
+        fields (list[str]): Field paths to retrieve
+        columns (list[int | None] | None): Column selector for each field
+        repeat_fields (bool, optional):
+            Allow a field to be repeated with different columns, for responses
+            not keyed by field name. Defaults to False.
+
+    Raises
+    ------
+        SWIFTDataSpecException:
+            HTTP 400 exception on repeated fields or field and column pairs,
+            or mismatched selectors.
+    """
+    if columns is not None and len(columns) != len(fields):
+        raise SWIFTDataSpecException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="One column selector must be provided for each field.",
+        )
+    if repeat_fields:
+        selections = list(zip(fields, columns or [None] * len(fields)))
+        if len(set(selections)) != len(selections):
+            raise SWIFTDataSpecException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Each field and column pair may only be requested once.",
+            )
+    elif len(set(fields)) != len(fields):
+        raise SWIFTDataSpecException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Each field may only be requested once.",
+        )
+
+
+@router.post("/region", response_model=None)
+async def get_region_data(
+    data_spec: SWIFTRegionDataSpec,
+    request: Request,
+    settings: Settings = Depends(get_settings),
+    _: str = Depends(get_authenticated_user),
+) -> Response:
+    """Select the particles of one type in a spatial region.
+
+    Builds a spatial mask on the server, so clients no longer download the
+    full mask and upload the ranges they select from it. The number of
+    selected rows is sent in the X-Mask-Size header.
+
+    Args:
+        data_spec (SWIFTRegionDataSpec):
+            Dataset information required in POST request
+        request (Request): Incoming request, used for content negotiation
+        settings (Settings): Settings object defining compression levels
+
+    Returns
+    -------
+        Response:
+            NPZ archive of the requested fields keyed by field name, or an
+            Arrow IPC stream if the arrow format is requested. If no fields
+            are requested, the merged [start, stop) row ranges
+            as JSON, NPY or Arrow, ready to send to the masked endpoints.
+    """
+    executor = get_data_executor()
+    array_format = get_array_format(data_spec.format, request.headers.get("accept"))
+    response = await executor.run(read_region, data_spec, array_format)
+    return encode_response(response, request, settings, executor)
+
+
+def read_region(data_spec: SWIFTRegionDataSpec, array_format: ArrayFormat) -> Response:
+    """Build a region mask and read the selected rows. Runs on the data executor.
+
+    Args:
+        data_spec (SWIFTRegionDataSpec):
+            Dataset information required in POST request
+        array_format (ArrayFormat):
+            Output format for the row ranges. The arrow format also applies to the fields.
+
+    Raises
+    ------
+        SWIFTDataSpecException:
+            Exceptions raised for incorrectly formatted requests
+
+    Returns
+    -------
+        Response: NPZ archive or Arrow IPC stream of the selected fields, or the row ranges
+    """
+    processor = SWIFTProcessor(dataset_map)
+
+    file_path = get_file_path(data_spec, processor).resolve()
+
+    if data_spec.fields is not None:
+        validate_fields(data_spec.fields, data_spec.columns)
+
+    try:
+        mask, mask_size, group = create_region_mask(
+            file_path,
+            data_spec.particle_type,
+            data_spec.region,
+            data_spec.units,
+        )
+        if data_spec.fields is None:
+            response = create_array_response(mask, array_format, "mask")
+        else:
+            field_paths = {field: f"{group}/{field}" for field in data_spec.fields}
+            masked_arrays = SWIFTProcessor.get_arrays_masked_from_ranges(
+                str(file_path),
+                list(field_paths.values()),
+                mask,
+                mask_size,
+                data_spec.columns,
+            )
+            response = create_batch_response(
+                dict(zip(data_spec.fields, masked_arrays.values(), strict=True)),
+                "arrow" if array_format == "arrow" else "npz",
+                str(file_path),
+                field_paths,
+            )
+    except SWIFTProcessorError as error:
+        raise SWIFTDataSpecException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(error),
+        ) from error
+
+    response.headers["X-Mask-Size"] = str(mask_size)
+    return response
+
+
+@router.post("/extract", response_model=None)
+async def get_extract(
+    data_spec: SWIFTExtractDataSpec,
+    settings: Settings = Depends(get_settings),
+    _: str = Depends(get_authenticated_user),
+) -> FileResponse:
+    """Download a subset of a snapshot as a new HDF5 file.
+
+    The selected rows of each particle type are written, with the header,
+    units and cell metadata of the snapshot updated for the subset, to a
+    scratch file that is sent to the client and then deleted. The file can
+    be opened with `swiftsimio.load`.
+
+    Args:
+        data_spec (SWIFTExtractDataSpec):
+            Dataset information required in POST request
+        settings (Settings): Settings object defining the scratch directory and block size
+
+    Returns
+    -------
+        FileResponse: HDF5 file holding the selected particles
+    """
+    output_file = await get_data_executor().run(write_extract, data_spec, settings)
+    return FileResponse(
+        output_file,
+        media_type=HDF5_MEDIA_TYPE,
+        filename=f"{output_file.stem}.hdf5",
+        background=BackgroundTask(output_file.unlink, missing_ok=True),
+    )
+
+
+def write_extract(
+    data_spec: SWIFTExtractDataSpec,
+    settings: Settings,
+    progress: Callable[[float], None] | None = None,
+) -> Path:
+    """Write the subset of a snapshot requested to a scratch file. Runs on the data executor.
+
+    Args:
+        data_spec (SWIFTExtractDataSpec):
+            Dataset information required in POST request
+        settings (Settings): Settings object defining the scratch directory and block size
+        progress (Callable[[float], None] | None, optional):
+            Called with the fraction of fields copied. Defaults to None.
+
+    Raises
+    ------
+        SWIFTDataSpecException:
+            Exceptions raised for incorrectly formatted requests
+
+    Returns
+    -------
+        Path: Path to the written file, which the caller must delete
+    """
+    processor = SWIFTProcessor(dataset_map)
+
+    file_path = get_file_path(data_spec, processor).resolve()
+
+    if data_spec.mask_array_json is not None and data_spec.region is not None:
+        raise SWIFTDataSpecException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Provide either a mask or a region, not both.",
+        )
+    if data_spec.mask_array_json is None and (
+        data_spec.region is None or all(bounds is None for bounds in data_spec.region)
+    ):
+        raise SWIFTDataSpecException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Provide a mask or a region bounding at least one axis to select rows.",
+        )
+    if data_spec.mask_array_json is not None and len(data_spec.particle_types) != 1:
+        raise SWIFTDataSpecException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="A mask can only be applied to a single particle type.",
+        )
+    if data_spec.fields is not None:
+        validate_fields(data_spec.fields, None)
+
+    descriptor, output_name = tempfile.mkstemp(
+        prefix=f"{file_path.stem}_extract_",
+        suffix=".hdf5",
+        dir=settings.extract_directory,
+    )
+    os.close(descriptor)
+    output_file = Path(output_name)
+
+    try:
+        mask = load_region_mask(file_path, data_spec.region, data_spec.units)
+        selections = {}
+        for particle_type in data_spec.particle_types:
+            particle_name, group = get_particle_group(mask.metadata, particle_type)
+            if data_spec.mask_array_json is None:
+                selections[group] = merge_ranges(getattr(mask, particle_name))
+            else:
+                selections[group] = merge_ranges(
+                    SWIFTProcessor.load_ndarray_from_json(
+                        data_spec.mask_array_json,
+                        data_spec.mask_data_type,
+                    ),
+                )
+
+        extract_snapshot(
+            str(file_path),
+            output_file,
+            selections,
+            data_spec.fields,
+            settings.stream_block_size_bytes,
+            progress,
+        )
+    except SWIFTProcessorError as error:
+        output_file.unlink(missing_ok=True)
+        raise SWIFTDataSpecException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(error),
+        ) from error
+    except BaseException:
+        output_file.unlink(missing_ok=True)
+        raise
+
+    return output_file
+
+
+@router.post("/unmasked_dataset", response_model=None)
+async def get_unmasked_array_data(
+    data_spec: SWIFTUnmaskedDataSpec,
+    request: Request,
+    settings: Settings = Depends(get_settings),
+    _: str = Depends(get_authenticated_user),
+) -> Response:
+    """Retrieve an unmasked array from a dataset.
+
+    Returns the array generated from the HDF5 file
+    using the data specification provided. Streamed requests
+    are read in chunk-aligned blocks and always sent in NPY format.
+
+    A slice of rows can be requested with start and stop. The X-Total-Rows
+    header gives the length of the field, and while rows remain, X-Next-Cursor
+    holds a cursor requesting the next page of the same size.
+
+    Args:
+        data_spec (SWIFTUnmaskedDataSpec):
+            Dataset information required in POST request
+        request (Request): Incoming request, used for content negotiation
+        settings (Settings): Settings object defining the streaming block size and compression
+
+    Returns
+    -------
+        Response:
+            Numpy ndarray formatted as JSON. The resulting dictionary
+            contains the array and the original data type. Binary
+            requests receive the array in NPY format.
+    """
+    executor = get_data_executor()
+
+    if data_spec.stream:
+        data_type, shape, blocks, headers = await executor.run(
+            read_unmasked_array_stream,
+            data_spec,
+            settings.stream_block_size_bytes,
+        )
+        header_bytes = len(SWIFTProcessor.generate_npy_header(data_type, shape))
+        chunks, encoding_headers = encode_chunks(
+            SWIFTProcessor.generate_npy_stream(data_type, shape, blocks),
+            request,
+            settings,
+            (data_type, header_bytes),
+        )
+        return StreamingResponse(
+            executor.iterate(iter(chunks)),
+            media_type=NPY_MEDIA_TYPE,
+            headers={**headers, **encoding_headers},
+        )
+
+    array_format = get_array_format(data_spec.format, request.headers.get("accept"))
+    response = await executor.run(read_unmasked_array, data_spec, array_format)
+    return encode_response(response, request, settings, executor)
+
+
+def read_unmasked_array(data_spec: SWIFTUnmaskedDataSpec, array_format: ArrayFormat) -> Response:
+    """Read an unmasked array and serialise it. Runs on the data executor.
+
+    Args:
+        data_spec (SWIFTUnmaskedDataSpec):
+            Dataset information required in POST request
+        array_format (ArrayFormat): Output format
+
+    Raises
+    ------
+        SWIFTDataSpecException:
+            Exceptions raised for incorrectly formatted requests
+
+    Returns
+    -------
+        Response: Unmasked array in the requested format
+    """
+    processor = SWIFTProcessor(dataset_map)
+
+    file_path = str(get_file_path(data_spec, processor).resolve())
+
+    start, stop, headers = get_row_range(file_path, data_spec)
+    output_dtype, dtype_headers = get_output_dtype(
+        file_path,
+        data_spec.field,
+        data_spec.output_dtype,
+        allow_unsafe_cast=data_spec.allow_unsafe_cast,
+    )
+
+    selection = ("rows", start, stop)
+    if data_spec.sample_fraction is not None:
+        selection = (*selection, data_spec.sample_fraction, data_spec.seed)
+    if output_dtype is not None:
+        selection = (*selection, output_dtype.str)
+
+    response = create_cached_array_response(
+        create_result_key(file_path, data_spec.field, data_spec.columns, selection, array_format),
+        array_format,
+        lambda: read_unmasked_rows(file_path, data_spec, start, stop, output_dtype),
+        data_spec.field,
+        get_arrow_metadata(file_path, data_spec.field, array_format),
+    )
+    response.headers.update({**headers, **dtype_headers})
+    return response
+
+
+def read_unmasked_rows(
+    file_path: str,
+    data_spec: SWIFTUnmaskedDataSpec,
+    start: int,
+    stop: int,
+    output_dtype: np.dtype | None = None,
+) -> npt.NDArray:
+    """Read a range of rows of a field, or a sample of them.
+
+    Args:
+        file_path (str): Path to the HDF5 file
+        data_spec (SWIFTUnmaskedDataSpec): Dataset information required in POST request
+        start (int): First row to read
+        stop (int): Row after the last row to read
+        output_dtype (np.dtype | None, optional):
+            Data type to convert the rows to while reading. Defaults to None.
+
+    Raises
+    ------
+        SWIFTDataSpecException: HTTP 400 exception if the field is not found.
+
+    Returns
+    -------
+        npt.NDArray: Requested rows of the field
+    """
+    if data_spec.sample_fraction is not None:
+        return read_sampled_array(file_path, data_spec, np.array([[start, stop]]), output_dtype)
+
+    unmasked_array = get_array_reader().get_array_unmasked(
+        file_path,
+        data_spec.field,
+        data_spec.columns,
+        start,
+        stop,
+        output_dtype,
+    )
+
+    if unmasked_array is None:
+        raise SWIFTDataSpecException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Field {data_spec.field} not found in the requested file {file_path}.",
+        )
+    return unmasked_array
+
+
+def read_sampled_array(
+    file_path: str,
+    data_spec: SWIFTMaskedDataSpec | SWIFTUnmaskedDataSpec,
+    ranges: npt.NDArray,
+    output_dtype: np.dtype | None = None,
+) -> npt.NDArray:
+    """Read a deterministic random sample of the rows in a set of row ranges.
+
+    Only the sampled rows are read. The sample depends on the row indices,
+    sample fraction and seed, so every field of a particle type keeps the
+    same rows.
+
+    Args:
+        file_path (str): Path to the HDF5 file
+        data_spec (SWIFTMaskedDataSpec | SWIFTUnmaskedDataSpec):
+            Dataset information, including the sample fraction and seed
+        ranges (npt.NDArray): Array of [start, stop) row ranges to sample
+        output_dtype (np.dtype | None, optional):
+            Data type to convert the rows to while reading. Defaults to None.
+
+    Returns
+    -------
+        npt.NDArray: Sampled rows of the field
+    """
+    sampled_ranges, sample_size = sample_ranges(
+        ranges,
+        data_spec.sample_fraction,
+        data_spec.seed,
+    )
+    return SWIFTProcessor.get_array_masked_from_ranges(
+        file_path,
+        data_spec.field,
+        sampled_ranges,
+        sample_size,
+        data_spec.columns,
+        output_dtype,
+    )
+
+
+def read_unmasked_array_stream(
+    data_spec: SWIFTUnmaskedDataSpec,
+    block_size_bytes: int,
+) -> tuple[np.dtype, tuple[int, ...], Iterator[npt.NDArray], dict[str, str]]:
+    """Validate a streamed request and prepare to read its blocks. Runs on the data executor.
+
+    Args:
+        data_spec (SWIFTUnmaskedDataSpec):
+            Dataset information required in POST request
+        block_size_bytes (int): Target size of each block read from the file
+
+    Raises
+    ------
+        SWIFTDataSpecException:
+            Exceptions raised for incorrectly formatted requests
+
+    Returns
+    -------
+        tuple[np.dtype, tuple[int, ...], Iterator[npt.NDArray], dict[str, str]]:
+            Data type and shape of the requested rows, an iterator over
+            their blocks and the pagination headers
+    """
+    if data_spec.sample_fraction is not None:
+        raise SWIFTDataSpecException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Sampled reads cannot be streamed.",
+        )
+
+    processor = SWIFTProcessor(dataset_map)
+
+    file_path = str(get_file_path(data_spec, processor).resolve())
+
+    start, stop, headers = get_row_range(file_path, data_spec)
+    output_dtype, dtype_headers = get_output_dtype(
+        file_path,
+        data_spec.field,
+        data_spec.output_dtype,
+        allow_unsafe_cast=data_spec.allow_unsafe_cast,
+    )
+
+    data_type, shape, blocks = SWIFTProcessor.get_array_unmasked_stream(
+        file_path,
+        data_spec.field,
+        data_spec.columns,
+        block_size_bytes,
+        start,
+        stop,
+        output_dtype,
+    )
+    return data_type, shape, blocks, {**headers, **dtype_headers}
+
+
+def get_output_dtype(
+    file_path: str,
+    field: str,
+    output_dtype: str | None,
+    *,
+    allow_unsafe_cast: bool,
+) -> tuple[np.dtype | None, dict[str, str]]:
+    """Resolve the data type requested for the array of a field.
+
+    Args:
+        file_path (str): Path to the HDF5 file
+        field (str): Field path
+        output_dtype (str | None): Requested data type, or None to keep the stored type
+        allow_unsafe_cast (bool): Allow conversions that may change values
+
+    Raises
+    ------
+        SWIFTDataSpecException:
+            HTTP 400 exception for missing fields, invalid types and disallowed casts
+
+    Returns
+    -------
+        tuple[np.dtype | None, dict[str, str]]:
+            Data type to convert to, or None, and a header recording the stored data type
+    """
+    if output_dtype is None:
+        return None, {}
+
+    try:
+        source_dtype = SWIFTProcessor.get_field_dtype(file_path, field)
+        target_dtype = SWIFTProcessor.resolve_output_dtype(
+            source_dtype,
+            output_dtype,
+            allow_unsafe_cast=allow_unsafe_cast,
+        )
+    except SWIFTProcessorError as error:
+        raise SWIFTDataSpecException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(error),
+        ) from error
+    return target_dtype, {ORIGINAL_DTYPE_HEADER: source_dtype.str}
+
+
+def get_row_range(
+    file_path: str,
+    data_spec: SWIFTUnmaskedDataSpec,
+) -> tuple[int, int, dict[str, str]]:
+    """Resolve the rows requested by start and stop or by a cursor.
+
+    Args:
+        file_path (str): Path to the HDF5 file
+        data_spec (SWIFTUnmaskedDataSpec): Dataset information required in POST request
+
+    Raises
+    ------
+        SWIFTDataSpecException:
+            HTTP 400 exception for missing fields and invalid or mixed row selections
+
+    Returns
+    -------
+        tuple[int, int, dict[str, str]]:
+            First row, row after the last row and the pagination headers
+    """
+    try:
+        total_rows = SWIFTProcessor.get_row_count(file_path, data_spec.field)
+    except SWIFTProcessorError as error:
+        raise SWIFTDataSpecException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Field {data_spec.field} not found in the requested file {file_path}.",
+        ) from error
+
+    headers = {"X-Total-Rows": str(total_rows)}
+    paginated = data_spec.start is not None or data_spec.stop is not None
+
+    if data_spec.cursor is not None:
+        if paginated:
+            raise SWIFTDataSpecException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Provide either a cursor or start and stop, not both.",
+            )
+        start, page_rows = decode_cursor(data_spec.cursor, data_spec.field)
+        requested_start, requested_stop = start, start + page_rows
+        paginated = True
+    else:
+        requested_start, requested_stop = data_spec.start, data_spec.stop
+
+    start, stop, _ = slice(requested_start, requested_stop).indices(total_rows)
+    stop = max(start, stop)
+
+    if paginated and start < stop < total_rows:
+        headers["X-Next-Cursor"] = encode_cursor(data_spec.field, stop, stop - start)
+
+    return start, stop, headers
+
+
+def encode_cursor(field: str, start: int, page_rows: int) -> str:
+    """Create an opaque cursor pointing at the next page of a field.
+
+    Args:
+        field (str): Field being paged through
+        start (int): First row of the next page
+        page_rows (int): Number of rows in each page
+
+    Returns
+    -------
+        str: URL-safe cursor
+    """
+    cursor = json.dumps({"field": field, "start": start, "rows": page_rows})
+    return base64.urlsafe_b64encode(cursor.encode()).decode()
+
+
+def decode_cursor(cursor: str, field: str) -> tuple[int, int]:
+    """Read the next page position from a cursor.
+
+    Args:
+        cursor (str): Cursor returned in a previous X-Next-Cursor header
+        field (str): Field being requested
+
+    Raises
+    ------
+        SWIFTDataSpecException:
+            HTTP 400 exception for malformed cursors or cursors for another field.
+
+    Returns
+    -------
+        tuple[int, int]: First row and number of rows of the page
+    """
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        cursor_field, start, page_rows = position["field"], position["start"], position["rows"]
+    except (binascii.Error, ValueError, TypeError, KeyError) as error:
+        raise SWIFTDataSpecException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor.",
+        ) from error
+
+    valid_position = isinstance(start, int) and isinstance(page_rows, int) and start >= 0
+    if cursor_field != field or not valid_position or page_rows <= 0:
+        raise SWIFTDataSpecException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor for the requested field.",
+        )
+    return start, page_rows
+
+
+@router.post("/metadata_remoteunits")
+async def retrieve_metadata_with_remote_units(
+    data_spec: SWIFTBaseDataSpec,
+    request: Request,
+    settings: Settings = Depends(get_settings),
+    _: str = Depends(get_authenticated_user),
+) -> Response:
+    """Retrieve metadata from a file path.
+
+    Args:
+        data_spec (SWIFTBaseDataSpec): Base dataspec specifying file path or alias.
+        request (Request): Incoming request, used for content negotiation
+        settings (Settings): Settings object defining compression levels
+
+    Returns
+    -------
+        dict: Metadata for specified file
+    """
+    executor = get_metadata_executor()
+    file_path = await executor.run(get_file_path, data_spec, SWIFTProcessor(dataset_map))
+
+    serialised_metadata = await executor.run(create_swift_metadata, file_path)
+
+    response = Response(content=serialised_metadata, media_type="application/octet-stream")
+    return encode_response(response, request, settings, executor)
+
+
+@router.post("/metadata")
+async def retrieve_metadata(
+    data_spec: SWIFTBaseDataSpec,
+    request: Request,
+    settings: Settings = Depends(get_settings),
+    _: str = Depends(get_authenticated_user),
+) -> Response:
+    """Retrieve metadata from a file path.
+
+    Args:
+        data_spec (SWIFTBaseDataSpec): Base dataspec specifying file path or alias.
+        request (Request): Incoming request, used for content negotiation
+        settings (Settings): Settings object defining compression levels
+
+    Returns
+    -------
+        dict: Metadata for specified file
+    """
+    executor = get_metadata_executor()
+    file_path = await executor.run(get_file_path, data_spec, SWIFTProcessor(dataset_map))
+
+    serialised_metadata = await executor.run(create_swift_metadata, file_path)
+
+    response = Response(content=serialised_metadata, media_type="application/octet-stream")
+    return encode_response(response, request, settings, executor)
+
+
+@router.post("/units_dict")
+async def retrieve_units_dict(
+    data_spec: SWIFTBaseDataSpec,
+    _: str = Depends(get_authenticated_user),
+) -> dict:
+    """Retrieve units for the specified file.
+
+    Args:
+        data_spec (SWIFTBaseDataSpec): Base dataspec specifying file path or alias.
+
+    Returns
+    -------
+        dict: Unit data for specified file
+    """
+    executor = get_metadata_executor()
+    file_path = await executor.run(get_file_path, data_spec, SWIFTProcessor(dataset_map))
+
+    return await executor.run(retrieve_units_json_compatible, str(file_path.resolve()))
+
+
+@router.post("/units")
+async def retrieve_units(
+    data_spec: SWIFTBaseDataSpec,
+    request: Request,
+    settings: Settings = Depends(get_settings),
+    _: str = Depends(get_authenticated_user),
+) -> dict:
+    """Retrieve units for the specified file.
+
+    Args:
+        data_spec (SWIFTBaseDataSpec): Base dataspec specifying file path or alias.
+        request (Request): Incoming request, used for content negotiation
+        settings (Settings): Settings object defining compression levels
+
+    Returns
+    -------
+        dict: Unit data for specified file
+    """
+    executor = get_metadata_executor()
+    file_path = await executor.run(get_file_path, data_spec, SWIFTProcessor(dataset_map))
+
+    serialised_units = await executor.run(create_swift_units, file_path.resolve())
+
+    response = Response(content=serialised_units, media_type="application/octet-stream")
+    return encode_response(response, request, settings, executor)
+
+
+@router.get("/stats")
+def retrieve_server_stats(
+    _: str = Depends(get_authenticated_user),
+) -> dict:
+    """Report executor load and file pool and cache usage.
+
+    Returns
+    -------
+        dict:
+            Queued and active tasks for the data and metadata executors,
+            open file pool counts and metadata, units and result cache counts.
+    """
+    return {
+        "data_executor": get_data_executor().stats(),
+        "metadata_executor": get_metadata_executor().stats(),
+        "file_pool": get_file_pool().stats(),
+        "metadata_cache": get_metadata_cache().stats(),
+        "units_cache": get_units_cache().stats(),
+        "result_cache": get_result_cache().stats(),
+    }
@@ -0,0 +1,368 @@
+"""Defines routes that run long reads as background jobs."""
+import shutil
+from collections.abc import Callable, Iterator
+from typing import Annotated, Literal
+
+import numpy as np
+import numpy.typing as npt
+from fastapi import APIRouter, Body, Depends, Request, Response, status
+from fastapi.responses import FileResponse
+
+from api.config import Settings, get_settings
+from api.processing.data_processing import SWIFTProcessor
+from api.processing.jobs import Job, JobContext, JobError, JobResult, get_job_manager
+from api.processing.process_pool import borrowing_shared_arrays
+from api.routers.auth import get_authenticated_user
+from api.routers.file_processing import (
+    HDF5_MEDIA_TYPE,
+    NPY_MEDIA_TYPE,
+    SWIFTDataSpecException,
+    SWIFTExtractDataSpec,
+    SWIFTMaskedBatchDataSpec,
+    SWIFTMaskedDataSpec,
+    SWIFTUnmaskedDataSpec,
+    get_array_format,
+    get_batch_format,
+    get_output_dtype,
+    load_masked_selection,
+    read_masked_array,
+    read_masked_batch,
+    read_masked_rows,
+    read_unmasked_array,
+    read_unmasked_array_stream,
+    write_extract,
+)
+
+router = APIRouter(
+    prefix="/swiftdata",
+)
+
+UNSENT_HEADERS = ("content-length", "content-type")
+
+
+class SWIFTMaskedJobSpec(SWIFTMaskedDataSpec):
+    """Data required to run a masked read as a job.
+
+    Args:
+        SWIFTMaskedDataSpec (_type_): Masked data specification
+    """
+
+    kind: Literal["masked_dataset"]
+
+
+class SWIFTUnmaskedJobSpec(SWIFTUnmaskedDataSpec):
+    """Data required to run an unmasked read as a job.
+
+    Args:
+        SWIFTUnmaskedDataSpec (_type_): Unmasked data specification
+    """
+
+    kind: Literal["unmasked_dataset"]
+
+
+class SWIFTMaskedBatchJobSpec(SWIFTMaskedBatchDataSpec):
+    """Data required to run a masked read of several fields as a job.
+
+    Args:
+        SWIFTMaskedBatchDataSpec (_type_): Masked batch data specification
+    """
+
+    kind: Literal["masked_batch"]
+
+
+class SWIFTExtractJobSpec(SWIFTExtractDataSpec):
+    """Data required to run a snapshot extract as a job.
+
+    Args:
+        SWIFTExtractDataSpec (_type_): Extract data specification
+    """
+
+    kind: Literal["extract"]
+
+
+SWIFTJobDataSpec = (
+    SWIFTMaskedJobSpec | SWIFTUnmaskedJobSpec | SWIFTMaskedBatchJobSpec | SWIFTExtractJobSpec
+)
+
+
+def run_response_job(context: JobContext, read_response: Callable[[], Response]) -> JobResult:
+    """Run a read returning a response, and spool the response body.
+
+    Used for reads that cannot be written block by block, such as JSON,
+    Arrow and NPZ responses.
+
+    Args:
+        context (JobContext): Running job
+        read_response (Callable[[], Response]): Function performing the read
+
+    Returns
+    -------
+        JobResult: Media type and headers of the response
+    """
+    response = read_response()
+    context.write([response.body])
+    headers = {
+        name: value for name, value in response.headers.items() if name not in UNSENT_HEADERS
+    }
+    return JobResult(response.media_type, headers)
+
+
+def run_npy_job(
+    context: JobContext,
+    data_type: np.dtype,
+    shape: tuple[int, ...],
+    blocks: Iterator[npt.NDArray],
+    headers: dict[str, str],
+) -> JobResult:
+    """Write the blocks of an array to the spool in NPY format, one block at a time.
+
+    Args:
+        context (JobContext): Running job
+        data_type (np.dtype): Data type of the array
+        shape (tuple[int, ...]): Shape of the array
+        blocks (Iterator[npt.NDArray]): Consecutive blocks of rows of the array
+        headers (dict[str, str]): Headers sent with the result
+
+    Raises
+    ------
+        JobError: Raised for arrays of Python objects, which have no raw buffer.
+
+    Returns
+    -------
+        JobResult: NPY media type and the headers
+    """
+    if np.dtype(data_type).hasobject:
+        message = "Arrays of Python objects cannot be sent in binary format."
+        raise JobError(message)
+
+    context.write(SWIFTProcessor.generate_npy_stream(data_type, shape, blocks))
+    return JobResult(NPY_MEDIA_TYPE, headers)
+
+
+def run_unmasked_npy_job(
+    context: JobContext,
+    data_spec: SWIFTUnmaskedDataSpec,
+    settings: Settings,
+) -> JobResult:
+    """Read an unmasked array in blocks, spooling each block as it is read.
+
+    Args:
+        context (JobContext): Running job
+        data_spec (SWIFTUnmaskedDataSpec): Unmasked data specification, without sampling
+        settings (Settings): Settings object defining the streaming block size
+
+    Returns
+    -------
+        JobResult: NPY media type, pagination and data type headers
+    """
+    data_type, shape, blocks, headers = read_unmasked_array_stream(
+        data_spec,
+        settings.stream_block_size_bytes,
+    )
+    return run_npy_job(context, data_type, shape, blocks, headers)
+
+
+def run_masked_npy_job(
+    context: JobContext,
+    data_spec: SWIFTMaskedDataSpec,
+    settings: Settings,
+) -> JobResult:
+    """Read a masked array and spool it in NPY format, without building a response body.
+
+    Arrays read by the process pool are written straight from shared memory.
+
+    Args:
+        context (JobContext): Running job
+        data_spec (SWIFTMaskedDataSpec): Masked data specification
+        settings (Settings): Settings object defining the streaming block size
+
+    Returns
+    -------
+        JobResult: NPY media type and data type headers
+    """
+    file_path, mask = load_masked_selection(data_spec)
+    output_dtype, headers = get_output_dtype(
+        file_path,
+        data_spec.field,
+        data_spec.output_dtype,
+        allow_unsafe_cast=data_spec.allow_unsafe_cast,
+    )
+    with borrowing_shared_arrays():
+        array = read_masked_rows(file_path, data_spec, mask, output_dtype)
+        block_rows = max(settings.stream_block_size_bytes // max(array[:1].nbytes, 1), 1)
+        blocks = (array[start : start + block_rows] for start in range(0, len(array), block_rows))
+        result = run_npy_job(context, array.dtype, array.shape, blocks, headers)
+        del array, blocks
+    return result
+
+
+def run_extract_job(
+    context: JobContext,
+    data_spec: SWIFTExtractDataSpec,
+    settings: Settings,
+) -> JobResult:
+    """Write a snapshot extract, and move it into the spool.
+
+    Args:
+        context (JobContext): Running job
+        data_spec (SWIFTExtractDataSpec): Extract data specification
+        settings (Settings): Settings object defining the scratch directory and block size
+
+    Returns
+    -------
+        JobResult: Media type of the extract, and a header naming the file
+    """
+    output_file = write_extract(data_spec, settings, context.report_progress)
+    shutil.move(output_file, context.result_path)
+    return JobResult(
+        HDF5_MEDIA_TYPE,
+        {"content-disposition": f'attachment; filename="{output_file.stem}.hdf5"'},
+    )
+
+
+def create_job_function(
+    data_spec: SWIFTJobDataSpec,
+    accept: str | None,
+    settings: Settings,
+) -> Callable[[JobContext], JobResult]:
+    """Create the function running a job.
+
+    Args:
+        data_spec (SWIFTJobDataSpec): Job data specification
+        accept (str | None): Accept header sent when the job was submitted
+        settings (Settings): Settings object
+
+    Returns
+    -------
+        Callable[[JobContext], JobResult]: Function running the job and spooling its result
+    """
+    if isinstance(data_spec, SWIFTExtractJobSpec):
+        return lambda context: run_extract_job(context, data_spec, settings)
+
+    if isinstance(data_spec, SWIFTMaskedBatchJobSpec):
+        batch_format = get_batch_format(data_spec.format, accept)
+        return lambda context: run_response_job(
+            context,
+            lambda: read_masked_batch(data_spec, batch_format),
+        )
+
+    array_format = get_array_format(data_spec.format, accept)
+    if array_format == "npy":
+        if isinstance(data_spec, SWIFTMaskedJobSpec) and not data_spec.explain:
+            return lambda context: run_masked_npy_job(context, data_spec, settings)
+        if isinstance(data_spec, SWIFTUnmaskedJobSpec) and data_spec.sample_fraction is None:
+            return lambda context: run_unmasked_npy_job(context, data_spec, settings)
+
+    read_array = (
+        read_masked_array if isinstance(data_spec, SWIFTMaskedJobSpec) else read_unmasked_array
+    )
+    return lambda context: run_response_job(
+        context,
+        lambda: read_array(data_spec, array_format),
+    )
+
+
+def get_owned_job(job_id: str, user: str) -> Job:
+    """Retrieve a job submitted by the current user.
+
+    Args:
+        job_id (str): Job id
+        user (str): Authenticated user
+
+    Raises
+    ------
+        SWIFTDataSpecException: HTTP 404 exception if the job does not exist.
+
+    Returns
+    -------
+        Job: The job
+    """
+    job = get_job_manager().get(job_id, user)
+    if job is None:
+        raise SWIFTDataSpecException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Job {job_id} not found.",
+        )
+    return job
+
+
+@router.post("/jobs", status_code=status.HTTP_202_ACCEPTED)
+def create_job(
+    data_spec: Annotated[SWIFTJobDataSpec, Body(discriminator="kind")],
+    request: Request,
+    settings: Settings = Depends(get_settings),
+    user: str = Depends(get_authenticated_user),
+) -> dict:
+    """Submit a masked, unmasked, batch or extract read to run in the background.
+
+    The kind field of the data spec selects the read. The remaining fields
+    are those of the matching endpoint. Output formats are chosen as for
+    that endpoint, including from the Accept header sent with this request.
+
+    Args:
+        data_spec (SWIFTJobDataSpec): Job data specification
+        request (Request): Incoming request, used for content negotiation
+        settings (Settings): Settings object
+
+    Returns
+    -------
+        dict: Id and initial status of the job
+    """
+    job_function = create_job_function(data_spec, request.headers.get("accept"), settings)
+    return get_job_manager().submit(user, data_spec.kind, job_function).describe()
+
+
+@router.get("/jobs/{job_id}")
+def get_job(
+    job_id: str,
+    user: str = Depends(get_authenticated_user),
+) -> dict:
+    """Report the status of a job.
+
+    Args:
+        job_id (str): Job id returned when the job was submitted
+
+    Returns
+    -------
+        dict: Status, progress between 0 and 1, bytes written and any error of the job
+    """
+    return get_owned_job(job_id, user).describe()
+
+
+@router.get("/jobs/{job_id}/result", response_model=None)
+def get_job_result(
+    job_id: str,
+    user: str = Depends(get_authenticated_user),
+) -> FileResponse:
+    """Download the result of a finished job.
+
+    Args:
+        job_id (str): Job id returned when the job was submitted
+
+    Raises
+    ------
+        SWIFTDataSpecException:
+            HTTP 409 exception if the job has not succeeded,
+            or HTTP 410 exception if its result has expired.
+
+    Returns
+    -------
+        FileResponse: Result of the job, as returned by the matching endpoint
+    """
+    job = get_owned_job(job_id, user)
+    if job.status == "expired":
+        raise SWIFTDataSpecException(
+            status_code=status.HTTP_410_GONE,
+            detail=f"The result of job {job_id} has expired.",
+        )
+    if job.status != "succeeded":
+        raise SWIFTDataSpecException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Job {job_id} is {job.status}.",
+        )
+
+    return FileResponse(
+        get_job_manager().get_result_path(job_id),
+        media_type=job.media_type,
+        headers=job.headers,
+    )
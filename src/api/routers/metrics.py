@@ -0,0 +1,133 @@
+"""Defines the Prometheus metrics route and the middleware timing each request."""
+import os
+import time
+
+from fastapi import APIRouter, Response, status
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    generate_latest,
+    multiprocess,
+)
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from api.processing.executors import get_data_executor, get_metadata_executor
+from api.processing.file_pool import get_file_pool
+from api.processing.metadata import get_metadata_cache
+from api.processing.metrics import REQUEST_DURATION, RESPONSE_SIZE
+from api.processing.result_cache import get_result_cache
+from api.processing.units import get_units_cache
+
+router = APIRouter()
+
+MULTIPROCESS_DIRECTORY_VARIABLE = "PROMETHEUS_MULTIPROC_DIR"
+UNMATCHED_ROUTE = "unmatched"
+
+
+def create_resource_metrics() -> None:
+    """Create the file pool, executors and caches if they are not yet in use.
+
+    Each records its own metrics as its state changes, so creating them is
+    enough for their metrics to be reported from the first scrape.
+    """
+    get_file_pool()
+    get_data_executor()
+    get_metadata_executor()
+    get_metadata_cache()
+    get_result_cache()
+    get_units_cache()
+
+
+def generate_metrics() -> bytes:
+    """Render every metric in the Prometheus text format.
+
+    Returns
+    -------
+        bytes: Metrics of this process, or summed over every process in multiprocess mode
+    """
+    create_resource_metrics()
+    if os.environ.get(MULTIPROCESS_DIRECTORY_VARIABLE):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+def get_route_template(scope: Scope) -> str:
+    """Find the path template of the route that handled a request.
+
+    Templates such as "/swiftdata/jobs/{job_id}" keep the number of metric
+    labels bounded, whatever paths clients request.
+
+    Args:
+        scope (Scope): ASGI scope of the request, after routing
+
+    Returns
+    -------
+        str: Path template of the route, or "unmatched" if no route handled the request
+    """
+    route = scope.get("route")
+    return getattr(route, "path", UNMATCHED_ROUTE)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording the latency and response size of each request.
+
+    Latency is measured until the last byte of the response is sent, so
+    streamed responses are timed in full.
+    """
+
+    def __init__(self, app: ASGIApp):
+        """Class constructor.
+
+        Args:
+            app (ASGIApp): Application to wrap
+        """
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Handle a request, recording its metrics once the response is sent.
+
+        Args:
+            scope (Scope): ASGI scope
+            receive (Receive): ASGI receive channel
+            send (Send): ASGI send channel
+        """
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+        response_bytes = 0
+
+        async def send_counted(message: Message) -> None:
+            nonlocal status_code, response_bytes
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_counted)
+        finally:
+            route = get_route_template(scope)
+            REQUEST_DURATION.labels(
+                method=scope["method"],
+                route=route,
+                status=str(status_code),
+            ).observe(time.perf_counter() - start)
+            RESPONSE_SIZE.labels(method=scope["method"], route=route).observe(response_bytes)
+
+
+@router.get("/metrics", include_in_schema=False)
+def get_metrics() -> Response:
+    """Report request, HDF5 read, file, executor and cache metrics for Prometheus.
+
+    Returns
+    -------
+        Response: Metrics in the Prometheus text format
+    """
+    return Response(content=generate_metrics(), media_type=CONTENT_TYPE_LATEST)
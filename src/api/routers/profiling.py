@@ -0,0 +1,105 @@
+"""Defines the middleware profiling requests on demand, without restarting the server.
+
+Sending `X-Profile: 1` with a valid token for a user listed in the
+PROFILE_USERS setting profiles that request. The request is given an id,
+returned in the X-Request-ID header, and the profile is saved as
+`<request id>.prof` in PROFILE_DIRECTORY once the response has been sent.
+The file can be read with `pstats` or viewers such as snakeviz.
+"""
+import uuid
+from pathlib import Path
+
+from loguru import logger
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from api.config import Settings, get_settings
+from api.profiling import RequestProfile, profiling
+from api.routers import auth
+
+PROFILE_HEADER = "X-Profile"
+REQUEST_ID_HEADER = "X-Request-ID"
+BEARER_PREFIX = "bearer "
+
+
+def get_profiling_user(headers: Headers, settings: Settings) -> str | None:
+    """Find the user requesting a profile, if they are allowed to profile requests.
+
+    Args:
+        headers (Headers): Request headers
+        settings (Settings): Settings object defining the profile directory and users
+
+    Returns
+    -------
+        str | None: User requesting the profile, or None if the request should not be profiled
+    """
+    if headers.get(PROFILE_HEADER) != "1":
+        return None
+    if settings.profile_directory is None:
+        logger.warning(f"Ignoring {PROFILE_HEADER}: PROFILE_DIRECTORY is not set")
+        return None
+
+    authorisation = headers.get("authorization", "")
+    if not authorisation.lower().startswith(BEARER_PREFIX):
+        return None
+    try:
+        user = auth.decode_jwt(authorisation[len(BEARER_PREFIX) :], settings)
+    except auth.CredentialsException:
+        return None
+
+    if user not in settings.profile_users:
+        logger.warning(f"Ignoring {PROFILE_HEADER} from {user}, who may not profile requests")
+        return None
+    return user
+
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling requests sent with `X-Profile: 1` by allowed users.
+
+    Other requests, including those from users who may not profile requests,
+    are handled as normal.
+    """
+
+    def __init__(self, app: ASGIApp):
+        """Class constructor.
+
+        Args:
+            app (ASGIApp): Application to wrap
+        """
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Handle a request, profiling it if requested by an allowed user.
+
+        Args:
+            scope (Scope): ASGI scope
+            receive (Receive): ASGI receive channel
+            send (Send): ASGI send channel
+        """
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        settings = get_settings()
+        user = get_profiling_user(Headers(scope=scope), settings)
+        if user is None:
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(uuid.uuid4().hex)
+
+        async def send_with_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)[REQUEST_ID_HEADER] = profile.request_id
+            await send(message)
+
+        try:
+            with profiling(profile):
+                await self.app(scope, receive, send_with_id)
+        finally:
+            profile_file = profile.save(Path(settings.profile_directory))
+            request = f'{scope["method"]} {scope["path"]} for {user}'
+            if profile_file is None:
+                logger.info(f"No executor tasks were run for {request}, no profile saved")
+            else:
+                logger.info(f"Saved profile of {request} to {profile_file}")
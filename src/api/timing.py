@@ -0,0 +1,173 @@
+"""Time the phases of each request and report them to the client and the access log.
+
+Code handling a request marks phases with `timed`, such as "auth", "alias",
+"open", "read", "metadata" and "encode". Time spent in each phase is summed
+using the monotonic `time.perf_counter` clock. The timings belong to the
+request's context, and `BoundedExecutor.run` copies the context to its
+worker threads, so phases run on the I/O executors are counted too. Outside
+a request, for example in job workers, `timed` does nothing.
+
+Phases are timed independently and can be nested, so they overlap rather
+than partition the request. Files are opened inside "read", "metadata" and
+"encode", so "open" time is also counted in those phases, and the phases
+can add up to more than the request took. Phases run concurrently on
+several threads are each counted in full.
+
+Phases finished before the response headers are sent are reported in the
+Server-Timing header, with "app" covering everything up to that point. The
+access log line for the request also reports phases finished while the body
+was sent, such as streamed reads, and "send", the time taken to send the body.
+"""
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from fastapi import status
+from loguru import logger
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+SERVER_TIMING_HEADER = "Server-Timing"
+MILLISECONDS_PER_SECOND = 1000
+
+
+class RequestTimings:
+    """Total time spent in each phase of a request, in seconds."""
+
+    def __init__(self):
+        """Class constructor."""
+        self.durations: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float) -> None:
+        """Add time spent in a phase.
+
+        Args:
+            name (str): Name of the phase
+            seconds (float): Time spent in the phase
+        """
+        with self._lock:
+            self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+    def to_milliseconds(self) -> dict[str, float]:
+        """Report the time spent in each phase.
+
+        Returns
+        -------
+            dict[str, float]: Milliseconds spent in each phase, rounded to microseconds
+        """
+        with self._lock:
+            return {
+                name: round(seconds * MILLISECONDS_PER_SECOND, 3)
+                for name, seconds in self.durations.items()
+            }
+
+    def to_header(self) -> str:
+        """Format the timings as a Server-Timing header value.
+
+        Returns
+        -------
+            str: Comma separated metrics, e.g. "read;dur=12.5, encode;dur=3.1"
+        """
+        return ", ".join(
+            f"{name};dur={milliseconds}" for name, milliseconds in self.to_milliseconds().items()
+        )
+
+
+_request_timings: ContextVar[RequestTimings | None] = ContextVar(
+    "request_timings",
+    default=None,
+)
+
+
+@contextmanager
+def timed(name: str) -> Iterator[None]:
+    """Add the time spent in a block, or decorated function, to the current request's timings.
+
+    Args:
+        name (str): Name of the phase
+
+    Yields
+    ------
+        None: Control is returned to the timed block
+    """
+    timings = _request_timings.get()
+    if timings is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - start)
+
+
+class ServerTimingMiddleware:
+    """ASGI middleware collecting the phase timings of each request.
+
+    Adds the Server-Timing header to each response and writes an access log
+    line once the response has been sent. The log line carries the method,
+    path, status, response size and timings as extra fields, for structured
+    log sinks.
+    """
+
+    def __init__(self, app: ASGIApp):
+        """Class constructor.
+
+        Args:
+            app (ASGIApp): Application to wrap
+        """
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Handle a request, timing it until the response has been sent.
+
+        Args:
+            scope (Scope): ASGI scope
+            receive (Receive): ASGI receive channel
+            send (Send): ASGI send channel
+        """
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _request_timings.set(timings)
+        start = time.perf_counter()
+        headers_sent = start
+        status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+        response_bytes = 0
+
+        async def send_timed(message: Message) -> None:
+            nonlocal headers_sent, status_code, response_bytes
+            if message["type"] == "http.response.start":
+                headers_sent = time.perf_counter()
+                status_code = message["status"]
+                timings.add("app", headers_sent - start)
+                MutableHeaders(scope=message).append(SERVER_TIMING_HEADER, timings.to_header())
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_timed)
+        finally:
+            _request_timings.reset(token)
+            end = time.perf_counter()
+            if headers_sent > start:
+                timings.add("send", end - headers_sent)
+            total = round((end - start) * MILLISECONDS_PER_SECOND, 3)
+            logger.bind(
+                method=scope["method"],
+                path=scope["path"],
+                status=status_code,
+                response_bytes=response_bytes,
+                total_ms=total,
+                timings_ms=timings.to_milliseconds(),
+            ).info(
+                f'{scope["method"]} {scope["path"]} {status_code} {response_bytes}B '
+                f"{total}ms {timings.to_header()}",
+            )
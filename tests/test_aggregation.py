@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+from api.processing.aggregation import FieldAggregator, aggregate_field, split_ranges
+from api.processing.data_processing import SWIFTProcessor, SWIFTProcessorError
+
+
+def test_split_ranges():
+    mask = np.array([[0, 10], [20, 23], [23, 23], [30, 31], [40, 45]])
+    block_rows = 4
+
+    blocks = split_ranges(mask, block_rows)
+
+    selected_rows = np.concatenate([np.arange(start, stop) for start, stop in mask])
+    block_rows_read = np.concatenate(
+        [np.arange(start, stop) for block in blocks for start, stop in block],
+    )
+    np.testing.assert_array_equal(block_rows_read, selected_rows)
+    assert all(np.sum(block[:, 1] - block[:, 0]) < 2 * block_rows for block in blocks)
+
+
+def test_field_aggregator_matches_numpy():
+    array = np.arange(30, dtype=np.int32).reshape(10, 3)
+    aggregator = FieldAggregator()
+
+    for block in np.array_split(array, 4):
+        aggregator.update(block)
+
+    results = aggregator.results(["sum", "min", "max", "mean", "count"])
+    assert results["sum"] == array.sum(axis=0).tolist()
+    assert results["min"] == array.min(axis=0).tolist()
+    assert results["max"] == array.max(axis=0).tolist()
+    assert results["mean"] == array.mean(axis=0).tolist()
+    assert results["count"] == len(array)
+
+
+def test_field_aggregator_empty_selection():
+    results = FieldAggregator().results(["sum", "mean", "count"])
+
+    assert results == {"sum": 0, "mean": None, "count": 0}
+
+
+def test_aggregate_field_unmasked(template_swift_data_path):
+    masses = SWIFTProcessor.get_array_unmasked(str(template_swift_data_path), "PartType0/Masses")
+
+    aggregate = aggregate_field(
+        str(template_swift_data_path),
+        "PartType0/Masses",
+        ["sum", "mean", "count"],
+        block_size_bytes=4096,
+    )
+
+    assert aggregate["results"]["count"] == len(masses)
+    assert aggregate["results"]["sum"] == pytest.approx(np.sum(masses, dtype=np.float64))
+    assert aggregate["results"]["mean"] == pytest.approx(np.mean(masses, dtype=np.float64))
+    assert aggregate["units"] == "10000000000.0 Msun"
+
+
+def test_aggregate_field_invalid_field(template_swift_data_path):
+    with pytest.raises(SWIFTProcessorError):
+        aggregate_field(str(template_swift_data_path), "PartType0/NotAField", ["count"])
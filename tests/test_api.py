@@ -1,19 +1,34 @@
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import cloudpickle
+import h5py
+import numpy as np
 import pytest
 import swiftsimio as sw
+import zstandard
+from api.config import get_settings
 from api.main import app
+from api.processing.caching import ByteLRUCache
+from api.processing.compression import unshuffle_bytes
 from api.processing.data_processing import SWIFTProcessor
+from api.processing.jobs import JobManager
 from api.routers.file_processing import (
     SWIFTBaseDataSpec,
     SWIFTDataSpecException,
+    create_cached_array_response,
+    encode_cursor,
+    get_array_format,
+    get_batch_format,
     get_file_path,
 )
 from fastapi import status
 from fastapi.testclient import TestClient
 from swiftsimio.reader import SWIFTMetadata
-from unyt import unyt_array
+from unyt import unyt_array, unyt_quantity
 
 client = TestClient(app)
 
@@ -313,6 +328,29 @@ def test_get_masked_array_data_fails_with_invalid_field_name(
     assert f"{field} not found" in response.json()["detail"]
 
 
+def test_get_masked_array_data_fails_with_range_past_end(
+    template_swift_data_path,
+    mock_auth_client_success_jwt_decode,
+):
+    with h5py.File(template_swift_data_path, "r") as handle:
+        total_rows = handle["PartType0/Coordinates"].shape[0]
+    payload = {
+        "data_spec": {
+            "filename": str(template_swift_data_path),
+            "field": "PartType0/Coordinates",
+            "mask_array_json": f"[[{total_rows - 2}, {total_rows + 5}]]",
+            "mask_size": 7,
+        },
+    }
+
+    response = mock_auth_client_success_jwt_decode.post(
+        "/swiftdata/masked_dataset",
+        json=payload,
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "is not within" in response.json()["detail"]
+
+
 def test_get_masked_array_data_spatial_success(
     template_swift_data_path,
     mock_auth_client_success_jwt_decode,
@@ -335,6 +373,254 @@ def test_get_masked_array_data_spatial_success(
     assert len(response.json()["array"]) == payload["data_spec"]["mask_size"]
 
 
+def test_get_masked_array_data_npy_format(
+    template_swift_data_path,
+    mock_auth_client_success_jwt_decode,
+):
+    payload = {
+        "data_spec": {
+            "filename": str(template_swift_data_path),
+            "field": "PartType0/Coordinates",
+            "mask_array_json": "[[0, 334]]",
+            "mask_size": 334,
+            "format": "npy",
+        },
+    }
+
+    response = mock_auth_client_success_jwt_decode.post(
+        "/swiftdata/masked_dataset",
+        json=payload,
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/x-npy"
+
+    array = np.load(io.BytesIO(response.content))
+    assert array.shape == (payload["data_spec"]["mask_size"], 3)
+
+
+def test_get_masked_array_data_from_upload(
+    template_swift_data_path,
+    mock_auth_client_success_jwt_decode,
+):
+    test_mask = np.asarray([[0, 100], [200, 334]], dtype="int32")
+    form_data = {
+        "filename": str(template_swift_data_path),
+        "field": "PartType0/Coordinates",
+        "mask_size": "234",
+        "mask_data_type": "int32",
+        "columns": "0",
+        "format": "npy",
+    }
+
+    response = mock_auth_client_success_jwt_decode.post(
+        "/swiftdata/masked_dataset_upload",
+        data=form_data,
+        files={"mask": ("mask.bin", test_mask.tobytes(), "application/octet-stream")},
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    array = np.load(io.BytesIO(response.content))
+    expected_array = SWIFTProcessor.get_array_unmasked(
+        template_swift_data_path,
+        form_data["field"],
+        0,
+    )
+    assert np.array_equal(array, np.concatenate([expected_array[0:100], expected_array[200:334]]))
+
+
+def test_get_masked_array_data_from_upload_fails_with_bad_mask(
+    template_swift_data_path,
+    mock_auth_client_success_jwt_decode,
+):
+    form_data = {
+        "filename": str(template_swift_data_path),
+        "field": "PartType0/Coordinates",
+        "mask_size": "334",
+    }
+
+    response = mock_auth_client_success_jwt_decode.post(
+        "/swiftdata/masked_dataset_upload",
+        data=form_data,
+        files={"mask": ("mask.bin", b"\x00" * 12, "application/octet-stream")},
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "start/stop pairs" in response.json()["detail"]
+
+
+def test_get_masked_batch_array_data(
+    template_swift_data_path,
+    mock_auth_client_success_jwt_decode,
+):
+    payload = {
+        "data_spec": {
+            "filename": str(template_swift_data_path),
+            "fields": ["PartType0/Coordinates", "PartType0/Masses", "PartType0/Densities"],
+            "columns": [0, None, None],
+            "mask_array_json": "[[0, 100], [200, 334]]",
+            "mask_size": 234,
+        },
+    }
+
+    response = mock_auth_client_success_jwt_decode.post(
+        "/swiftdata/masked_batch",
+        json=payload,
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    arrays = np.load(io.BytesIO(response.content))
+    assert arrays.files == payload["data_spec"]["fields"]
+    for field in payload["data_spec"]["fields"]:
+        assert arrays[field].shape == (payload["data_spec"]["mask_size"],)
+
+    expected_masses = SWIFTProcessor.get_array_masked(
+        str(template_swift_data_path),
+        "PartType0/Masses",
+        payload["data_spec"]["mask_array_json"],
+        None,
+        payload["data_spec"]["mask_size"],
+    )
+    assert np.array_equal(arrays["PartType0/Masses"], expected_masses)
+
+
+def test_get_masked_batch_array_data_fails_with_invalid_field_name(
+    template_swift_data_path,
+    mock_auth_client_success_jwt_decode,
+):
+    payload = {
+        "data_spec": {
+            "filename": str(template_swift_data_path),
+            "fields": ["PartType0/Masses", "a_made_up/field"],
+            "mask_array_json": "[[0, 334]]",
+            "mask_size": 334,
+        },
+    }
+
+    response = mock_auth_client_success_jwt_decode.post(
+        "/swiftdata/masked_batch",
+        json=payload,
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "a_made_up/field not found" in response.json()["detail"]
+
+
+def test_get_masked_batch_array_data_fails_with_mismatched_columns(
+    template_swift_data_path,
+    mock_auth_client_success_jwt_decode,
+):
+    payload = {
+        "data_spec": {
+            "filename": str(template_swift_data_path),
+            "fields": ["PartType0/Coordinates", "PartType0/Masses"],
+            "columns": [0],
+            "mask_array_json": "[[0, 334]]",
+            "mask_size": 334,
+        },
+    }
+
+    response = mock_auth_client_success_jwt_decode.post(
+        "/swiftdata/masked_batch",
+        json=payload,
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_get_unmasked_array_data_npy_accept_header(
+    template_swift_data_path,
+    mock_auth_client_success_jwt_decode,
+):
+    payload = {
+        "data_spec": {
+            "filename": str(template_swift_data_path),
+            "field": "PartType0/Coordinates",
+            "columns": 0,
+        },
+    }
+    expected_array_length = 32382
+    response = mock_auth_client_success_jwt_decode.post(
+        "/swiftdata/unmasked_dataset",
+        json=payload,
+        headers={"Accept": "application/x-npy"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    array = np.load(io.BytesIO(response.content))
+    assert array.shape == (expected_array_length,)
+
+
+@pytest.mark.parametrize(
+    ("accept", "expected_format"),
+    [
+        (None, "json"),
+        ("*/*", "json"),
+        ("application/x-npy", "npy"),
+        ("application/octet-stream", "npy"),
+        ("application/x-npy;q=0", "json"),
+        ("application/x-npy;q=0, */*", "json"),
+        ("application/json, application/x-npy;q=0.5", "json"),
+        ("application/json, application/x-npy", "npy"),
+        ("application/x-npy, application/vnd.apache.arrow.stream;q=0.9", "npy"),
+        ("application/vnd.apache.arrow.stream", "arrow"),
+    ],
+)
+def test_get_array_format(accept, expected_format):
+    assert get_array_format(None, accept) == expected_format
+    assert get_array_format("json", accept) == "json"
+
+
+@pytest.mark.parametrize(
+    ("accept", "expected_format"),
+    [
+        (None, "npz"),
+        ("*/*", "npz"),
+        ("application/vnd.apache.arrow.stream", "arrow"),
+        ("application/vnd.apache.arrow.stream;q=0", "npz"),
+        ("application/x-npz, application/vnd.apache.arrow.stream;q=0.5", "npz"),
+    ],
+)
+def test_get_batch_format(accept, expected_format):
+    assert get_batch_format(None, accept) == expected_format
+
+
+def test_get_unmasked_array_data_stream(
+    template_swift_data_path,
+    mock_auth_client_success_jwt_decode,
+):
+    payload = {
+        "data_spec": {
+            "filename": str(template_swift_data_path),
+            "field": "PartType0/Coordinates",
+            "stream": True,
+        },
+    }
+    expected_shape = (32382, 3)
+    response = mock_auth_client_success_jwt_decode.post(
+        "/swiftdata/unmasked_dataset",
+        json=payload,
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/x-npy"
+
+    array = np.load(io.BytesIO(response.content))
+    assert array.shape == expected_shape
+
+
+def test_get_unmasked_array_data_fails_with_invalid_field_name(
+    template_swift_data_path,
+    mock_auth_client_success_jwt_decode,
+):
+    payload = {
+        "data_spec": {
+            "filename": str(template_swift_data_path),
+            "field": "PartType0/NotARealField",
+        },
+    }
+    response = mock_auth_client_success_jwt_decode.post(
+        "/swiftdata/unmasked_dataset",
+        json=payload,
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
 def test_get_unmasked_array_data_success_no_columns(
     template_swift_data_path,
     mock_auth_client_success_jwt_decode,
@@ -433,3 +719,886 @@ def test_retrieve_units(template_swift_data_path, mock_auth_client_success_jwt_d
 
     assert isinstance(response.json(), dict)
     assert response.json()["time"] == expected_time
+
+
+def test_retrieve_server_stats(mock_auth_client_success_jwt_decode):
+    response = mock_auth_client_success_jwt_decode.get("/swiftdata/stats")
+
+    assert response.status_code == status.HTTP_200_OK
+    stats = response.json()
+    assert set(stats) == {
+        "data_executor",
+        "metadata_executor",
+        "file_pool",
+        "metadata_cache",
+        "units_cache",
+        "result_cache",
+    }
+    assert set(stats["data_executor"]) == {"max_workers", "queued", "active"}
+
+
+def test_get_region_data_ranges(template_swift_data_path, mock_auth_client_success_jwt_decode):
+    payload = {
+        "data_spec": {
+            "filename": str(template_swift_data_path),
+            "particle_type": "gas",
+            "region": [[0, 20], [0, 20], [0, 20]],
+            "units": "Mpc",
+        },
+    }
+    expected_mask_size = 2963
+
+    response = mock_auth_client_success_jwt_decode.post("/swiftdata/region", json=payload)
+    assert response.status_code == status.HTTP_200_OK
+    assert int(response.headers["X-Mask-Size"]) == expected_mask_size
+
+    ranges = np.asarray(response.json()["array"], dtype=response.json()["dtype"])
+    assert np.diff(ranges).sum() == expected_mask_size
+
+
+def test_get_region_data_fields(template_swift_data_path, mock_auth_client_success_jwt_decode):
+    payload = {
+        "data_spec": {
+            "filename": str(template_swift_data_path),
+            "particle_type": "gas",
+            "region": [[0, 20], [0, 20], [0, 20]],
+            "fields": ["Coordinates", "Masses"],
+        },
+    }
+
+    response = mock_auth_client_success_jwt_decode.post("/swiftdata/region", json=payload)
+    assert response.status_code == status.HTTP_200_OK
+
+    mask_size = int(response.headers["X-Mask-Size"])
+    arrays = np.load(io.BytesIO(response.content))
+    assert arrays.files == payload["data_spec"]["fields"]
+    assert arrays["Coordinates"].shape == (mask_size, 3)
+    assert arrays["Masses"].shape == (mask_size,)
+
+
+def test_get_region_data_fails_with_invalid_particle_type(
+    template_swift_data_path,
+    mock_auth_client_success_jwt_decode,
+):
+    payload = {
+        "data_spec": {
+            "filename": str(template_swift_data_path),
+            "particle_type": "stars",
+            "region": [[0, 20], None, None],
+        },
+    }
+
+    response = mock_auth_client_success_jwt_decode.post("/swiftdata/region", json=payload)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_get_unmasked_array_data_pages_with_cursor(
+    template_swift_data_path,
+    mock_auth_client_success_jwt_decode,
+):
+    payload = {
+        "data_spec": {
+            "filename": str(template_swift_data_path),
+            "field": "PartType0/Masses",
+            "start": 10,
+            "stop": 20,
+        },
+    }
+    full_array = SWIFTProcessor.get_array_unmasked(
+        str(template_swift_data_path),
+        "PartType0/Masses",
+    )
+
+    response = mock_auth_client_success_jwt_decode.post(
+        "/swiftdata/unmasked_dataset",
+        json=payload,
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert int(response.headers["X-Total-Rows"]) == full_array.shape[0]
+    assert np.array_equal(response.json()["array"], full_array[10:20])
+
+    next_payload = {
+        "data_spec": {
+            "filename": str(template_swift_data_path),
+            "field": "PartType0/Masses",
+            "cursor": response.headers["X-Next-Cursor"],
+        },
+    }
+    response = mock_auth_client_success_jwt_decode.post(
+        "/swiftdata/unmasked_dataset",
+        json=next_payload,
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert np.array_equal(response.json()["array"], full_array[20:30])
+
+
+def test_get_unmasked_array_data_last_page_has_no_cursor(
+    template_swift_data_path,
+    mock_auth_client_success_jwt_decode,
+):
+    payload = {
+        "data_spec": {
+            "filename": str(template_swift_data_path),
+            "field": "PartType0/Coordinates",
+            "start": 32380,
+            "stop": 32400,
+            "stream": True,
+        },
+    }
+    expected_rows = 2
+
+    response = mock_auth_client_success_jwt_decode.post(
+        "/swiftdata/unmasked_dataset",
+        json=payload,
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert "X-Next-Cursor" not in response.headers
+    assert np.load(io.BytesIO(response.content)).shape == (expected_rows, 3)
+
+
+def test_get_unmasked_array_data_fails_with_cursor_for_other_field(
+    template_swift_data_path,
+    mock_auth_client_success_jwt_decode,
+):
+    payload = {
+        "data_spec": {
+            "filename": str(template_swift_data_path),
+            "field": "PartType0/Masses",
+            "cursor": encode_cursor("PartType0/Densities", 10, 10),
+        },
+    }
+
+    response = mock_auth_client_success_jwt_decode.post(
+        "/swiftdata/unmasked_dataset",
+        json=payload,
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_get_unmasked_array_data_zstd_byte_shuffle(
+    template_swift_data_path,
+    mock_auth_client_success_jwt_decode,
+):
+    payload = {
+        "data_spec": {
+            "filename": str(template_swift_data_path),
+            "field": "PartType0/Coordinates",
+            "format": "npy",
+        },
+    }
+    headers = {"Accept-Encoding": "zstd", "X-Byte-Shuffle": "1"}
+    expected_array = SWIFTProcessor.get_array_unmasked(
+        str(template_swift_data_path),
+        "PartType0/Coordinates",
+    )
+
+    response = mock_auth_client_success_jwt_decode.post(
+        "/swiftdata/unmasked_dataset",
+        json=payload,
+        headers=headers,
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["Content-Encoding"] == "zstd"
+
+    content = zstandard.ZstdDecompressor().decompressobj().decompress(response.content)
+    data_type, header_bytes = SWIFTProcessor.read_npy_header(content)
+    shuffle = dict(item.split("=") for item in response.headers["X-Byte-Shuffle"].split("; "))
+    itemsize, block_bytes = int(shuffle["itemsize"]), int(shuffle["block-bytes"])
+    assert itemsize == data_type.itemsize
+
+    data = content[header_bytes:]
+    unshuffled = b"".join(
+        unshuffle_bytes(data[offset : offset + block_bytes], itemsize)
+        for offset in range(0, len(data), block_bytes)
+    )
+    output_array = np.load(io.BytesIO(content[:header_bytes] + unshuffled))
+    np.testing.assert_array_equal(output_array, expected_array)
+
+
+@pytest.mark.parametrize("opt_in", ["0", "false"])
+def test_byte_shuffle_requires_explicit_opt_in(
+    template_swift_data_path,
+    mock_auth_client_success_jwt_decode,
+    opt_in,
+):
+    payload = {
+        "data_spec": {
+            "filename": str(template_swift_data_path),
+            "field": "PartType0/Coordinates",
+            "format": "npy",
+        },
+    }
+    expected_array = SWIFTProcessor.get_array_unmasked(
+        str(template_swift_data_path),
+        "PartType0/Coordinates",
+    )
+
+    response = mock_auth_client_success_jwt_decode.post(
+        "/swiftdata/unmasked_dataset",
+        json=payload,
+        headers={"Accept-Encoding": "zstd", "X-Byte-Shuffle": opt_in},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert "X-Byte-Shuffle" not in response.headers
+
+    content = zstandard.ZstdDecompressor().decompressobj().decompress(response.content)
+    np.testing.assert_array_equal(np.load(io.BytesIO(content)), expected_array)
+
+
+def test_retrieve_metadata_gzip(template_swift_data_path, mock_auth_client_success_jwt_decode):
+    payload = {
+        "data_spec": {
+            "filename": str(template_swift_data_path),
+        },
+    }
+
+    response = mock_auth_client_success_jwt_decode.post(
+        "/swiftdata/metadata",
+        json=payload,
+        headers={"Accept-Encoding": "gzip"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert isinstance(cloudpickle.loads(response.content), SWIFTMetadata)
+
+
+def test_get_aggregate_data_masked(template_swift_data_path, mock_auth_client_success_jwt_decode):
+    payload = {
+        "data_spec": {
+            "filename": str(template_swift_data_path),
+            "field": "PartType0/Coordinates",
+            "mask_array_json": "[[0, 100], [200, 334]]",
+            "operations": ["sum", "max", "count"],
+        },
+    }
+    expected_count = 234
+    masked_array = SWIFTProcessor.get_array_masked(
+        str(template_swift_data_path),
+        "PartType0/Coordinates",
+        payload["data_spec"]["mask_array_json"],
+        None,
+        expected_count,
+    )
+
+    response = mock_auth_client_success_jwt_decode.post("/swiftdata/aggregate", json=payload)
+    assert response.status_code == status.HTTP_200_OK
+
+    aggregate = response.json()
+    assert set(aggregate["results"]) == {"sum", "max", "count"}
+    assert aggregate["results"]["count"] == expected_count
+    np.testing.assert_allclose(aggregate["results"]["sum"], masked_array.sum(axis=0))
+    np.testing.assert_array_equal(aggregate["results"]["max"], masked_array.max(axis=0))
+    assert unyt_quantity.from_string(aggregate["units"]) == unyt_quantity(1, "Mpc")
+
+
+def test_get_aggregate_data_fails_with_invalid_field_name(
+    template_swift_data_path,
+    mock_auth_client_success_jwt_decode,
+):
+    payload = {
+        "data_spec": {
+            "filename": str(template_swift_data_path),
+            "field": "PartType0/NotAField",
+        },
+    }
+
+    response = mock_auth_client_success_jwt_decode.post("/swiftdata/aggregate", json=payload)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_get_histogram_data(template_swift_data_path, mock_auth_client_success_jwt_decode):
+    payload = {
+        "data_spec": {
+            "filename": str(template_swift_data_path),
+            "fields": ["PartType0/Densities"],
+            "bins": [{"lower": 0.01, "upper": 1e5, "bins": 10, "scale": "log"}],
+            "weights": "PartType0/Masses",
+            "statistic": "mean",
+        },
+    }
+    densities = SWIFTProcessor.get_array_unmasked(
+        str(template_swift_data_path),
+        "PartType0/Densities",
+    )
+
+    response = mock_auth_client_success_jwt_decode.post("/swiftdata/histogram", json=payload)
+    assert response.status_code == status.HTTP_200_OK
+
+    histogram = response.json()
+    expected_counts, _ = np.histogram(densities, bins=histogram["edges"][0])
+    np.testing.assert_array_equal(histogram["counts"], expected_counts)
+    assert len(histogram["values"]) == len(expected_counts)
+
+
+def test_get_histogram_data_same_field_columns(
+    template_swift_data_path,
+    mock_auth_client_success_jwt_decode,
+):
+    field = "PartType0/Coordinates"
+    payload = {
+        "data_spec": {
+            "filename": str(template_swift_data_path),
+            "fields": [field, field],
+            "columns": [0, 1],
+            "bins": [{"lower": 0.0, "upper": 1e3, "bins": 4}, {"lower": 0.0, "upper": 1e3}],
+        },
+    }
+    coordinates = SWIFTProcessor.get_array_unmasked(str(template_swift_data_path), field)
+
+    response = mock_auth_client_success_jwt_decode.post("/swiftdata/histogram", json=payload)
+    assert response.status_code == status.HTTP_200_OK
+
+    histogram = response.json()
+    expected_counts, _, _ = np.histogram2d(
+        coordinates[:, 0],
+        coordinates[:, 1],
+        bins=histogram["edges"],
+    )
+    np.testing.assert_array_equal(
+        np.reshape(histogram["counts"], expected_counts.shape),
+        expected_counts,
+    )
+
+
+def test_get_histogram_data_fails_with_repeated_field_column(
+    template_swift_data_path,
+    mock_auth_client_success_jwt_decode,
+):
+    field = "PartType0/Coordinates"
+    payload = {
+        "data_spec": {
+            "filename": str(template_swift_data_path),
+            "fields": [field, field],
+            "columns": [0, 0],
+            "bins": [{"lower": 0.0, "upper": 1e3}, {"lower": 0.0, "upper": 1e3}],
+        },
+    }
+
+    response = mock_auth_client_success_jwt_decode.post("/swiftdata/histogram", json=payload)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "field and column" in response.json()["detail"]
+
+
+def test_get_histogram_data_fails_with_mismatched_bins(
+    template_swift_data_path,
+    mock_auth_client_success_jwt_decode,
+):
+    payload = {
+        "data_spec": {
+            "filename": str(template_swift_data_path),
+            "fields": ["PartType0/Densities", "PartType0/Temperatures"],
+            "bins": [{"lower": 0.01, "upper": 1e5}],
+        },
+    }
+
+    response = mock_auth_client_success_jwt_decode.post("/swiftdata/histogram", json=payload)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.parametrize(
+    "axis",
+    [
+        {"lower": 0.01, "upper": 1e5, "bins": 5},
+        {"edges": [0.0, 1.0, 2.0, 3.0, 4.0, 5.0]},
+    ],
+)
+def test_get_histogram_data_fails_with_too_many_bins(
+    template_swift_data_path,
+    mock_auth_client_success_jwt_decode,
+    monkeypatch,
+    axis,
+):
+    monkeypatch.setattr(get_settings(), "histogram_max_bins", 4)
+    payload = {
+        "data_spec": {
+            "filename": str(template_swift_data_path),
+            "fields": ["PartType0/Densities"],
+            "bins": [axis],
+        },
+    }
+
+    response = mock_auth_client_success_jwt_decode.post("/swiftdata/histogram", json=payload)
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert "at most 4 bins" in response.text
+
+
+def test_sampled_arrays_are_aligned(template_swift_data_path, mock_auth_client_success_jwt_decode):
+    total_rows = 32382
+    sample = {"sample_fraction": 0.05, "seed": 3}
+    filename = str(template_swift_data_path)
+
+    unmasked = {}
+    for field in ["PartType0/Coordinates", "PartType0/ParticleIDs"]:
+        payload = {"data_spec": {"filename": filename, "field": field, "format": "npy", **sample}}
+        response = mock_auth_client_success_jwt_decode.post(
+            "/swiftdata/unmasked_dataset",
+            json=payload,
+        )
+        assert response.status_code == status.HTTP_200_OK
+        unmasked[field] = np.load(io.BytesIO(response.content))
+
+    coordinates = SWIFTProcessor.get_array_unmasked(filename, "PartType0/Coordinates")
+    particle_ids = SWIFTProcessor.get_array_unmasked(filename, "PartType0/ParticleIDs")
+    sampled_rows = np.flatnonzero(np.isin(particle_ids, unmasked["PartType0/ParticleIDs"]))
+    assert 0 < len(sampled_rows) < total_rows / 10
+    np.testing.assert_array_equal(unmasked["PartType0/Coordinates"], coordinates[sampled_rows])
+
+    payload = {
+        "data_spec": {
+            "filename": filename,
+            "field": "PartType0/ParticleIDs",
+            "mask_array_json": "[[0, 10000]]",
+            "mask_size": 10000,
+            **sample,
+        },
+    }
+    response = mock_auth_client_success_jwt_decode.post("/swiftdata/masked_dataset", json=payload)
+    assert response.status_code == status.HTTP_200_OK
+
+    masked_ids = np.asarray(response.json()["array"], dtype=response.json()["dtype"])
+    np.testing.assert_array_equal(masked_ids, particle_ids[sampled_rows[sampled_rows < 10000]])
+
+
+def test_sampled_unmasked_array_cannot_be_streamed(
+    template_swift_data_path,
+    mock_auth_client_success_jwt_decode,
+):
+    payload = {
+        "data_spec": {
+            "filename": str(template_swift_data_path),
+            "field": "PartType0/Masses",
+            "stream": True,
+            "sample_fraction": 0.1,
+        },
+    }
+
+    response = mock_auth_client_success_jwt_decode.post("/swiftdata/unmasked_dataset", json=payload)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_get_masked_array_data_explain(
+    template_swift_data_path,
+    mock_auth_client_success_jwt_decode,
+):
+    payload = {
+        "data_spec": {
+            "filename": str(template_swift_data_path),
+            "field": "PartType0/Coordinates",
+            "mask_array_json": "[[0, 100], [200, 334]]",
+            "mask_size": 234,
+            "explain": True,
+        },
+    }
+
+    response = mock_auth_client_success_jwt_decode.post("/swiftdata/masked_dataset", json=payload)
+    assert response.status_code == status.HTTP_200_OK
+
+    explanation = response.json()
+    assert explanation["layout"] == "contiguous"
+    assert explanation["reads"] < explanation["ranges"]
+    assert explanation["rows"] == payload["data_spec"]["mask_size"]
+
+
+def test_get_masked_array_data_fails_with_wrong_mask_size(
+    template_swift_data_path,
+    mock_auth_client_success_jwt_decode,
+):
+    payload = {
+        "data_spec": {
+            "filename": str(template_swift_data_path),
+            "field": "PartType0/Coordinates",
+            "mask_array_json": "[[0, 100]]",
+            "mask_size": 101,
+        },
+    }
+
+    response = mock_auth_client_success_jwt_decode.post("/swiftdata/masked_dataset", json=payload)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "mask size" in response.json()["detail"]
+
+
+def test_masked_array_responses_are_cached(
+    template_swift_data_path,
+    mock_auth_client_success_jwt_decode,
+):
+    field = "PartType0/Densities"
+    payload = {
+        "data_spec": {
+            "filename": str(template_swift_data_path),
+            "field": field,
+            "mask_array_json": "[[5, 105], [205, 339]]",
+            "mask_size": 234,
+            "format": "npy",
+        },
+    }
+
+    first_response = mock_auth_client_success_jwt_decode.post(
+        "/swiftdata/masked_dataset",
+        json=payload,
+    )
+    second_response = mock_auth_client_success_jwt_decode.post(
+        "/swiftdata/masked_dataset",
+        json=payload,
+    )
+    upload_response = mock_auth_client_success_jwt_decode.post(
+        "/swiftdata/masked_dataset_upload",
+        data={
+            "filename": str(template_swift_data_path),
+            "field": field,
+            "mask_size": "234",
+            "mask_data_type": "int32",
+            "format": "npy",
+        },
+        files={"mask": ("mask.bin", np.array([[5, 105], [205, 339]], dtype="int32").tobytes())},
+    )
+
+    assert first_response.headers["X-Result-Cache"] == "miss"
+    assert second_response.headers["X-Result-Cache"] == "hit"
+    assert upload_response.headers["X-Result-Cache"] == "hit"
+    assert second_response.headers["content-type"] == "application/x-npy"
+    assert second_response.content == first_response.content == upload_response.content
+
+    expected_hits = 2
+    stats = mock_auth_client_success_jwt_decode.get("/swiftdata/stats").json()
+    assert stats["result_cache"]["hits"] >= expected_hits
+
+
+def test_concurrent_identical_responses_share_one_read(mocker):
+    cache = ByteLRUCache(max_bytes=1024)
+    mocker.patch("api.routers.file_processing.get_result_cache", return_value=cache)
+    release = threading.Event()
+    read_array = mocker.Mock(
+        side_effect=lambda: release.wait(10) and np.arange(10, dtype=np.float32),
+    )
+    callers = 3
+
+    with ThreadPoolExecutor(max_workers=callers) as executor:
+        futures = [
+            executor.submit(create_cached_array_response, "key", "npy", read_array)
+            for _ in range(callers)
+        ]
+        while cache.stats()["coalesced"] < callers - 1:
+            time.sleep(0.01)
+        release.set()
+        responses = [future.result() for future in futures]
+
+    read_array.assert_called_once()
+    assert sorted(response.headers["X-Result-Cache"] for response in responses) == [
+        "coalesced",
+        "coalesced",
+        "miss",
+    ]
+    assert len({response.body for response in responses}) == 1
+    assert all(response.media_type == "application/x-npy" for response in responses)
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_get_unmasked_array_data_output_dtype(
+    template_swift_data_path,
+    mock_auth_client_success_jwt_decode,
+    stream,
+):
+    payload = {
+        "data_spec": {
+            "filename": str(template_swift_data_path),
+            "field": "PartType0/Coordinates",
+            "format": "npy",
+            "stream": stream,
+            "output_dtype": "float32",
+        },
+    }
+
+    response = mock_auth_client_success_jwt_decode.post("/swiftdata/unmasked_dataset", json=payload)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["X-Original-Dtype"] == "<f8"
+
+    array = np.load(io.BytesIO(response.content))
+    expected_array = SWIFTProcessor.get_array_unmasked(
+        str(template_swift_data_path),
+        "PartType0/Coordinates",
+    )
+    assert array.dtype == np.float32
+    np.testing.assert_array_equal(array, expected_array.astype(np.float32))
+
+
+def test_get_masked_array_data_output_dtype_requires_allow_unsafe_cast(
+    template_swift_data_path,
+    mock_auth_client_success_jwt_decode,
+):
+    payload = {
+        "data_spec": {
+            "filename": str(template_swift_data_path),
+            "field": "PartType0/ParticleIDs",
+            "mask_array_json": "[[0, 100]]",
+            "mask_size": 100,
+            "output_dtype": "int32",
+        },
+    }
+
+    response = mock_auth_client_success_jwt_decode.post("/swiftdata/masked_dataset", json=payload)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "allow_unsafe_cast" in response.json()["detail"]
+
+    payload["data_spec"]["allow_unsafe_cast"] = True
+    response = mock_auth_client_success_jwt_decode.post("/swiftdata/masked_dataset", json=payload)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["dtype"] == "<i4"
+    assert response.headers["X-Original-Dtype"] == "<u8"
+
+
+def test_get_masked_batch_array_data_arrow(
+    template_swift_data_path,
+    mock_auth_client_success_jwt_decode,
+):
+    pa = pytest.importorskip("pyarrow")
+    payload = {
+        "data_spec": {
+            "filename": str(template_swift_data_path),
+            "fields": ["PartType0/Coordinates", "PartType0/Masses"],
+            "mask_array_json": "[[0, 100], [200, 334]]",
+            "mask_size": 234,
+        },
+    }
+
+    response = mock_auth_client_success_jwt_decode.post(
+        "/swiftdata/masked_batch",
+        json=payload,
+        headers={"Accept": "application/vnd.apache.arrow.stream"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/vnd.apache.arrow.stream"
+
+    table = pa.ipc.open_stream(response.content).read_all()
+    assert table.column_names == payload["data_spec"]["fields"]
+    assert table.num_rows == payload["data_spec"]["mask_size"]
+    assert table.schema.field("PartType0/Coordinates").type.list_size == 3
+    assert b"units" in table.schema.field("PartType0/Masses").metadata
+
+
+def test_get_masked_array_data_arrow_requires_pyarrow(
+    template_swift_data_path,
+    mock_auth_client_success_jwt_decode,
+    mocker,
+):
+    mocker.patch("api.processing.arrow.pa", None)
+    payload = {
+        "data_spec": {
+            "filename": str(template_swift_data_path),
+            "field": "PartType0/Masses",
+            "mask_array_json": "[[0, 100]]",
+            "mask_size": 100,
+            "format": "arrow",
+        },
+    }
+
+    response = mock_auth_client_success_jwt_decode.post("/swiftdata/masked_dataset", json=payload)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "pyarrow" in response.json()["detail"]
+
+
+def test_get_extract(template_swift_data_path, mock_auth_client_success_jwt_decode, tmp_path):
+    payload = {
+        "data_spec": {
+            "filename": str(template_swift_data_path),
+            "particle_types": ["gas", "PartType1"],
+            "fields": ["Coordinates", "Masses"],
+            "region": [[0, 20], [0, 20], [0, 20]],
+        },
+    }
+
+    response = mock_auth_client_success_jwt_decode.post("/swiftdata/extract", json=payload)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/x-hdf5"
+
+    output_file = tmp_path / "extract.hdf5"
+    output_file.write_bytes(response.content)
+    data = sw.load(str(output_file))
+    assert data.gas.coordinates.shape == (data.metadata.n_gas, 3)
+    assert data.dark_matter.masses.shape == (data.metadata.n_dark_matter,)
+    assert 0 < data.metadata.n_gas < sw.load(str(template_swift_data_path)).gas.masses.shape[0]
+
+
+def test_get_extract_fails_with_mask_and_region(
+    template_swift_data_path,
+    mock_auth_client_success_jwt_decode,
+):
+    payload = {
+        "data_spec": {
+            "filename": str(template_swift_data_path),
+            "particle_types": ["gas"],
+            "region": [[0, 20], None, None],
+            "mask_array_json": "[[0, 100]]",
+        },
+    }
+
+    response = mock_auth_client_success_jwt_decode.post("/swiftdata/extract", json=payload)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.parametrize("region", [None, [None, None, None]])
+def test_get_extract_fails_without_selection(
+    template_swift_data_path,
+    mock_auth_client_success_jwt_decode,
+    region,
+):
+    payload = {
+        "data_spec": {
+            "filename": str(template_swift_data_path),
+            "particle_types": ["gas"],
+            "region": region,
+        },
+    }
+
+    response = mock_auth_client_success_jwt_decode.post("/swiftdata/extract", json=payload)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "Provide a mask or a region" in response.json()["detail"]
+
+
+@pytest.fixture()
+def job_manager(tmp_path, mocker):
+    manager = JobManager(tmp_path, max_spool_bytes=1024**3, ttl_seconds=60, max_workers=1)
+    mocker.patch("api.routers.jobs.get_job_manager", return_value=manager)
+    yield manager
+    manager.shutdown()
+
+
+def wait_for_job(client, job_id):
+    for _ in range(500):
+        job = client.get(f"/swiftdata/jobs/{job_id}").json()
+        if job["status"] not in ("queued", "running"):
+            return job
+        time.sleep(0.01)
+    pytest.fail(f"Job {job_id} did not finish.")
+
+
+def test_masked_dataset_job(
+    template_swift_data_path,
+    mock_auth_client_success_jwt_decode,
+    job_manager,
+):
+    payload = {
+        "data_spec": {
+            "kind": "masked_dataset",
+            "filename": str(template_swift_data_path),
+            "field": "PartType0/Masses",
+            "mask_array_json": "[[0, 100], [200, 334]]",
+            "mask_size": 234,
+            "format": "npy",
+        },
+    }
+
+    response = mock_auth_client_success_jwt_decode.post("/swiftdata/jobs", json=payload)
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    job_id = response.json()["id"]
+
+    job = wait_for_job(mock_auth_client_success_jwt_decode, job_id)
+    assert job["status"] == "succeeded"
+    assert job["progress"] == 1.0
+
+    response = mock_auth_client_success_jwt_decode.get(f"/swiftdata/jobs/{job_id}/result")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/x-npy"
+    assert len(response.content) == job["bytes_written"]
+
+    expected_array = SWIFTProcessor.get_array_masked(
+        str(template_swift_data_path),
+        "PartType0/Masses",
+        payload["data_spec"]["mask_array_json"],
+        None,
+        payload["data_spec"]["mask_size"],
+    )
+    np.testing.assert_array_equal(np.load(io.BytesIO(response.content)), expected_array)
+
+
+@pytest.mark.parametrize(
+    ("kind", "selection", "rows"),
+    [
+        (
+            "masked_dataset",
+            {"mask_array_json": "[[0, 100], [200, 334]]", "mask_size": 234},
+            [np.s_[0:100], np.s_[200:334]],
+        ),
+        ("unmasked_dataset", {"start": 10, "stop": 244}, [np.s_[10:244]]),
+    ],
+)
+def test_npy_job_writes_blocks(
+    template_swift_data_path,
+    mock_auth_client_success_jwt_decode,
+    job_manager,
+    mocker,
+    monkeypatch,
+    kind,
+    selection,
+    rows,
+):
+    mocker.patch("api.routers.jobs.run_response_job", side_effect=AssertionError)
+    monkeypatch.setattr(get_settings(), "stream_block_size_bytes", 256)
+    payload = {
+        "data_spec": {
+            "kind": kind,
+            "filename": str(template_swift_data_path),
+            "field": "PartType0/Coordinates",
+            "format": "npy",
+            **selection,
+        },
+    }
+
+    response = mock_auth_client_success_jwt_decode.post("/swiftdata/jobs", json=payload)
+    job = wait_for_job(mock_auth_client_success_jwt_decode, response.json()["id"])
+    assert job["status"] == "succeeded"
+
+    response = mock_auth_client_success_jwt_decode.get(f"/swiftdata/jobs/{job['id']}/result")
+    assert response.headers["content-type"] == "application/x-npy"
+    with h5py.File(template_swift_data_path, "r") as handle:
+        coordinates = handle["PartType0/Coordinates"]
+        expected_array = np.concatenate([coordinates[selected] for selected in rows])
+    np.testing.assert_array_equal(np.load(io.BytesIO(response.content)), expected_array)
+
+
+def test_extract_job(template_swift_data_path, mock_auth_client_success_jwt_decode, job_manager):
+    payload = {
+        "data_spec": {
+            "kind": "extract",
+            "filename": str(template_swift_data_path),
+            "particle_types": ["gas"],
+            "fields": ["Masses"],
+            "mask_array_json": "[[0, 100]]",
+        },
+    }
+
+    response = mock_auth_client_success_jwt_decode.post("/swiftdata/jobs", json=payload)
+    job_id = response.json()["id"]
+    assert wait_for_job(mock_auth_client_success_jwt_decode, job_id)["status"] == "succeeded"
+
+    response = mock_auth_client_success_jwt_decode.get(f"/swiftdata/jobs/{job_id}/result")
+    assert response.headers["content-type"] == "application/x-hdf5"
+    with h5py.File(io.BytesIO(response.content)) as output:
+        assert output["PartType0/Masses"].shape == (100,)
+
+
+def test_failed_job_has_no_result(
+    template_swift_data_path,
+    mock_auth_client_success_jwt_decode,
+    job_manager,
+):
+    payload = {
+        "data_spec": {
+            "kind": "unmasked_dataset",
+            "filename": str(template_swift_data_path),
+            "field": "PartType0/NotAField",
+        },
+    }
+
+    response = mock_auth_client_success_jwt_decode.post("/swiftdata/jobs", json=payload)
+    job_id = response.json()["id"]
+    job = wait_for_job(mock_auth_client_success_jwt_decode, job_id)
+    assert job["status"] == "failed"
+    assert job["error"]
+
+    response = mock_auth_client_success_jwt_decode.get(f"/swiftdata/jobs/{job_id}/result")
+    assert response.status_code == status.HTTP_409_CONFLICT
+
+
+def test_get_job_fails_for_unknown_job(mock_auth_client_success_jwt_decode, job_manager):
+    response = mock_auth_client_success_jwt_decode.get("/swiftdata/jobs/not_a_job")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+from api.processing.arrow import (
+    create_arrow_array,
+    create_field_metadata,
+    generate_arrow_from_ndarrays,
+)
+from api.processing.data_processing import SWIFTProcessorError
+from api.processing.units import get_field_units
+
+
+def test_create_arrow_array_fixed_size_lists():
+    pytest.importorskip("pyarrow")
+    array = np.arange(12, dtype=">f8").reshape(4, 3)
+
+    arrow_array = create_arrow_array(array)
+
+    assert len(arrow_array) == len(array)
+    assert arrow_array.type.list_size == array.shape[1]
+    np.testing.assert_array_equal(arrow_array.flatten().to_numpy().reshape(4, 3), array)
+
+
+def test_generate_arrow_from_ndarrays():
+    pa = pytest.importorskip("pyarrow")
+    arrays = {
+        "Coordinates": np.arange(12, dtype=np.float64).reshape(4, 3),
+        "Masses": np.arange(4, dtype=np.float32),
+    }
+
+    content = generate_arrow_from_ndarrays(arrays, {"Masses": {"units": "Msun"}})
+
+    table = pa.ipc.open_stream(content).read_all()
+    assert table.column_names == list(arrays)
+    assert table.schema.field("Masses").metadata == {b"units": b"Msun"}
+    np.testing.assert_array_equal(table["Masses"].to_numpy(), arrays["Masses"])
+
+
+def test_generate_arrow_from_ndarrays_fails_with_mismatched_lengths():
+    pytest.importorskip("pyarrow")
+    with pytest.raises(SWIFTProcessorError, match="Unable to convert"):
+        generate_arrow_from_ndarrays({"a": np.arange(3), "b": np.arange(4)})
+
+
+def test_generate_arrow_from_ndarrays_requires_pyarrow(mocker):
+    mocker.patch("api.processing.arrow.pa", None)
+    with pytest.raises(SWIFTProcessorError, match="pyarrow"):
+        generate_arrow_from_ndarrays({"a": np.arange(3)})
+
+
+def test_create_field_metadata(template_swift_data_path):
+    field = "PartType0/Coordinates"
+    metadata = create_field_metadata(str(template_swift_data_path), field)
+
+    assert metadata["field"] == field
+    assert metadata["units"] == get_field_units(str(template_swift_data_path), field).to_string()
+    assert float(metadata["a_scale_exponent"]) == 1.0
+
+
+def test_create_field_metadata_fails_with_invalid_field(template_swift_data_path):
+    with pytest.raises(SWIFTProcessorError, match="not found"):
+        create_field_metadata(str(template_swift_data_path), "PartType0/NotAField")
@@ -0,0 +1,117 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from api.processing.caching import ByteLRUCache, SingleFlight
+
+WAIT_TIMEOUT_SECONDS = 10
+
+
+def test_byte_lru_cache_hit_and_miss():
+    cache = ByteLRUCache(max_bytes=10)
+
+    assert cache.get("a") is None
+    cache.put("a", b"12345")
+
+    assert cache.get("a") == b"12345"
+    assert cache.stats() == {
+        "entries": 1,
+        "bytes": 5,
+        "hits": 1,
+        "misses": 1,
+        "evictions": 0,
+        "coalesced": 0,
+    }
+
+
+def test_byte_lru_cache_evicts_least_recently_used_by_size():
+    cache = ByteLRUCache(max_bytes=10)
+
+    cache.put("a", b"1234")
+    cache.put("b", b"1234")
+    cache.get("a")
+    cache.put("c", b"1234")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1234"
+    assert cache.get("c") == b"1234"
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] == len(b"1234") * 2
+
+
+def test_byte_lru_cache_skips_oversized_values():
+    cache = ByteLRUCache(max_bytes=4)
+
+    cache.put("a", b"12345")
+
+    assert cache.get("a") is None
+    assert cache.stats()["bytes"] == 0
+
+
+def test_byte_lru_cache_get_or_create(mocker):
+    cache = ByteLRUCache(max_bytes=10)
+    create_value = mocker.Mock(return_value=b"value")
+
+    assert cache.get_or_create("a", create_value) == b"value"
+    assert cache.get_or_create("a", create_value) == b"value"
+    create_value.assert_called_once()
+
+
+def wait_for_coalesced(cache: ByteLRUCache, expected: int) -> None:
+    deadline = time.monotonic() + WAIT_TIMEOUT_SECONDS
+    while cache.stats()["coalesced"] < expected:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_byte_lru_cache_coalesces_concurrent_misses(mocker):
+    cache = ByteLRUCache(max_bytes=10)
+    release = threading.Event()
+    create_value = mocker.Mock(
+        side_effect=lambda: release.wait(WAIT_TIMEOUT_SECONDS) and b"value",
+    )
+    callers = 4
+
+    with ThreadPoolExecutor(max_workers=callers) as executor:
+        futures = [
+            executor.submit(cache.get_or_create_with_status, "a", create_value)
+            for _ in range(callers)
+        ]
+        wait_for_coalesced(cache, callers - 1)
+        release.set()
+        results = [future.result() for future in futures]
+
+    create_value.assert_called_once()
+    assert all(value == b"value" for value, _ in results)
+    assert sorted(status for _, status in results) == ["coalesced"] * (callers - 1) + ["miss"]
+    assert cache.get_or_create_with_status("a", create_value) == (b"value", "hit")
+
+
+def test_byte_lru_cache_coalesced_errors_are_not_cached():
+    cache = ByteLRUCache(max_bytes=10)
+    release = threading.Event()
+
+    def fail() -> bytes:
+        release.wait(WAIT_TIMEOUT_SECONDS)
+        raise ValueError("read failed")
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = [executor.submit(cache.get_or_create, "a", fail) for _ in range(2)]
+        wait_for_coalesced(cache, 1)
+        release.set()
+        for future in futures:
+            with pytest.raises(ValueError, match="read failed"):
+                future.result()
+
+    assert cache.get_or_create("a", lambda: b"value") == b"value"
+
+
+def test_single_flight_runs_sequential_calls_separately(mocker):
+    flights = SingleFlight()
+    function = mocker.Mock(return_value=1)
+
+    assert flights.run("a", function) == (1, False)
+    assert flights.run("a", function) == (1, False)
+    assert function.call_count == 2
+    assert flights.shared == 0
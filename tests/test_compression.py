@@ -0,0 +1,96 @@
+import gzip
+import io
+
+import lz4.frame
+import numpy as np
+import pytest
+import zstandard
+from api.processing.compression import (
+    compress_chunks,
+    get_available_encodings,
+    get_shuffle_itemsize,
+    negotiate_encoding,
+    shuffle_bytes,
+    shuffle_chunks,
+    shuffle_npy_chunks,
+    unshuffle_bytes,
+)
+from api.processing.data_processing import SWIFTProcessor
+
+DECOMPRESSORS = {
+    "gzip": gzip.decompress,
+    "zstd": lambda data: zstandard.ZstdDecompressor().decompressobj().decompress(data),
+    "lz4": lz4.frame.decompress,
+}
+
+
+@pytest.mark.parametrize(
+    ("accept_encoding", "expected_encoding"),
+    [
+        (None, None),
+        ("gzip, deflate", "gzip"),
+        ("gzip, zstd", "zstd"),
+        ("gzip;q=1.0, zstd;q=0.5", "gzip"),
+        ("zstd;q=0, *", "lz4"),
+        ("identity", None),
+        ("br", None),
+    ],
+)
+def test_negotiate_encoding(accept_encoding, expected_encoding):
+    assert negotiate_encoding(accept_encoding, ("zstd", "lz4", "gzip")) == expected_encoding
+
+
+def test_get_available_encodings():
+    assert get_available_encodings() == ("zstd", "lz4", "gzip")
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "zstd", "lz4"])
+def test_compress_chunks_round_trip(encoding):
+    chunks = [b"header", np.arange(10000, dtype=np.int64).tobytes(), b"", b"footer"]
+
+    compressed = b"".join(compress_chunks(chunks, encoding, level=1, slice_bytes=4096))
+
+    assert DECOMPRESSORS[encoding](compressed) == b"".join(chunks)
+
+
+def test_shuffle_bytes_round_trip():
+    data = np.arange(10, dtype="<i4").tobytes()
+
+    shuffled = shuffle_bytes(data, 4)
+
+    assert shuffled[:10] == bytes(range(10))
+    assert unshuffle_bytes(shuffled, 4) == data
+
+
+def test_shuffle_chunks_uses_fixed_blocks():
+    data = np.arange(100, dtype=np.float64).tobytes()
+    block_bytes = 80
+    chunks = [data[:13 * 8], data[13 * 8 : 14 * 8], data[14 * 8 :]]
+
+    shuffled = b"".join(shuffle_chunks(chunks, 8, block_bytes))
+
+    unshuffled = b"".join(
+        unshuffle_bytes(shuffled[offset : offset + block_bytes], 8)
+        for offset in range(0, len(shuffled), block_bytes)
+    )
+    assert unshuffled == data
+
+
+def test_shuffle_npy_chunks_keeps_header():
+    array = np.arange(50, dtype=np.int32)
+    content = SWIFTProcessor.generate_npy_from_ndarray(array)
+    _, header_bytes = SWIFTProcessor.read_npy_header(content)
+
+    output = b"".join(shuffle_npy_chunks([content], header_bytes, 4, 4 * 50))
+
+    assert output[:header_bytes] == content[:header_bytes]
+    restored = unshuffle_bytes(output[header_bytes:], 4)
+    np.testing.assert_array_equal(np.load(io.BytesIO(output[:header_bytes] + restored)), array)
+
+
+@pytest.mark.parametrize(
+    ("data_type", "expected_itemsize"),
+    [("<f8", 8), (">i4", 4), ("u1", None), ("O", None), ("S10", None), ("i4,f8", None)],
+)
+def test_get_shuffle_itemsize(data_type, expected_itemsize):
+    assert get_shuffle_itemsize(np.dtype(data_type)) == expected_itemsize
@@ -1,8 +1,11 @@
+import io
 import json
 from pathlib import Path
 
+import h5py
 import numpy as np
 import pytest
+from api.config import get_settings
 from api.processing.data_processing import SWIFTProcessor, SWIFTProcessorError
 
 
@@ -228,3 +231,275 @@ def test_get_array_spatial_masked_columns(
     assert masked_array.shape == (test_mask_size,)
     assert f"{masked_array[0]:.8f}" == expected_first_element
     assert f"{masked_array[-1]:.8f}" == expected_final_element
+
+
+def test_generate_npy_from_ndarray_round_trip_big_endian():
+    test_numpy_array = np.asarray([[337.0, 1.0], [234.1, 2.0], [355.1, 3.0]], dtype=">f4")
+
+    output_bytes = SWIFTProcessor.generate_npy_from_ndarray(test_numpy_array)
+    loaded_array = np.load(io.BytesIO(output_bytes))
+
+    assert isinstance(output_bytes, bytes)
+    assert loaded_array.dtype.str == ">f4"
+    assert loaded_array.shape == test_numpy_array.shape
+    assert np.array_equal(loaded_array, test_numpy_array)
+
+
+def test_generate_npy_from_ndarray_non_contiguous():
+    test_numpy_array = np.arange(12, dtype="<i8").reshape(4, 3)[:, 1]
+
+    loaded_array = np.load(
+        io.BytesIO(SWIFTProcessor.generate_npy_from_ndarray(test_numpy_array)),
+    )
+
+    assert np.array_equal(loaded_array, test_numpy_array)
+
+
+def test_generate_npy_from_ndarray_object_array_failure():
+    test_numpy_array = np.asarray([{"a": None}, 3], dtype=object)
+
+    with pytest.raises(SWIFTProcessorError) as error:
+        SWIFTProcessor.generate_npy_from_ndarray(test_numpy_array)
+
+    assert "binary format" in str(error.value)
+
+
+def test_get_block_rows_aligned_to_chunks(tmp_path):
+    test_filename = tmp_path / "chunked.hdf5"
+    with h5py.File(test_filename, "w") as handle:
+        handle.create_dataset("PartType0/Coordinates", data=np.zeros((1000, 3)), chunks=(64, 3))
+
+    with h5py.File(test_filename, "r") as handle:
+        dataset = handle["PartType0/Coordinates"]
+        expected_block_rows = 192
+        assert SWIFTProcessor.get_block_rows(dataset, 200 * 24) == expected_block_rows
+        assert SWIFTProcessor.get_block_rows(dataset, 1) == dataset.chunks[0]
+
+
+def test_get_array_unmasked_stream_matches_unmasked(template_swift_data_path):
+    test_field = "PartType0/SmoothedElementMassFractions"
+    test_columns = 1
+    test_block_size_bytes = 4096
+
+    expected_array = SWIFTProcessor.get_array_unmasked(
+        template_swift_data_path,
+        test_field,
+        test_columns,
+    )
+
+    data_type, shape, blocks = SWIFTProcessor.get_array_unmasked_stream(
+        str(template_swift_data_path),
+        test_field,
+        test_columns,
+        test_block_size_bytes,
+    )
+    blocks = list(blocks)
+
+    assert len(blocks) > 1
+    assert data_type == expected_array.dtype
+    assert shape == expected_array.shape
+    assert np.array_equal(np.concatenate(blocks), expected_array)
+
+
+def test_get_array_unmasked_stream_field_not_found(template_swift_data_path):
+    with pytest.raises(SWIFTProcessorError) as error:
+        SWIFTProcessor.get_array_unmasked_stream(
+            str(template_swift_data_path),
+            "PartType0/NotARealField",
+        )
+
+    assert "not found" in str(error.value)
+
+
+def test_load_ndarray_from_bytes_success():
+    test_mask_array = np.asarray([[0, 334], [334, 734], [734, 883]], dtype=">i4")
+
+    output_array = SWIFTProcessor.load_ndarray_from_bytes(test_mask_array.tobytes(), ">i4")
+
+    assert output_array.shape == test_mask_array.shape
+    assert output_array.dtype.isnative
+    assert np.array_equal(output_array, test_mask_array)
+
+
+def test_load_ndarray_from_bytes_failure_float_dtype():
+    test_mask_bytes = np.asarray([[0, 334]], dtype="float64").tobytes()
+
+    with pytest.raises(SWIFTProcessorError) as error:
+        SWIFTProcessor.load_ndarray_from_bytes(test_mask_bytes, "float64")
+
+    assert "must be integers" in str(error.value)
+
+
+def test_load_ndarray_from_bytes_failure_incomplete_pair():
+    test_mask_bytes = np.asarray([0, 334, 734], dtype="int64").tobytes()
+
+    with pytest.raises(SWIFTProcessorError) as error:
+        SWIFTProcessor.load_ndarray_from_bytes(test_mask_bytes, None)
+
+    assert "whole start/stop pairs" in str(error.value)
+
+
+def test_get_array_unmasked_stream_row_range(tmp_path):
+    filename = tmp_path / "chunked.hdf5"
+    data = np.arange(200 * 3, dtype=np.float32).reshape(200, 3)
+    with h5py.File(filename, "w") as handle:
+        handle.create_dataset("PartType0/Coordinates", data=data, chunks=(64, 3))
+
+    data_type, shape, blocks = SWIFTProcessor.get_array_unmasked_stream(
+        str(filename),
+        "PartType0/Coordinates",
+        block_size_bytes=64 * 3 * 4,
+        start=50,
+        stop=150,
+    )
+    blocks = list(blocks)
+
+    expected_block_rows = [14, 64, 22]
+    assert shape == (100, 3)
+    assert [block.shape[0] for block in blocks] == expected_block_rows
+    np.testing.assert_array_equal(np.concatenate(blocks), data[50:150])
+
+
+def test_map_dataset_only_maps_contiguous_unfiltered_datasets(tmp_path):
+    filename = tmp_path / "layouts.hdf5"
+    data = np.arange(100 * 3, dtype=">f4").reshape(100, 3)
+    with h5py.File(filename, "w") as handle:
+        handle.create_dataset("contiguous", data=data)
+        handle.create_dataset("chunked", data=data, chunks=(10, 3))
+        handle.create_dataset("compressed", data=data, compression="gzip")
+        handle.create_dataset("strings", data=np.array(["a", "b"], dtype=h5py.string_dtype()))
+
+    with h5py.File(filename, "r") as handle:
+        mapped_array = SWIFTProcessor.map_dataset(handle["contiguous"])
+        np.testing.assert_array_equal(mapped_array, data)
+        assert mapped_array.dtype == data.dtype
+        assert not mapped_array.flags.writeable
+
+        for name in ["chunked", "compressed", "strings"]:
+            assert SWIFTProcessor.map_dataset(handle[name]) is None
+
+
+@pytest.mark.parametrize("columns", [None, 1])
+def test_mapped_reads_match_hdf5_reads(tmp_path, columns):
+    filename = tmp_path / "layouts.hdf5"
+    data = np.arange(300 * 3, dtype=np.int64).reshape(300, 3)
+    with h5py.File(filename, "w") as handle:
+        handle.create_dataset("PartType0/Contiguous", data=data)
+        handle.create_dataset("PartType0/Chunked", data=data, chunks=(16, 3))
+    mask = np.array([[0, 5], [40, 41], [100, 250]])
+    mask_size = 156
+
+    filename = str(filename)
+    for rows in [(None, None), (17, 203)]:
+        np.testing.assert_array_equal(
+            SWIFTProcessor.get_array_unmasked(filename, "PartType0/Contiguous", columns, *rows),
+            SWIFTProcessor.get_array_unmasked(filename, "PartType0/Chunked", columns, *rows),
+        )
+    np.testing.assert_array_equal(
+        SWIFTProcessor.get_array_masked_from_ranges(
+            filename,
+            "PartType0/Contiguous",
+            mask,
+            mask_size,
+            columns,
+        ),
+        SWIFTProcessor.get_array_masked_from_ranges(
+            filename,
+            "PartType0/Chunked",
+            mask,
+            mask_size,
+            columns,
+        ),
+    )
+
+
+@pytest.mark.parametrize(
+    ("source_dtype", "output_dtype", "allow_unsafe_cast"),
+    [
+        ("f8", "float32", False),
+        ("f4", "float64", False),
+        ("i4", "int64", False),
+        ("i4", "float64", False),
+        ("i8", "int32", True),
+        ("f8", "int16", True),
+        ("f8", "float16", True),
+        ("c16", "complex64", False),
+    ],
+)
+def test_resolve_output_dtype_allowed(source_dtype, output_dtype, allow_unsafe_cast):
+    resolved_dtype = SWIFTProcessor.resolve_output_dtype(
+        np.dtype(source_dtype),
+        output_dtype,
+        allow_unsafe_cast=allow_unsafe_cast,
+    )
+
+    assert resolved_dtype == np.dtype(output_dtype)
+
+
+@pytest.mark.parametrize(
+    ("source_dtype", "output_dtype"),
+    [
+        ("i8", "int32"),
+        ("f8", "int64"),
+        ("i8", "float32"),
+        ("f8", "float16"),
+        ("f4", "float16"),
+        ("f8", "U10"),
+        ("f8", "not_a_type"),
+    ],
+)
+def test_resolve_output_dtype_rejected(source_dtype, output_dtype):
+    with pytest.raises(SWIFTProcessorError):
+        SWIFTProcessor.resolve_output_dtype(np.dtype(source_dtype), output_dtype)
+
+
+@pytest.mark.parametrize("chunks", [None, (16, 3)])
+def test_reads_convert_output_dtype(tmp_path, chunks):
+    filename = str(tmp_path / "coordinates.hdf5")
+    data = np.random.default_rng(0).random((300, 3))
+    with h5py.File(filename, "w") as handle:
+        handle.create_dataset("PartType0/Coordinates", data=data, chunks=chunks)
+    mask = np.array([[10, 20], [100, 300]])
+    mask_size = 210
+
+    masked_array = SWIFTProcessor.get_array_masked_from_ranges(
+        filename,
+        "PartType0/Coordinates",
+        mask,
+        mask_size,
+        output_dtype=np.dtype(np.float32),
+    )
+    unmasked_array = SWIFTProcessor.get_array_unmasked(
+        filename,
+        "PartType0/Coordinates",
+        1,
+        output_dtype=np.dtype(np.float32),
+    )
+
+    assert masked_array.dtype == unmasked_array.dtype == np.float32
+    np.testing.assert_array_equal(
+        masked_array,
+        np.concatenate([data[10:20], data[100:300]]).astype(np.float32),
+    )
+    np.testing.assert_array_equal(unmasked_array, data[:, 1].astype(np.float32))
+
+
+def test_get_array_masked_from_ranges_with_overlapping_ranges(template_swift_data_path, mocker):
+    settings = get_settings().model_copy(update={"read_merge_gap_bytes": 80})
+    mocker.patch("api.processing.data_processing.get_settings", return_value=settings)
+    mocker.patch("api.processing.data_processing.DEFAULT_BLOCK_SIZE_BYTES", 128)
+    mask = np.array(
+        [[75, 92], [111, 118], [137, 146], [11, 32], [144, 155], [82, 97], [55, 65], [104, 126]],
+    )
+    with h5py.File(template_swift_data_path, "r") as handle:
+        particle_ids = handle["PartType0/ParticleIDs"][:]
+    expected_array = np.concatenate([particle_ids[start:stop] for start, stop in mask])
+
+    output_array = SWIFTProcessor.get_array_masked_from_ranges(
+        str(template_swift_data_path),
+        "PartType0/ParticleIDs",
+        mask,
+        len(expected_array),
+    )
+
+    np.testing.assert_array_equal(output_array, expected_array)
@@ -0,0 +1,64 @@
+import asyncio
+import contextvars
+import threading
+
+from api.processing.executors import BoundedExecutor
+
+request_id = contextvars.ContextVar("request_id", default=None)
+
+
+def test_bounded_executor_runs_function():
+    executor = BoundedExecutor("test", max_workers=1)
+
+    result = asyncio.run(executor.run(sum, [1, 2, 3], start=4))
+
+    expected_result = 10
+    assert result == expected_result
+    assert executor.stats() == {"max_workers": 1, "queued": 0, "active": 0}
+    executor.shutdown()
+
+
+def test_bounded_executor_copies_context():
+    executor = BoundedExecutor("test", max_workers=1)
+
+    async def run_with_context() -> str | None:
+        request_id.set("abc")
+        return await executor.run(request_id.get)
+
+    assert asyncio.run(run_with_context()) == "abc"
+    executor.shutdown()
+
+
+def test_bounded_executor_reports_queued_and_active_tasks():
+    executor = BoundedExecutor("test", max_workers=1)
+    started = threading.Event()
+    release = threading.Event()
+
+    def blocking_task() -> None:
+        started.set()
+        release.wait()
+
+    async def run_tasks() -> dict[str, int]:
+        tasks = [asyncio.ensure_future(executor.run(blocking_task)) for _ in range(3)]
+        await asyncio.to_thread(started.wait)
+        stats = executor.stats()
+        release.set()
+        await asyncio.gather(*tasks)
+        return stats
+
+    expected_queued = 2
+    stats = asyncio.run(run_tasks())
+    assert stats["active"] == 1
+    assert stats["queued"] == expected_queued
+    assert executor.stats() == {"max_workers": 1, "queued": 0, "active": 0}
+    executor.shutdown()
+
+
+def test_bounded_executor_iterates_blocking_iterator():
+    executor = BoundedExecutor("test", max_workers=1)
+
+    async def collect() -> list[int]:
+        return [item async for item in executor.iterate(iter(range(3)))]
+
+    assert asyncio.run(collect()) == [0, 1, 2]
+    executor.shutdown()
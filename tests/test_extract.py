@@ -0,0 +1,76 @@
+import h5py
+import numpy as np
+import pytest
+import swiftsimio as sw
+from api.processing.data_processing import SWIFTProcessorError
+from api.processing.extract import count_rows_before, extract_snapshot, subset_cells
+
+
+def test_count_rows_before():
+    ranges = np.array([[2, 5], [8, 10]])
+    np.testing.assert_array_equal(
+        count_rows_before(ranges, np.array([0, 2, 4, 6, 9, 12])),
+        [0, 0, 2, 3, 4, 5],
+    )
+
+
+def test_subset_cells():
+    counts = np.array([4, 0, 6], dtype=np.int32)
+    offsets = np.array([0, 4, 4], dtype=np.int64)
+
+    new_counts, new_offsets = subset_cells(counts, offsets, np.array([[1, 3], [5, 8]]))
+
+    np.testing.assert_array_equal(new_counts, [2, 0, 3])
+    np.testing.assert_array_equal(new_offsets, [0, 2, 2])
+    assert new_counts.dtype == counts.dtype
+
+
+def test_extract_snapshot(template_swift_data_path, tmp_path):
+    output_file = tmp_path / "extract.hdf5"
+    ranges = np.array([[0, 100], [334, 500]])
+
+    sizes = extract_snapshot(
+        str(template_swift_data_path),
+        output_file,
+        {"PartType0": ranges, "PartType5": None},
+        ["Coordinates", "Masses"],
+    )
+    assert sizes == {"PartType0": 266, "PartType5": 15}
+
+    with h5py.File(template_swift_data_path) as source, h5py.File(output_file) as output:
+        assert list(output["PartType0"]) == ["Coordinates", "Masses"]
+        assert list(output["PartType5"]) == ["Coordinates"]
+        np.testing.assert_array_equal(
+            output["PartType0/Masses"][:],
+            np.concatenate([source["PartType0/Masses"][start:stop] for start, stop in ranges]),
+        )
+        np.testing.assert_array_equal(
+            output["Header"].attrs["NumPart_ThisFile"],
+            [266, 0, 0, 0, 0, 15],
+        )
+        assert output["Cells/Counts/PartType0"][:].sum() == sizes["PartType0"]
+        assert output["Cells/Counts/PartType1"][:].sum() == 0
+        assert output["GasParticles"] == output["PartType0"]
+        assert "DMParticles" not in output
+
+    data = sw.load(str(output_file))
+    assert data.gas.masses.shape == (sizes["PartType0"],)
+
+
+def test_extract_snapshot_fails_with_missing_fields(template_swift_data_path, tmp_path):
+    with pytest.raises(SWIFTProcessorError, match="NotAField"):
+        extract_snapshot(
+            str(template_swift_data_path),
+            tmp_path / "extract.hdf5",
+            {"PartType0": None},
+            ["Masses", "NotAField"],
+        )
+
+
+def test_extract_snapshot_fails_with_out_of_range_mask(template_swift_data_path, tmp_path):
+    with pytest.raises(SWIFTProcessorError, match="outside"):
+        extract_snapshot(
+            str(template_swift_data_path),
+            tmp_path / "extract.hdf5",
+            {"PartType5": np.array([[0, 100]])},
+        )
@@ -0,0 +1,96 @@
+from pathlib import Path
+
+import h5py
+import numpy as np
+import pytest
+from api.processing.file_pool import HDF5FilePool, get_file_fingerprint
+
+
+@pytest.fixture()
+def temp_hdf5_files(tmp_path: Path) -> list[Path]:
+    filenames = [tmp_path / f"snapshot_{index}.hdf5" for index in range(3)]
+    for index, filename in enumerate(filenames):
+        with h5py.File(filename, "w") as handle:
+            handle.create_dataset("PartType0/Masses", data=np.full(10, index))
+    return filenames
+
+
+def test_get_file_fingerprint(template_swift_data_path: Path):
+    fingerprint = get_file_fingerprint(template_swift_data_path)
+    file_status = template_swift_data_path.stat()
+
+    assert fingerprint.path == str(template_swift_data_path.resolve())
+    assert fingerprint.size == file_status.st_size
+    assert fingerprint.mtime_ns == file_status.st_mtime_ns
+    assert fingerprint.inode == file_status.st_ino
+
+
+def test_file_pool_reuses_open_handle(temp_hdf5_files):
+    pool = HDF5FilePool(max_open_files=2)
+
+    with pool.open(temp_hdf5_files[0]) as first_handle:
+        first_id = first_handle.id
+    with pool.open(str(temp_hdf5_files[0])) as second_handle:
+        assert second_handle.id == first_id
+        assert second_handle["PartType0/Masses"][0] == 0
+
+    assert pool.stats() == {"open_files": 1, "hits": 1, "misses": 1, "evictions": 0}
+
+
+def test_file_pool_evicts_least_recently_used(temp_hdf5_files):
+    pool = HDF5FilePool(max_open_files=2)
+
+    handles = []
+    for filename in temp_hdf5_files:
+        with pool.open(filename) as handle:
+            handles.append(handle)
+
+    expected_open_files = 2
+    assert pool.stats()["open_files"] == expected_open_files
+    assert pool.stats()["evictions"] == 1
+    assert not handles[0].id.valid
+    assert handles[-1].id.valid
+
+
+def test_file_pool_keeps_handle_in_use_until_released(temp_hdf5_files):
+    pool = HDF5FilePool(max_open_files=1)
+
+    with pool.open(temp_hdf5_files[0]) as handle_in_use:
+        with pool.open(temp_hdf5_files[1]):
+            pass
+        assert handle_in_use.id.valid
+        assert handle_in_use["PartType0/Masses"][0] == 0
+
+    assert not handle_in_use.id.valid
+
+
+def test_file_pool_reopens_changed_file(temp_hdf5_files):
+    pool = HDF5FilePool()
+    filename = temp_hdf5_files[0]
+
+    with pool.open(filename) as handle:
+        original_handle = handle
+
+    expected_mass = 42
+    expected_misses = 2
+    replacement_filename = filename.with_suffix(".new")
+    with h5py.File(replacement_filename, "w") as handle:
+        handle.create_dataset("PartType0/Masses", data=np.full(10, expected_mass))
+    replacement_filename.replace(filename)
+
+    with pool.open(filename) as handle:
+        assert handle["PartType0/Masses"][0] == expected_mass
+
+    assert not original_handle.id.valid
+    assert pool.stats()["misses"] == expected_misses
+
+
+def test_file_pool_closes_idle_handles(temp_hdf5_files):
+    pool = HDF5FilePool(idle_timeout_seconds=0)
+
+    with pool.open(temp_hdf5_files[0]) as handle:
+        pass
+    pool.close_idle()
+
+    assert not handle.id.valid
+    assert pool.stats()["open_files"] == 0
@@ -0,0 +1,139 @@
+import numpy as np
+import pytest
+from api.processing.data_processing import SWIFTProcessor, SWIFTProcessorError
+from api.processing.histograms import (
+    HistogramAxis,
+    calculate_binned_medians,
+    create_bin_edges,
+    get_bin_indices,
+    histogram_fields,
+)
+
+
+def test_create_bin_edges():
+    np.testing.assert_allclose(
+        create_bin_edges(HistogramAxis(lower=1, upper=100, bins=2, scale="log")),
+        [1, 10, 100],
+    )
+    np.testing.assert_allclose(
+        create_bin_edges(HistogramAxis(lower=0, upper=1, bins=4)),
+        [0, 0.25, 0.5, 0.75, 1],
+    )
+    np.testing.assert_allclose(create_bin_edges(HistogramAxis(edges=[0, 2, 5])), [0, 2, 5])
+
+
+@pytest.mark.parametrize(
+    "axis",
+    [
+        HistogramAxis(lower=0, upper=10, scale="log"),
+        HistogramAxis(edges=[0, 2, 1]),
+        HistogramAxis(lower=0),
+    ],
+)
+def test_create_bin_edges_fails_with_invalid_bins(axis):
+    with pytest.raises(SWIFTProcessorError):
+        create_bin_edges(axis)
+
+
+def test_get_bin_indices_matches_numpy():
+    values = np.array([-1, 0, 0.5, 1, 2.5, 3, 4, np.nan])
+    edges = np.array([0, 1, 2, 3])
+
+    indices = get_bin_indices(values, edges)
+
+    np.testing.assert_array_equal(indices, [-1, 0, 0, 1, 2, 2, -1, -1])
+    np.testing.assert_array_equal(
+        np.bincount(indices[indices >= 0], minlength=3),
+        np.histogram(values[np.isfinite(values)], edges)[0],
+    )
+
+
+def test_calculate_binned_medians():
+    bin_indices = np.array([0, 2, 0, 2, 0, 2, 2])
+    values = np.array([3.0, 1.0, 1.0, 4.0, 2.0, 2.0, 3.0])
+    counts = np.bincount(bin_indices, minlength=3)
+
+    medians = calculate_binned_medians(bin_indices, values, counts)
+
+    np.testing.assert_array_equal(medians, [2.0, np.nan, 2.5])
+
+
+def test_histogram_fields_2d_matches_numpy(template_swift_data_path):
+    filename = str(template_swift_data_path)
+    fields = ["PartType0/Densities", "PartType0/Temperatures"]
+    axes = [
+        HistogramAxis(lower=0.01, upper=1e5, bins=6, scale="log"),
+        HistogramAxis(lower=1e2, upper=1e9, bins=4, scale="log"),
+    ]
+    densities = SWIFTProcessor.get_array_unmasked(filename, fields[0])
+    temperatures = SWIFTProcessor.get_array_unmasked(filename, fields[1])
+    masses = SWIFTProcessor.get_array_unmasked(filename, "PartType0/Masses")
+
+    histogram = histogram_fields(
+        filename,
+        fields,
+        axes,
+        statistic="sum",
+        weights="PartType0/Masses",
+        block_size_bytes=4096,
+    )
+
+    expected_counts, _, _ = np.histogram2d(densities, temperatures, bins=histogram["edges"])
+    expected_sums, _, _ = np.histogram2d(
+        densities,
+        temperatures,
+        bins=histogram["edges"],
+        weights=masses.astype(np.float64),
+    )
+    np.testing.assert_array_equal(histogram["counts"], expected_counts)
+    np.testing.assert_allclose(histogram["values"], expected_sums)
+    assert set(histogram["units"]) == {*fields, "PartType0/Masses"}
+
+
+def test_histogram_fields_masked_median(template_swift_data_path):
+    filename = str(template_swift_data_path)
+    mask_json = "[[0, 100], [200, 334]]"
+    mask_size = 234
+    edges = [0, 50, 100, 200]
+    coordinates = SWIFTProcessor.get_array_masked(
+        filename,
+        "PartType0/Coordinates",
+        mask_json,
+        None,
+        mask_size,
+        0,
+    )
+    densities = SWIFTProcessor.get_array_masked(
+        filename,
+        "PartType0/Densities",
+        mask_json,
+        None,
+        mask_size,
+    )
+
+    histogram = histogram_fields(
+        filename,
+        ["PartType0/Coordinates"],
+        [HistogramAxis(edges=edges)],
+        statistic="median",
+        weights="PartType0/Densities",
+        mask=SWIFTProcessor.load_ndarray_from_json(mask_json, None),
+        columns=[0],
+    )
+
+    for bin_index, median in enumerate(histogram["values"]):
+        in_bin = (coordinates >= edges[bin_index]) & (coordinates < edges[bin_index + 1])
+        if in_bin.any():
+            assert median == pytest.approx(np.median(densities[in_bin]))
+        else:
+            assert median is None
+
+
+def test_histogram_fields_fails_without_weights(template_swift_data_path):
+    with pytest.raises(SWIFTProcessorError):
+        histogram_fields(
+            str(template_swift_data_path),
+            ["PartType0/Densities"],
+            [HistogramAxis(lower=0, upper=1)],
+            statistic="mean",
+        )
@@ -0,0 +1,184 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+from api.processing.jobs import Job, JobError, JobManager, JobResult
+
+
+@pytest.fixture()
+def job_manager(tmp_path):
+    manager = JobManager(tmp_path, max_spool_bytes=100, ttl_seconds=60, max_workers=1)
+    yield manager
+    manager.shutdown()
+
+
+def wait_for_job(manager, job_id, owner="user"):
+    for _ in range(200):
+        job = manager.get(job_id, owner)
+        if job.status not in ("queued", "running"):
+            return job
+        time.sleep(0.01)
+    pytest.fail(f"Job {job_id} did not finish.")
+
+
+def write_result(body):
+    def run(context):
+        context.report_progress(0.5)
+        context.write([body])
+        return JobResult("application/octet-stream", {"x-test": "value"})
+
+    return run
+
+
+def test_job_manager_runs_job(job_manager):
+    job = job_manager.submit("user", "test", write_result(b"result"))
+    assert job.status == "queued"
+
+    job = wait_for_job(job_manager, job.id)
+    assert job.status == "succeeded"
+    assert job.progress == 1.0
+    assert job.bytes_written == len(b"result")
+    assert job.headers == {"x-test": "value"}
+    assert job_manager.get_result_path(job.id).read_bytes() == b"result"
+
+
+def test_job_manager_hides_jobs_of_other_users(job_manager):
+    job = job_manager.submit("user", "test", write_result(b"result"))
+    assert job_manager.get(job.id, "other_user") is None
+
+
+def test_job_manager_records_failures(job_manager):
+    def fail(_):
+        message = "Unable to read."
+        raise JobError(message)
+
+    job = wait_for_job(job_manager, job_manager.submit("user", "test", fail).id)
+    assert job.status == "failed"
+    assert job.error == "Unable to read."
+
+
+def test_job_manager_fails_results_larger_than_spool(job_manager):
+    job = job_manager.submit("user", "test", write_result(b"x" * 101))
+
+    job = wait_for_job(job_manager, job.id)
+    assert job.status == "failed"
+    assert not job_manager.get_result_path(job.id).exists()
+
+
+def test_job_manager_stops_writing_once_result_outgrows_spool(job_manager):
+    chunks_read = 0
+
+    def chunks():
+        nonlocal chunks_read
+        for _ in range(10):
+            chunks_read += 1
+            yield b"x" * 30
+
+    def run(context):
+        context.write(chunks())
+        return JobResult("application/octet-stream", {})
+
+    job = wait_for_job(job_manager, job_manager.submit("user", "test", run).id)
+    assert job.status == "failed"
+    expected_chunks = 4
+    assert "larger than" in job.error
+    assert chunks_read == expected_chunks
+    assert not job_manager.get_result_path(job.id).exists()
+
+
+def test_job_manager_counts_running_jobs_in_spool(tmp_path):
+    manager = JobManager(tmp_path, max_spool_bytes=100, ttl_seconds=60, max_workers=2)
+    written, release = threading.Event(), threading.Event()
+
+    def run_first(context):
+        context.write([b"x" * 60])
+        written.set()
+        release.wait()
+        return JobResult("application/octet-stream", {})
+
+    try:
+        first = manager.submit("user", "test", run_first)
+        written.wait()
+        second = wait_for_job(manager, manager.submit("user", "test", write_result(b"y" * 60)).id)
+        release.set()
+
+        assert second.status == "failed"
+        assert wait_for_job(manager, first.id).status == "succeeded"
+    finally:
+        release.set()
+        manager.shutdown()
+
+
+def test_job_manager_expires_oldest_results_over_limit(job_manager):
+    first = job_manager.submit("user", "test", write_result(b"x" * 60))
+    wait_for_job(job_manager, first.id)
+    second = job_manager.submit("user", "test", write_result(b"y" * 60))
+    wait_for_job(job_manager, second.id)
+
+    assert job_manager.get(first.id, "user").status == "expired"
+    assert not job_manager.get_result_path(first.id).exists()
+    assert job_manager.get(second.id, "user").status == "succeeded"
+
+
+def test_job_manager_expires_results_after_ttl(job_manager):
+    job = wait_for_job(job_manager, job_manager.submit("user", "test", write_result(b"x")).id)
+
+    job_manager.ttl_seconds = 0
+    assert job_manager.get(job.id, "user").status == "expired"
+    assert not job_manager.get_result_path(job.id).exists()
+
+
+def test_job_manager_reports_running_jobs(job_manager):
+    started, release = threading.Event(), threading.Event()
+
+    def run(context):
+        started.set()
+        release.wait()
+        return write_result(b"result")(context)
+
+    job = job_manager.submit("user", "test", run)
+    started.wait()
+    assert job_manager.get(job.id, "user").status == "running"
+    assert job_manager.stats()["running"] == 1
+
+    release.set()
+    assert wait_for_job(job_manager, job.id).status == "succeeded"
+
+
+def test_job_manager_keeps_long_running_jobs(job_manager):
+    started, release = threading.Event(), threading.Event()
+
+    def run(context):
+        started.set()
+        release.wait()
+        return write_result(b"result")(context)
+
+    job = job_manager.submit("user", "test", run)
+    started.wait()
+    job_manager.ttl_seconds = 0
+    assert job_manager.get(job.id, "user").status == "running"
+
+    job_manager.ttl_seconds = 60
+    release.set()
+    assert wait_for_job(job_manager, job.id).status == "succeeded"
+
+
+def test_job_manager_fails_jobs_of_exited_processes(job_manager):
+    process = subprocess.run(
+        [sys.executable, "-c", "import os; print(os.getpid())"],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    exited = Job(id="exited", owner="user", kind="test", status="running", pid=int(process.stdout))
+    replaced = Job(id="replaced", owner="user", kind="test", pid=os.getpid(), instance="old")
+    job_manager.store.add(exited)
+    job_manager.store.add(replaced)
+
+    for job_id in ("exited", "replaced"):
+        job = job_manager.get(job_id, "user")
+        assert job.status == "failed"
+        assert job.error == "The job was interrupted."
@@ -2,8 +2,17 @@ from pathlib import Path
 
 import cloudpickle
 import numpy as np
+import pytest
 import swiftsimio as sw
-from api.processing.masks import return_mask, return_mask_boxsize
+from api.processing.data_processing import SWIFTProcessorError
+from api.processing.masks import (
+    create_region_mask,
+    merge_ranges,
+    return_mask,
+    return_mask_boxsize,
+    sample_ranges,
+    sample_rows,
+)
 from unyt import Unit
 
 
@@ -28,3 +37,94 @@ def test_return_mask_success(template_swift_data_path: Path):
     test_mask = cloudpickle.loads(test_mask_bytes)
 
     assert canonical_mask.metadata.named_columns == test_mask.metadata.named_columns
+
+
+def test_merge_ranges():
+    ranges = np.array([[5, 6], [0, 3], [3, 4], [4, 4], [10, 12], [11, 13]])
+    expected_ranges = np.array([[0, 4], [5, 6], [10, 13]])
+
+    np.testing.assert_array_equal(merge_ranges(ranges), expected_ranges)
+
+
+def test_sample_ranges_is_deterministic_and_nested():
+    total_rows = 100_000
+    fraction = 0.01
+    full_ranges, full_size = sample_ranges(np.array([[0, total_rows]]), fraction, seed=7)
+    blocked_ranges, _ = sample_ranges(np.array([[0, total_rows]]), fraction, seed=7, block_rows=999)
+    other_ranges, _ = sample_ranges(np.array([[0, total_rows]]), fraction, seed=8)
+
+    np.testing.assert_array_equal(full_ranges, blocked_ranges)
+    assert not np.array_equal(full_ranges, other_ranges)
+    assert full_size == pytest.approx(fraction * total_rows, rel=0.2)
+
+    subset = np.array([[1000, 5000], [20_000, 60_000]])
+    subset_ranges, subset_size = sample_ranges(subset, fraction, seed=7)
+    full_rows = np.concatenate([np.arange(start, stop) for start, stop in full_ranges])
+    subset_rows = np.concatenate([np.arange(start, stop) for start, stop in subset_ranges])
+    in_subset = np.any(
+        (full_rows[:, None] >= subset[:, 0]) & (full_rows[:, None] < subset[:, 1]),
+        axis=1,
+    )
+
+    np.testing.assert_array_equal(subset_rows, full_rows[in_subset])
+    assert subset_size == len(subset_rows)
+
+
+def test_sample_ranges_keeps_range_order():
+    ranges = np.array([[5000, 9000], [0, 3000], [2000, 6000], [7000, 7000]])
+    fraction = 0.1
+    rows = np.concatenate([np.arange(start, stop) for start, stop in ranges])
+
+    sampled_ranges, sample_size = sample_ranges(ranges, fraction, seed=3, block_rows=1000)
+    sampled_rows = np.concatenate([np.arange(start, stop) for start, stop in sampled_ranges])
+
+    np.testing.assert_array_equal(sampled_rows, rows[sample_rows(rows, fraction, seed=3)])
+    assert sample_size == len(sampled_rows)
+
+
+def test_sample_ranges_without_rows():
+    sampled_ranges, sample_size = sample_ranges(np.zeros((0, 2), dtype=np.int64), 0.5, seed=3)
+
+    assert sampled_ranges.shape == (0, 2)
+    assert sample_size == 0
+
+
+def test_create_region_mask(template_swift_data_path: Path):
+    region = [(0, 20), (0, 20), (0, 20)]
+    expected_size = 2963
+
+    mask, mask_size, group = create_region_mask(template_swift_data_path, "gas", region)
+
+    canonical_mask = sw.mask(str(template_swift_data_path))
+    canonical_mask.constrain_spatial([Unit("Mpc") * np.array(bounds) for bounds in region])
+    assert mask_size == expected_size
+    assert mask_size == canonical_mask.gas_size
+    assert np.diff(mask).sum() == mask_size
+    assert group == "PartType0"
+
+
+def test_create_region_mask_accepts_group_name_and_units(template_swift_data_path: Path):
+    mask_mpc, _, _ = create_region_mask(template_swift_data_path, "gas", [(0, 20), None, None])
+    mask_kpc, _, group = create_region_mask(
+        template_swift_data_path,
+        "PartType0",
+        [(0, 20000), None, None],
+        "kpc",
+    )
+
+    np.testing.assert_array_equal(mask_mpc, mask_kpc)
+    assert group == "PartType0"
+
+
+def test_create_region_mask_fails_with_invalid_units(template_swift_data_path: Path):
+    with pytest.raises(SWIFTProcessorError) as error:
+        create_region_mask(template_swift_data_path, "gas", [(0, 20), None, None], "kg")
+
+    assert "Invalid region units" in str(error.value)
+
+
+def test_create_region_mask_fails_with_invalid_particle_type(template_swift_data_path: Path):
+    with pytest.raises(SWIFTProcessorError) as error:
+        create_region_mask(template_swift_data_path, "stars", [(0, 20), None, None])
+
+    assert "Particle type stars not found" in str(error.value)
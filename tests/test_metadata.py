@@ -6,6 +6,8 @@ from pickle import UnpicklingError
 import cloudpickle
 import numpy as np
 import pytest
+from api.processing import metadata
+from api.processing.caching import ByteLRUCache
 from api.processing.metadata import (
     RemoteSWIFTMetadataError,
     SWIFTMetadataEncoder,
@@ -134,22 +136,8 @@ def test_create_swift_metadata_dict_success(template_swift_data_path: Path):
 
 def test_create_swift_metadata_success(template_swift_data_path: Path):
     test_filename = str(template_swift_data_path.resolve())
-    test_swift_unit_dict = {
-        "units": {
-            "mass": "1e+10 kg",
-        },
-        "mass": "1.e+10 Msun",
-        "length": "1. Mpc",
-        "time": "977.79 Gyr",
-        "current": "1. statA",
-        "temperature": "1. K",
-    }
-
-    test_unyt_quantity_dict = create_unyt_quantities(test_swift_unit_dict)
-
-    test_swift_units = RemoteSWIFTUnits(test_unyt_quantity_dict)
 
-    metadata_bytes = create_swift_metadata(test_filename, test_swift_units)
+    metadata_bytes = create_swift_metadata(test_filename)
     assert isinstance(metadata_bytes, bytes)
 
     metadata = cloudpickle.loads(metadata_bytes)
@@ -161,25 +149,30 @@ def test_create_swift_metadata_failure_unpickle_truncated(
     template_swift_data_path: Path,
 ):
     test_filename = str(template_swift_data_path.resolve())
-    test_swift_unit_dict = {
-        "units": {
-            "mass": "1e+10 kg",
-        },
-        "mass": "1.e+10 Msun",
-        "length": "1. Mpc",
-        "time": "977.79 Gyr",
-        "current": "1. statA",
-        "temperature": "1. K",
-    }
 
-    test_unyt_quantity_dict = create_unyt_quantities(test_swift_unit_dict)
-
-    test_swift_units = RemoteSWIFTUnits(test_unyt_quantity_dict)
-
-    metadata_bytes = create_swift_metadata(test_filename, test_swift_units)
+    metadata_bytes = create_swift_metadata(test_filename)
     assert isinstance(metadata_bytes, bytes)
 
     with pytest.raises(UnpicklingError) as error:
         cloudpickle.loads(metadata_bytes[:-1])
 
     assert "data was truncated" in error.value.__str__()
+
+
+def test_create_swift_metadata_cache_hit(mocker, template_swift_data_path: Path):
+    mocker.patch(
+        "api.processing.metadata.get_metadata_cache",
+        return_value=ByteLRUCache(max_bytes=1024**3),
+    )
+    spy_serialise = mocker.spy(metadata, "serialise_swift_metadata")
+
+    first_metadata_bytes = create_swift_metadata(template_swift_data_path)
+    second_metadata_bytes = create_swift_metadata(str(template_swift_data_path))
+
+    assert first_metadata_bytes == second_metadata_bytes
+    spy_serialise.assert_called_once_with(str(template_swift_data_path.resolve()))
+
+    cache_stats = metadata.get_metadata_cache().stats()
+    assert cache_stats["hits"] == 1
+    assert cache_stats["misses"] == 1
+    assert cache_stats["bytes"] == len(first_metadata_bytes)
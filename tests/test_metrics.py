@@ -0,0 +1,149 @@
+import asyncio
+
+import pytest
+from api.main import app
+from api.processing.caching import ByteLRUCache
+from api.processing.executors import BoundedExecutor
+from api.processing.file_pool import HDF5FilePool
+from api.routers.metrics import (
+    MULTIPROCESS_DIRECTORY_VARIABLE,
+    generate_metrics,
+    get_route_template,
+)
+from fastapi import status
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+client = TestClient(app)
+
+
+def get_sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_metrics_report_request_latency_by_route():
+    labels = {"method": "GET", "route": "/ping", "status": "200"}
+    before = get_sample("swift_api_request_duration_seconds_count", **labels)
+
+    client.get("/ping")
+    response = client.get("/metrics")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/plain")
+    assert get_sample("swift_api_request_duration_seconds_count", **labels) == before + 1
+    assert "swift_api_response_size_bytes_bucket" in response.text
+    assert "swift_api_open_files" in response.text
+    assert 'swift_api_executor_tasks{executor="data",state="queued"}' in response.text
+
+
+def test_metrics_group_unknown_paths():
+    labels = {"method": "GET", "route": "unmatched", "status": "404"}
+    before = get_sample("swift_api_request_duration_seconds_count", **labels)
+
+    client.get("/not/a/route")
+
+    assert get_sample("swift_api_request_duration_seconds_count", **labels) == before + 1
+
+
+def test_metrics_count_response_and_hdf5_bytes(
+    template_swift_data_path,
+    mock_auth_client_success_jwt_decode,
+):
+    payload = {
+        "data_spec": {
+            "filename": str(template_swift_data_path),
+            "field": "PartType0/Masses",
+            "format": "npy",
+        },
+    }
+    labels = {"method": "POST", "route": "/swiftdata/unmasked_dataset"}
+    read_before = get_sample("swift_api_hdf5_read_bytes_total")
+    size_before = get_sample("swift_api_response_size_bytes_sum", **labels)
+
+    response = mock_auth_client_success_jwt_decode.post(
+        "/swiftdata/unmasked_dataset",
+        json=payload,
+        headers={"Accept-Encoding": "identity"},
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert get_sample("swift_api_hdf5_read_bytes_total") > read_before
+    assert get_sample("swift_api_response_size_bytes_sum", **labels) == size_before + len(
+        response.content,
+    )
+
+
+def test_get_route_template():
+    route = next(route for route in app.routes if getattr(route, "path", "").endswith("{job_id}"))
+
+    assert get_route_template({"route": route}) == "/swiftdata/jobs/{job_id}"
+    assert get_route_template({}) == "unmatched"
+
+
+def test_named_cache_records_lookups_and_size():
+    cache = ByteLRUCache(max_bytes=10, name="test_cache")
+    hits_before = get_sample("swift_api_cache_hits_total", cache="test_cache")
+    misses_before = get_sample("swift_api_cache_misses_total", cache="test_cache")
+
+    cache.get("a")
+    cache.put("a", b"12345")
+    cache.get("a")
+    cache.get("a")
+
+    expected_hits = 2
+    expected_bytes = 5
+    assert get_sample("swift_api_cache_hits_total", cache="test_cache") == (
+        hits_before + expected_hits
+    )
+    assert get_sample("swift_api_cache_misses_total", cache="test_cache") == misses_before + 1
+    assert get_sample("swift_api_cache_bytes", cache="test_cache") == expected_bytes
+
+    cache.clear()
+
+    assert get_sample("swift_api_cache_bytes", cache="test_cache") == 0
+
+
+def test_named_file_pool_records_lookups_and_open_files(template_swift_data_path):
+    pool = HDF5FilePool(name="test_pool")
+
+    with pool.open(template_swift_data_path):
+        assert get_sample("swift_api_open_files") == 1
+    with pool.open(template_swift_data_path):
+        pass
+
+    assert get_sample("swift_api_cache_hits_total", cache="test_pool") == 1
+    assert get_sample("swift_api_cache_misses_total", cache="test_pool") == 1
+
+    pool.close_all()
+
+    assert get_sample("swift_api_open_files") == 0
+
+
+def test_executor_records_running_tasks():
+    executor = BoundedExecutor("test_metrics", max_workers=1)
+    labels = {"executor": "test_metrics", "state": "active"}
+
+    def get_active_tasks() -> float:
+        return get_sample("swift_api_executor_tasks", **labels)
+
+    active_tasks = asyncio.run(executor.run(get_active_tasks))
+    executor.shutdown()
+
+    assert active_tasks == 1
+    assert get_sample("swift_api_executor_tasks", **labels) == 0
+
+
+def test_generate_metrics_multiprocess(monkeypatch, tmp_path):
+    monkeypatch.setenv(MULTIPROCESS_DIRECTORY_VARIABLE, str(tmp_path))
+
+    content = generate_metrics()
+
+    assert isinstance(content, bytes)
+    assert b"swift_api_request_duration_seconds" not in content
+
+
+@pytest.mark.parametrize("cache", ["metadata", "result", "units", "file_pool"])
+def test_metrics_report_caches(cache):
+    response = client.get("/metrics")
+
+    assert f'swift_api_cache_misses_total{{cache="{cache}"}}' in response.text
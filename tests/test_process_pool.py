@@ -0,0 +1,191 @@
+import io
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+from api.config import Settings
+from api.processing.data_processing import SWIFTProcessor, SWIFTProcessorError
+from api.processing.metrics import counting_hdf5_reads
+from api.processing.process_pool import (
+    SharedArray,
+    SWIFTProcessPool,
+    borrowing_shared_arrays,
+    get_array_reader,
+    load_shared_array,
+    share_array,
+)
+from api.processing.result_cache import get_result_cache
+from fastapi import status
+
+
+@pytest.fixture(scope="module")
+def process_pool():
+    pool = SWIFTProcessPool(max_workers=1)
+    yield pool
+    pool.shutdown()
+
+
+def test_share_array_round_trip_releases_shared_memory():
+    array = np.arange(12, dtype=">f4").reshape(4, 3)
+
+    shared_array = share_array(array)
+    output_array = load_shared_array(shared_array)
+
+    assert isinstance(shared_array, SharedArray)
+    np.testing.assert_array_equal(output_array, array)
+    assert output_array.dtype == array.dtype
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=shared_array.name)
+
+
+def test_borrowing_shared_arrays_uses_shared_memory_in_place():
+    array = np.arange(12, dtype=np.int64)
+
+    shared_array = share_array(array)
+    with borrowing_shared_arrays():
+        output_array = load_shared_array(shared_array)
+        np.testing.assert_array_equal(output_array, array)
+        assert not output_array.flags.owndata
+        body = output_array.tobytes()
+        del output_array
+
+    assert body == array.tobytes()
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=shared_array.name)
+
+
+def test_process_pool_serves_masked_array_from_shared_memory(
+    template_swift_data_path,
+    mock_auth_client_success_jwt_decode,
+    process_pool,
+    mocker,
+):
+    mocker.patch("api.routers.file_processing.get_array_reader", return_value=process_pool)
+    get_result_cache().clear()
+    payload = {
+        "data_spec": {
+            "filename": str(template_swift_data_path),
+            "field": "PartType0/Masses",
+            "mask_array_json": "[[0, 3], [10, 12]]",
+            "mask_size": 5,
+            "format": "npy",
+        },
+    }
+
+    response = mock_auth_client_success_jwt_decode.post(
+        "/swiftdata/masked_dataset",
+        json=payload,
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    expected_array = SWIFTProcessor.get_array_masked_from_ranges(
+        str(template_swift_data_path),
+        "PartType0/Masses",
+        np.array([[0, 3], [10, 12]]),
+        5,
+    )
+    np.testing.assert_array_equal(np.load(io.BytesIO(response.content)), expected_array)
+
+
+def test_share_array_returns_object_arrays_unchanged():
+    array = np.array(["a", None], dtype=object)
+
+    assert share_array(array) is array
+
+
+def test_process_pool_get_array_masked(template_swift_data_path, process_pool):
+    mask_json = "[[0, 3], [10, 12]]"
+    mask_size = 5
+
+    expected_array = SWIFTProcessor.get_array_masked(
+        str(template_swift_data_path),
+        "PartType0/Coordinates",
+        mask_json,
+        "int64",
+        mask_size,
+        1,
+    )
+    output_array = process_pool.get_array_masked(
+        str(template_swift_data_path),
+        "PartType0/Coordinates",
+        mask_json,
+        "int64",
+        mask_size,
+        1,
+    )
+
+    np.testing.assert_array_equal(output_array, expected_array)
+
+
+def test_process_pool_get_array_masked_from_ranges(template_swift_data_path, process_pool):
+    mask = np.array([[0, 3], [10, 12]])
+    mask_size = 5
+
+    expected_array = SWIFTProcessor.get_array_masked_from_ranges(
+        str(template_swift_data_path),
+        "PartType0/Masses",
+        mask,
+        mask_size,
+    )
+    output_array = process_pool.get_array_masked_from_ranges(
+        str(template_swift_data_path),
+        "PartType0/Masses",
+        mask,
+        mask_size,
+    )
+
+    np.testing.assert_array_equal(output_array, expected_array)
+
+
+def test_process_pool_records_bytes_read_by_worker(template_swift_data_path, process_pool):
+    mask = np.array([[0, 3], [10, 12]])
+
+    with counting_hdf5_reads() as read_count:
+        output_array = process_pool.get_array_masked_from_ranges(
+            str(template_swift_data_path),
+            "PartType0/Masses",
+            mask,
+            5,
+        )
+
+    assert read_count.nbytes >= output_array.nbytes
+
+
+def test_process_pool_get_array_masked_invalid_field(template_swift_data_path, process_pool):
+    with pytest.raises(SWIFTProcessorError):
+        process_pool.get_array_masked(
+            str(template_swift_data_path),
+            "PartType0/NotAField",
+            "[[0, 3]]",
+            "int64",
+            3,
+        )
+
+
+def test_process_pool_get_array_unmasked(template_swift_data_path, process_pool):
+    expected_array = SWIFTProcessor.get_array_unmasked(
+        str(template_swift_data_path),
+        "PartType0/Masses",
+    )
+    output_array = process_pool.get_array_unmasked(
+        str(template_swift_data_path),
+        "PartType0/Masses",
+    )
+
+    np.testing.assert_array_equal(output_array, expected_array)
+    assert process_pool.get_array_unmasked(str(template_swift_data_path), "NotAField") is None
+
+
+def test_get_array_reader_selects_backend(mocker):
+    mocker.patch(
+        "api.processing.process_pool.get_settings",
+        return_value=Settings(processing_backend="process"),
+    )
+    assert isinstance(get_array_reader(), SWIFTProcessPool)
+
+    mocker.patch(
+        "api.processing.process_pool.get_settings",
+        return_value=Settings(processing_backend="thread"),
+    )
+    assert get_array_reader() is SWIFTProcessor
+
@@ -0,0 +1,140 @@
+import pstats
+import threading
+
+import pytest
+from api.config import Settings
+from api.processing.result_cache import get_result_cache
+from api.profiling import RequestProfile
+from api.routers.profiling import PROFILE_HEADER, REQUEST_ID_HEADER, get_profiling_user
+from fastapi import status
+from starlette.datastructures import Headers
+
+
+@pytest.fixture()
+def profile_settings(tmp_path, mocker):
+    settings = Settings(
+        jwt_secret_key="a_test_key",  # noqa: S106
+        profile_directory=str(tmp_path),
+        profile_users=["test_user"],
+    )
+    mocker.patch("api.routers.profiling.get_settings", return_value=settings)
+    return settings
+
+
+def profiled_function() -> int:
+    return sum(range(10))
+
+
+def test_request_profile_saves_merged_profiles(tmp_path):
+    profile = RequestProfile("abc123")
+
+    assert profile.run(profiled_function) == sum(range(10))
+    profile.run(profiled_function)
+    profile_file = profile.save(tmp_path)
+
+    assert profile_file == tmp_path / "abc123.prof"
+    stats = pstats.Stats(str(profile_file)).stats
+    expected_calls = 2
+    assert any(
+        name == "profiled_function" and calls == expected_calls
+        for (_, _, name), (calls, *_) in stats.items()
+    )
+
+
+def test_request_profile_runs_one_task_at_a_time(tmp_path):
+    profile = RequestProfile("abc123")
+    other_profile = RequestProfile("def456")
+    started, finished = threading.Event(), threading.Event()
+
+    def profiled_wait() -> None:
+        started.set()
+        finished.wait()
+
+    thread = threading.Thread(target=profile.run, args=(profiled_wait,))
+    thread.start()
+    started.wait()
+    try:
+        assert other_profile.run(profiled_function) == sum(range(10))
+    finally:
+        finished.set()
+        thread.join()
+
+    assert other_profile.save(tmp_path) is None
+    assert profile.save(tmp_path) == tmp_path / "abc123.prof"
+
+
+def test_request_profile_skips_empty_profile(tmp_path):
+    assert RequestProfile("empty").save(tmp_path) is None
+    assert not list(tmp_path.iterdir())
+
+
+@pytest.mark.parametrize(
+    ("headers", "user"),
+    [
+        ({}, None),
+        ({PROFILE_HEADER: "0", "Authorization": "Bearer token"}, None),
+        ({PROFILE_HEADER: "1"}, None),
+        ({PROFILE_HEADER: "1", "Authorization": "Bearer token"}, "test_user"),
+    ],
+)
+def test_get_profiling_user(profile_settings, mocker, headers, user):
+    mocker.patch("api.routers.auth.decode_jwt", return_value="test_user")
+
+    assert get_profiling_user(Headers(headers), profile_settings) == user
+
+
+def test_get_profiling_user_rejects_other_users(profile_settings, mocker):
+    mocker.patch("api.routers.auth.decode_jwt", return_value="another_user")
+    headers = Headers({PROFILE_HEADER: "1", "Authorization": "Bearer token"})
+
+    assert get_profiling_user(headers, profile_settings) is None
+
+
+def test_get_profiling_user_requires_directory(profile_settings, mocker):
+    mocker.patch("api.routers.auth.decode_jwt", return_value="test_user")
+    profile_settings.profile_directory = None
+    headers = Headers({PROFILE_HEADER: "1", "Authorization": "Bearer token"})
+
+    assert get_profiling_user(headers, profile_settings) is None
+
+
+def test_profiled_request_saves_profile(
+    template_swift_data_path,
+    mock_auth_client_success_jwt_decode,
+    profile_settings,
+    tmp_path,
+):
+    payload = {
+        "data_spec": {
+            "filename": str(template_swift_data_path),
+            "field": "PartType0/Densities",
+            "format": "npy",
+        },
+    }
+    get_result_cache().clear()
+
+    response = mock_auth_client_success_jwt_decode.post(
+        "/swiftdata/unmasked_dataset",
+        json=payload,
+        headers={PROFILE_HEADER: "1"},
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    profile_file = tmp_path / f"{response.headers[REQUEST_ID_HEADER]}.prof"
+    functions = {name for _, _, name in pstats.Stats(str(profile_file)).stats}
+    assert "get_array_unmasked" in functions
+
+
+def test_unprofiled_request_has_no_request_id(
+    template_swift_data_path,
+    mock_auth_client_success_jwt_decode,
+    profile_settings,
+    tmp_path,
+):
+    payload = {"data_spec": {"filename": str(template_swift_data_path)}}
+
+    response = mock_auth_client_success_jwt_decode.post("/swiftdata/metadata", json=payload)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert REQUEST_ID_HEADER not in response.headers
+    assert not list(tmp_path.iterdir())
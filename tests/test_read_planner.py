@@ -0,0 +1,135 @@
+import h5py
+import numpy as np
+import pytest
+from api.processing.read_planner import (
+    execute_read_plan,
+    explain_read_plan,
+    get_range_indices,
+    plan_reads,
+)
+
+TOTAL_ROWS = 1000
+CHUNK_ROWS = 64
+
+
+@pytest.fixture()
+def chunked_dataset(tmp_path):
+    data = np.arange(TOTAL_ROWS * 3, dtype=np.float64).reshape(TOTAL_ROWS, 3)
+    with h5py.File(tmp_path / "chunked.hdf5", "w") as handle:
+        handle.create_dataset(
+            "PartType0/Coordinates",
+            data=data,
+            chunks=(CHUNK_ROWS, 3),
+            compression="gzip",
+        )
+    with h5py.File(tmp_path / "chunked.hdf5", "r") as handle:
+        yield handle["PartType0/Coordinates"]
+
+
+def test_get_range_indices():
+    np.testing.assert_array_equal(
+        get_range_indices(np.array([5, 0, 10]), np.array([2, 1, 3])),
+        [5, 6, 0, 10, 11, 12],
+    )
+
+
+def test_plan_reads_reads_each_chunk_once():
+    ranges = np.array([[900, 901], [10, 20], [30, 40], [5, 6], [300, 310], [7, 7]])
+
+    plan = plan_reads(ranges, TOTAL_ROWS, CHUNK_ROWS, gap_rows=0, max_read_rows=TOTAL_ROWS)
+
+    np.testing.assert_array_equal(plan.reads, [[0, 64], [256, 320], [896, 960]])
+    np.testing.assert_array_equal(plan.members, [0, 3, 4, 5])
+    assert plan.size == np.sum(np.diff(ranges))
+
+
+def test_plan_reads_merges_within_gap_and_read_limit():
+    ranges = np.array([[0, 10], [15, 20], [40, 50], [52, 100]])
+
+    plan = plan_reads(ranges, TOTAL_ROWS, None, gap_rows=5, max_read_rows=60)
+
+    np.testing.assert_array_equal(plan.reads, [[0, 20], [40, 100]])
+
+
+def test_plan_reads_never_splits_a_chunk():
+    ranges = np.array([[0, 10], [20, 30]])
+
+    plan = plan_reads(ranges, TOTAL_ROWS, CHUNK_ROWS, gap_rows=0, max_read_rows=1)
+
+    np.testing.assert_array_equal(plan.reads, [[0, 64]])
+
+
+def test_plan_reads_splits_many_ranges_at_read_limit():
+    starts = np.arange(0, 200_000, 2)
+    ranges = np.column_stack((starts, starts + 1))
+
+    plan = plan_reads(ranges, 200_000, None, gap_rows=1, max_read_rows=100)
+
+    read_starts = np.arange(0, 200_000, 100)
+    np.testing.assert_array_equal(plan.reads, np.column_stack((read_starts, read_starts + 99)))
+    np.testing.assert_array_equal(plan.members, np.arange(0, len(ranges) + 1, 50))
+
+
+@pytest.mark.parametrize("chunk_rows", [None, 8, CHUNK_ROWS])
+def test_execute_read_plan_with_overlapping_ranges(chunk_rows):
+    source = np.arange(TOTAL_ROWS) * 7 + 3
+    rng = np.random.default_rng(16)
+    for _ in range(500):
+        starts = rng.integers(0, 200, rng.integers(1, 12))
+        stops = np.minimum(starts + rng.integers(0, 40, len(starts)), 200)
+        ranges = np.column_stack((starts, stops))
+        gap_rows, max_read_rows = int(rng.integers(0, 20)), int(rng.choice([8, 16, 64]))
+        if chunk_rows is not None:
+            max_read_rows = max(max_read_rows // chunk_rows, 1) * chunk_rows
+        plan = plan_reads(ranges, TOTAL_ROWS, chunk_rows, gap_rows, max_read_rows)
+        expected = np.concatenate([source[start:stop] for start, stop in ranges])
+
+        output = execute_read_plan(plan, source, np.empty(expected.shape, dtype=source.dtype))
+
+        np.testing.assert_array_equal(output, expected)
+
+
+@pytest.mark.parametrize("columns", [np.s_[:], 2])
+def test_execute_read_plan_keeps_requested_order(chunked_dataset, columns):
+    ranges = np.array([[900, 901], [10, 20], [30, 40], [5, 6], [300, 310], [10, 12]])
+    plan = plan_reads(ranges, TOTAL_ROWS, CHUNK_ROWS, gap_rows=0, max_read_rows=TOTAL_ROWS)
+    expected = np.concatenate([chunked_dataset[start:stop, columns] for start, stop in ranges])
+
+    output = execute_read_plan(
+        plan,
+        chunked_dataset,
+        np.empty(expected.shape, dtype=expected.dtype),
+        columns,
+    )
+
+    np.testing.assert_array_equal(output, expected)
+
+
+def test_explain_read_plan(chunked_dataset):
+    ranges = np.array([[10, 20], [30, 40], [300, 310]])
+    plan = plan_reads(ranges, TOTAL_ROWS, CHUNK_ROWS, gap_rows=0, max_read_rows=TOTAL_ROWS)
+
+    explanation = explain_read_plan(plan, chunked_dataset, mapped=False)
+
+    row_bytes = 3 * 8
+    expected_chunks = 2
+    assert explanation["layout"] == "chunked"
+    assert explanation["ranges"] == len(ranges)
+    assert explanation["rows"] == plan.size
+    assert explanation["chunks"] == expected_chunks
+    assert explanation["bytes_read"] == expected_chunks * CHUNK_ROWS * row_bytes
+    assert 0 < explanation["stored_bytes"] < explanation["bytes_read"]
+
+
+def test_plan_reads_splits_long_ranges(chunked_dataset):
+    ranges = np.array([[500, 1000], [0, 300]])
+    max_read_rows = 2 * CHUNK_ROWS
+
+    plan = plan_reads(ranges, TOTAL_ROWS, CHUNK_ROWS, gap_rows=0, max_read_rows=max_read_rows)
+    output = execute_read_plan(plan, chunked_dataset, np.empty((plan.size, 3)))
+
+    assert np.all(np.diff(plan.reads) <= max_read_rows)
+    np.testing.assert_array_equal(
+        output,
+        np.concatenate([chunked_dataset[500:1000], chunked_dataset[0:300]]),
+    )
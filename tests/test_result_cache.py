@@ -0,0 +1,24 @@
+import numpy as np
+from api.processing.result_cache import create_result_key, hash_mask
+
+
+def test_hash_mask_ignores_integer_type():
+    mask = [[0, 100], [200, 334]]
+
+    assert hash_mask(np.array(mask, dtype=np.int32)) == hash_mask(np.array(mask, dtype=np.int64))
+    assert hash_mask(np.array(mask)) != hash_mask(np.array([[0, 100], [200, 335]]))
+    assert hash_mask(np.array(mask).reshape(4, 1)) != hash_mask(np.array(mask))
+
+
+def test_create_result_key_changes_when_file_changes(tmp_path):
+    filename = tmp_path / "snapshot.hdf5"
+    filename.write_bytes(b"first version")
+    field, selection = "PartType0/Masses", ("rows", 0, 10)
+    key = create_result_key(str(filename), field, None, selection, "json")
+
+    assert key == create_result_key(str(filename), field, None, selection, "json")
+    assert key != create_result_key(str(filename), field, None, selection, "npy")
+    assert key != create_result_key(str(filename), field, 0, selection, "json")
+
+    filename.write_bytes(b"second, longer version")
+    assert key != create_result_key(str(filename), field, None, selection, "json")
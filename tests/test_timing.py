@@ -0,0 +1,66 @@
+from api.processing.result_cache import get_result_cache
+from api.timing import SERVER_TIMING_HEADER, RequestTimings, timed
+from fastapi import status
+from loguru import logger
+
+
+def test_request_timings_sum_phases():
+    timings = RequestTimings()
+    timings.add("read", 0.0015)
+    timings.add("read", 0.001)
+    timings.add("encode", 0.002)
+
+    assert timings.to_milliseconds() == {"read": 2.5, "encode": 2.0}
+    assert timings.to_header() == "read;dur=2.5, encode;dur=2.0"
+
+
+def test_timed_outside_request_does_nothing():
+    with timed("read"):
+        value = 1
+
+    assert value == 1
+
+
+def test_server_timing_header_reports_request_phases(
+    template_swift_data_path,
+    mock_auth_client_success_jwt_decode,
+):
+    payload = {
+        "data_spec": {
+            "filename": str(template_swift_data_path),
+            "field": "PartType0/Masses",
+            "format": "npy",
+        },
+    }
+    get_result_cache().clear()
+
+    response = mock_auth_client_success_jwt_decode.post(
+        "/swiftdata/unmasked_dataset",
+        json=payload,
+        headers={"Accept-Encoding": "identity"},
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    phases = [metric.split(";")[0] for metric in response.headers[SERVER_TIMING_HEADER].split(", ")]
+    for phase in ("auth", "alias", "read", "encode", "app"):
+        assert phase in phases
+
+
+def test_server_timing_access_log(
+    template_swift_data_path,
+    mock_auth_client_success_jwt_decode,
+):
+    records = []
+    sink = logger.add(records.append, filter=lambda record: "timings_ms" in record["extra"])
+    payload = {"data_spec": {"filename": str(template_swift_data_path)}}
+
+    try:
+        response = mock_auth_client_success_jwt_decode.post("/swiftdata/metadata", json=payload)
+    finally:
+        logger.remove(sink)
+
+    extra = records[-1].record["extra"]
+    assert extra["path"] == "/swiftdata/metadata"
+    assert extra["status"] == response.status_code
+    assert extra["response_bytes"] > 0
+    assert {"metadata", "app", "send"} <= set(extra["timings_ms"])
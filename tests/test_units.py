@@ -94,3 +94,11 @@ def test_create_unyt_quantities_failure():
 
     with pytest.raises(units.SWIFTUnytException):
         units.create_unyt_quantities(test_dict)
+
+
+def test_get_field_units(template_swift_data_path):
+    coordinate_units = units.get_field_units(str(template_swift_data_path), "PartType0/Coordinates")
+    mass_units = units.get_field_units(str(template_swift_data_path), "PartType0/Masses")
+
+    assert coordinate_units == unyt_quantity(1, "Mpc")
+    assert mass_units == unyt_quantity(1e10, "Msun")